@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""对比每请求创建数据库管理器与进程内共享连接池的单请求开销
+
+需要可访问的MongoDB、Qdrant和Neo4j服务，连接信息读取自配置文件。
+
+用法:
+    python benchmarks/bench_db_manager.py --config config.yml --requests 200
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from bson import ObjectId
+
+from config.config import Config
+from storage.database_manager import DatabaseManager
+
+
+def _report(name, timings):
+    """打印耗时统计（毫秒）"""
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1] if len(timings) >= 20 else timings[-1]
+    print(f"{name:<12} 平均: {statistics.mean(timings):8.2f} ms  "
+          f"中位数: {statistics.median(timings):8.2f} ms  P95: {p95:8.2f} ms")
+
+
+def bench_per_request(config, requests, content_id):
+    """旧方式：每个请求新建并关闭数据库管理器"""
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        db_manager = DatabaseManager(config=config)
+        try:
+            db_manager.get_content(content_id)
+        finally:
+            db_manager.close()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def bench_pooled(config, requests, content_id):
+    """新方式：所有请求共享同一个带连接池的数据库管理器"""
+    db_manager = DatabaseManager(config=config)
+    try:
+        # 预热连接池
+        db_manager.get_content(content_id)
+        timings = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            db_manager.get_content(content_id)
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
+    finally:
+        db_manager.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='数据库管理器单请求开销基准测试')
+    parser.add_argument('--config', type=str, default='config.yml', help='配置文件路径')
+    parser.add_argument('--requests', type=int, default=100, help='模拟请求次数')
+    args = parser.parse_args()
+
+    config = Config(args.config)
+    # 使用不存在的ID，只衡量连接与一次往返的开销
+    content_id = str(ObjectId())
+
+    _report("每请求新建", bench_per_request(config, args.requests, content_id))
+    _report("共享连接池", bench_pooled(config, args.requests, content_id))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""向量检索的召回率/延迟基准测试，用于选择HNSW与量化参数
+
+对每组参数建立一个临时集合，写入随机向量，以精确检索(exact=True)的结果为基准
+计算近似检索的recall@k，并统计单次检索延迟。
+
+默认使用进程内的Qdrant(:memory:)快速验证脚本和参数是否有效。注意本地模式始终执行
+暴力检索，HNSW和量化参数不会生效；评估真实的召回率与延迟需通过 --url 指向Qdrant服务。
+
+用法:
+    python benchmarks/bench_vector_search.py --points 20000 --dim 1536
+    python benchmarks/bench_vector_search.py --url http://localhost:6333 \\
+        --m 16 32 --quantization none scalar product --hnsw-ef 64 128
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import itertools
+import statistics
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+from storage.vector_index import build_collection_params, build_search_params
+
+BENCH_COLLECTION = "bench_content_vectors"
+PLATFORMS = ["wechat", "weibo", "xiaohongshu", "bilibili"]
+
+
+def _random_vector(dim, rng):
+    vector = [rng.gauss(0, 1) for _ in range(dim)]
+    norm = sum(x * x for x in vector) ** 0.5
+    return [x / norm for x in vector]
+
+
+def _wait_for_index(client, timeout=600):
+    """等待服务端完成索引构建，本地模式直接返回"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        info = client.get_collection(BENCH_COLLECTION)
+        if info.status == models.CollectionStatus.GREEN:
+            return
+        time.sleep(1)
+
+
+def _percentile(timings, q):
+    timings = sorted(timings)
+    return timings[min(len(timings) - 1, int(len(timings) * q))]
+
+
+def run_case(client, collection_config, vectors, queries, limit, batch_size):
+    """在给定参数下建集合、写入并检索，返回(recall@k, 延迟列表)"""
+    client.recreate_collection(collection_name=BENCH_COLLECTION, **build_collection_params(collection_config))
+
+    rng = random.Random(1)
+    for start in range(0, len(vectors), batch_size):
+        client.upsert(
+            collection_name=BENCH_COLLECTION,
+            points=[
+                models.PointStruct(
+                    id=start + offset,
+                    vector=vector,
+                    payload={"platform": rng.choice(PLATFORMS), "publish_time": float(start + offset)}
+                )
+                for offset, vector in enumerate(vectors[start:start + batch_size])
+            ]
+        )
+    _wait_for_index(client)
+
+    search_params = build_search_params(collection_config)
+    hits = 0
+    timings = []
+    for query in queries:
+        exact = client.search(
+            collection_name=BENCH_COLLECTION,
+            query_vector=query,
+            search_params=models.SearchParams(exact=True),
+            limit=limit
+        )
+        start = time.perf_counter()
+        approximate = client.search(
+            collection_name=BENCH_COLLECTION,
+            query_vector=query,
+            search_params=search_params,
+            limit=limit
+        )
+        timings.append((time.perf_counter() - start) * 1000)
+        hits += len({p.id for p in exact} & {p.id for p in approximate})
+
+    client.delete_collection(BENCH_COLLECTION)
+    return hits / (len(queries) * limit), timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='向量检索召回率/延迟基准测试')
+    parser.add_argument('--url', type=str, default=':memory:', help='Qdrant地址，默认使用进程内模式')
+    parser.add_argument('--points', type=int, default=5000, help='写入的向量数量')
+    parser.add_argument('--dim', type=int, default=1536, help='向量维度')
+    parser.add_argument('--queries', type=int, default=100, help='检索次数')
+    parser.add_argument('--limit', type=int, default=10, help='每次检索返回数量(k)')
+    parser.add_argument('--batch-size', type=int, default=500, help='写入批大小')
+    parser.add_argument('--m', type=int, nargs='+', default=[16], help='HNSW m')
+    parser.add_argument('--ef-construct', type=int, nargs='+', default=[100], help='HNSW ef_construct')
+    parser.add_argument('--hnsw-ef', type=int, nargs='+', default=[128], help='检索时的hnsw_ef')
+    parser.add_argument('--quantization', nargs='+', default=['none', 'scalar'],
+                        choices=['none', 'scalar', 'product'], help='量化类型')
+    parser.add_argument('--on-disk', action='store_true', help='原始向量存放在磁盘')
+    parser.add_argument('--budget-ms', type=float, default=None, help='P95延迟预算，超出的参数组合会被标记')
+    args = parser.parse_args()
+
+    client = QdrantClient(location=args.url) if args.url == ':memory:' else QdrantClient(url=args.url)
+    rng = random.Random(0)
+    vectors = [_random_vector(args.dim, rng) for _ in range(args.points)]
+    queries = [_random_vector(args.dim, rng) for _ in range(args.queries)]
+
+    print(f"{'m':>4} {'ef_c':>5} {'ef':>5} {'量化':<8} {'recall@k':>9} {'P50 ms':>8} {'P95 ms':>8}")
+    for m, ef_construct, hnsw_ef, quantization in itertools.product(
+            args.m, args.ef_construct, args.hnsw_ef, args.quantization):
+        collection_config = {
+            "vector_size": args.dim,
+            "on_disk": args.on_disk,
+            "hnsw": {"m": m, "ef_construct": ef_construct},
+            "quantization": {"type": quantization},
+            "search": {"hnsw_ef": hnsw_ef}
+        }
+        recall, timings = run_case(client, collection_config, vectors, queries, args.limit, args.batch_size)
+        p95 = _percentile(timings, 0.95)
+        flag = " 超出预算" if args.budget_ms is not None and p95 > args.budget_ms else ""
+        print(f"{m:>4} {ef_construct:>5} {hnsw_ef:>5} {quantization:<8} {recall:>9.3f} "
+              f"{statistics.median(timings):>8.2f} {p95:>8.2f}{flag}")
+
+
+if __name__ == "__main__":
+    main()
@@ -16,26 +16,32 @@ class RelationshipAnalyzer:
         config = Config()
         self.llm = LLMProcessor(config=config)
         
-    def analyze_connections(self, new_content_id):
-        """分析新内容与历史信息的关联"""
+    def analyze_connections(self, new_content_id, vector=None):
+        """分析新内容与历史信息的关联
+
+        Args:
+            new_content_id: 新内容ID
+            vector: 新内容已生成的向量，为None时重新生成
+        """
         # 获取新内容
         new_content = self.db_manager.get_content(new_content_id)
         if not new_content:
             return
         
         # 使用向量检索找到相似内容
-        vector = self.llm.get_embedding(new_content.processed_text)
-        similar_results = self.db_manager.search_similar_vectors(vector, limit=10)
+        if vector is None:
+            vector = self.llm.get_embedding(new_content.processed_text)
+        # 在Qdrant中排除自己，保证返回的10条都是其他内容
+        similar_results = self.db_manager.search_similar_vectors(vector, limit=10, exclude_ids=[new_content_id])
         
-        # 分析并创建关系
-        for result in similar_results:
-            similar_id = result.id
-            if similar_id == new_content_id:  # 跳过自己
-                continue
-                
-            similar_content = self.db_manager.get_content(similar_id)
-            if not similar_content:
-                continue
+        # 批量获取相似内容
+        similar_ids = [str(result.id) for result in similar_results]
+        similar_contents = self.db_manager.get_contents_by_ids(similar_ids)
+        
+        # 分析关系，最后一次性写入知识图谱
+        relationships = []
+        for similar_content in similar_contents:
+            similar_id = similar_content.id
                 
             # 使用LLM分析两者关系
             relation = self.llm.analyze_relationship(
@@ -43,7 +49,7 @@ class RelationshipAnalyzer:
                 similar_content.dict()
             )
             
-            # 如果检测到关联关系，创建关系到知识图谱
+            # 如果检测到关联关系，加入待写入列表
             if relation.get('has_relation'):
                 relationship = Relationship(
                     source_id=new_content_id,
@@ -54,18 +60,21 @@ class RelationshipAnalyzer:
                         "confidence": relation.get('confidence', 0.5)
                     }
                 )
-                
-                self.db_manager.create_relation(relationship)
+                relationships.append(relationship)
+        
+        if relationships:
+            self.db_manager.create_relations_bulk(relationships)
     
     def find_similar_contents(self, content):
         """查找相似内容"""
         # 使用向量数据库进行相似度搜索
         vector = self.llm.get_embedding(content['processed_text'])
-        search_results = self.db_manager.search_similar_vectors(vector, limit=10)
+        exclude_ids = [content['id']] if content.get('id') else None
+        search_results = self.db_manager.search_similar_vectors(vector, limit=10, exclude_ids=exclude_ids)
         
         # 获取相似内容的详细信息
-        content_ids = [result.id for result in search_results]
-        similar_contents = list(self.db_manager.get_contents({"_id": {"$in": content_ids}}))
+        content_ids = [str(result.id) for result in search_results]
+        similar_contents = self.db_manager.get_contents_by_ids(content_ids)
         
         return similar_contents
         
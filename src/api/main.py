@@ -1,16 +1,29 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import time
+import asyncio
 import logging
 import uvicorn
-from fastapi import FastAPI, Depends, HTTPException
+from bson import ObjectId
+from bson.errors import InvalidId
+from datetime import datetime, timedelta
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Dict, Optional, Any
 
 # 导入必要的模块
-from processor.llm_processor import LLMProcessor
+from processor.async_llm_processor import AsyncLLMProcessor
+from processor.embedding_cache import get_embedding_cache
+from processor.response_cache import get_response_cache
 from storage.database_manager import DatabaseManager
+from storage.async_database_manager import AsyncDatabaseManager
+from storage.migrations import apply_migrations
+from storage.models import Content, ContentSummary, Metadata, VectorEmbedding
+from storage.cache import create_cache
+from storage.interaction_recorder import InteractionRecorder
 from analyzer.relationship_analyzer import RelationshipAnalyzer
 from visualizer.graph_generator import GraphVisualizer
 from config.config import Config
@@ -22,11 +35,51 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：进程内只创建一个带连接池的数据库管理器，所有请求共享"""
+    config = Config()
+    app.state.config = config
+    # 同步管理器供关系分析和可视化使用，异步管理器供路由中的读写使用
+    app.state.db_manager = DatabaseManager(config=config)
+    # 进程启动时执行一次未执行的数据库迁移
+    apply_migrations(app.state.db_manager)
+    # 两个管理器共享内容缓存，任一路径写入都会使缓存失效
+    app.state.async_db_manager = AsyncDatabaseManager(
+        config=config,
+        content_cache=app.state.db_manager.content_cache,
+        relations_cache=app.state.db_manager.relations_cache,
+        vector_store=app.state.db_manager.vector_store
+    )
+    # 查询向量和关系图缓存，配置为redis后端时在多个worker之间共享
+    cache_config = config.get_cache_config()
+    app.state.query_embedding_cache = create_cache(
+        cache_config, 'query_embedding', default_max_size=4096, default_ttl=86400
+    )
+    app.state.graph_cache = create_cache(cache_config, 'graph', default_max_size=512, default_ttl=600)
+    # 所有请求共享一个异步LLM客户端，并发数和配额由其统一控制
+    app.state.llm = AsyncLLMProcessor(config=config)
+    # 浏览/收藏/标签在内存中合并后批量写入
+    app.state.interaction_recorder = InteractionRecorder(
+        app.state.db_manager, config.get_database_config()['interactions']
+    )
+    app.state.interaction_recorder.start()
+    logger.info("共享数据库管理器已创建")
+    try:
+        yield
+    finally:
+        app.state.interaction_recorder.close()
+        await app.state.llm.close()
+        await app.state.async_db_manager.close()
+        app.state.db_manager.close()
+        logger.info("共享数据库管理器已关闭")
+
 # 创建FastAPI应用实例
 app = FastAPI(
     title="InsightFlow API",
     description="个人信息管理系统API",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # 配置CORS
@@ -36,25 +89,24 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing"],
 )
 
-# 依赖项注入 - 数据库管理器
-def get_db_manager():
-    config = Config()  # 创建配置对象
-    db_manager = DatabaseManager(config=config)
-    try:
-        yield db_manager
-    finally:
-        db_manager.close()  # 确保关闭连接
+# 依赖项注入 - 数据库管理器（由应用生命周期管理，不在请求结束时关闭）
+def get_db_manager(request: Request) -> DatabaseManager:
+    return request.app.state.db_manager
 
-# 依赖项注入 - LLM处理器
-def get_llm_processor():
-    try:
-        config = Config()  # 创建配置对象
-        return LLMProcessor(config=config)  # 传入配置对象
-    except Exception as e:
-        logger.error(f"LLM处理器初始化失败: {e}")
-        raise HTTPException(status_code=500, detail=f"LLM处理器初始化失败: {str(e)}")
+# 依赖项注入 - 异步数据库管理器，避免在事件循环中执行阻塞的数据库调用
+def get_async_db_manager(request: Request) -> AsyncDatabaseManager:
+    return request.app.state.async_db_manager
+
+# 依赖项注入 - 用户交互记录器
+def get_interaction_recorder(request: Request) -> InteractionRecorder:
+    return request.app.state.interaction_recorder
+
+# 依赖项注入 - LLM处理器（由应用生命周期管理）
+def get_llm_processor(request: Request) -> AsyncLLMProcessor:
+    return request.app.state.llm
 
 # 数据模型
 class ContentBase(BaseModel):
@@ -66,17 +118,16 @@ class ContentBase(BaseModel):
 class ContentCreate(ContentBase):
     pass
 
-class ContentResponse(ContentBase):
+class ContentResponse(Content):
+    """内容详情，字段与存储的内容一致；创建内容时content为提交的正文"""
     id: str
-    processed_text: Optional[str] = None
-    summary: Optional[str] = None
-    topics: Optional[List[str]] = None
-    keywords: Optional[List[str]] = None
-    sentiment: Optional[Dict[str, Any]] = None
-    publish_time: Optional[str] = None
-    
-    class Config:
-        orm_mode = True
+    content: Optional[str] = None
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """解析逗号分隔的fields查询参数"""
+    if not fields:
+        return None
+    return [field.strip() for field in fields.split(",") if field.strip()]
 
 # API路由
 @app.get("/")
@@ -87,51 +138,83 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/stats/cache")
+async def cache_stats(request: Request, db: DatabaseManager = Depends(get_db_manager)):
+    """缓存命中统计，供监控使用"""
+    llm_config = request.app.state.config.get_llm_config()
+    embedding_cache = get_embedding_cache(llm_config.get('embedding_cache', {}))
+    response_cache = get_response_cache(llm_config.get('response_cache', {}))
+    return {
+        **db.get_cache_stats(),
+        "query_embedding": request.app.state.query_embedding_cache.stats(),
+        "embedding": embedding_cache.stats() if embedding_cache else None,
+        "llm_response": response_cache.stats() if response_cache else None,
+        "graph": request.app.state.graph_cache.stats(),
+        "interactions": request.app.state.interaction_recorder.stats()
+    }
+
 # 内容相关API
 @app.post("/contents/", response_model=ContentResponse)
 async def create_content(
     content: ContentCreate, 
-    db: DatabaseManager = Depends(get_db_manager),
-    llm: LLMProcessor = Depends(get_llm_processor)
+    db: AsyncDatabaseManager = Depends(get_async_db_manager),
+    llm: AsyncLLMProcessor = Depends(get_llm_processor)
 ):
     """创建新内容"""
     try:
-        # 处理内容
-        processed_text = llm.understand_content(content.content)
-        summary = llm.generate_summary(content.content)
-        
-        # 准备存储的内容数据
-        content_data = {
-            **content.dict(),
-            "processed_text": processed_text,
-            "summary": summary,
-            # 其他字段可以根据实际需求添加
-        }
+        # 单次分析与向量化并行
+        analysis, embedding = await asyncio.gather(
+            llm.analyze_content(content.title, content.content),
+            llm.get_embedding(content.content)
+        )
         
-        # 存储到数据库
-        content_id = db.store_content(content_data)
+        now = datetime.now()
+        content_id = await db.store_content(Content(
+            title=content.title,
+            processed_text=content.content,
+            source=content.source,
+            platform=content.platform,
+            publish_time=now,
+            formatted_time=now.strftime("%Y-%m-%d %H:%M:%S"),
+            metadata=Metadata(word_count=len(content.content), read_time_minutes=len(content.content) // 500),
+            **analysis
+        ))
         
         # 获取完整的内容数据
-        stored_content = db.get_content(content_id)
+        stored_content = await db.get_content(content_id)
+        await db.store_vector(VectorEmbedding(content_id=content_id, vector=embedding), content=stored_content)
         
-        # 处理向量嵌入
-        embedding = llm.get_embedding(content.content)
-        db.store_vector(content_id, embedding)
-        
-        return {**stored_content, "id": content_id}
+        return {**stored_content.dict(), "content": content.content}
     except Exception as e:
         logger.error(f"创建内容时出错: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/contents/", response_model=List[ContentResponse])
+@app.get("/contents/", response_model=List[ContentSummary], response_model_exclude_unset=True)
 async def get_contents(
+    response: Response,
     skip: int = 0, 
     limit: int = 10,
-    db: DatabaseManager = Depends(get_db_manager)
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: AsyncDatabaseManager = Depends(get_async_db_manager)
 ):
-    """获取内容列表"""
+    """获取内容列表，只返回卡片展示字段，可通过fields指定字段（逗号分隔）
+    
+    使用cursor分页：下一页的游标通过响应头X-Next-Cursor返回，没有更多内容时不返回该头。
+    skip仅为兼容保留，深度翻页请使用cursor。
+    """
     try:
-        return db.get_contents(skip=skip, limit=limit)
+        if skip:
+            return await db.search_content_summaries({}, limit=limit, skip=skip, fields=parse_fields(fields))
+        
+        results, next_cursor = await db.search_content_summaries_page(
+            {}, limit=limit, cursor=cursor, fields=parse_fields(fields)
+        )
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return results
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"获取内容列表时出错: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -139,13 +222,15 @@ async def get_contents(
 @app.get("/contents/{content_id}", response_model=ContentResponse)
 async def get_content(
     content_id: str,
-    db: DatabaseManager = Depends(get_db_manager)
+    db: AsyncDatabaseManager = Depends(get_async_db_manager),
+    recorder: InteractionRecorder = Depends(get_interaction_recorder)
 ):
-    """获取特定内容"""
+    """获取特定内容，详情页才加载原始HTML"""
     try:
-        content = db.get_content(content_id)
+        content = await db.get_content(content_id, include_original=True)
         if not content:
             raise HTTPException(status_code=404, detail="内容不存在")
+        recorder.record_view(content_id)
         return content
     except HTTPException:
         raise
@@ -153,22 +238,113 @@ async def get_content(
         logger.error(f"获取内容时出错: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+class FavoriteUpdate(BaseModel):
+    is_favorited: bool = True
+
+class TagsUpdate(BaseModel):
+    tags: List[str]
+
+# 用户交互API：写入先在内存中合并，延迟数秒后批量落库
+@app.put("/contents/{content_id}/favorite", status_code=202)
+async def set_favorite(
+    content_id: str,
+    update: FavoriteUpdate,
+    recorder: InteractionRecorder = Depends(get_interaction_recorder)
+):
+    """收藏或取消收藏内容"""
+    try:
+        recorder.set_favorite(content_id, update.is_favorited)
+    except InvalidId:
+        raise HTTPException(status_code=400, detail="无效的内容ID")
+    return {"status": "accepted"}
+
+@app.post("/contents/{content_id}/tags", status_code=202)
+async def add_tags(
+    content_id: str,
+    update: TagsUpdate,
+    recorder: InteractionRecorder = Depends(get_interaction_recorder)
+):
+    """为内容添加标签"""
+    try:
+        recorder.add_tags(content_id, update.tags)
+    except InvalidId:
+        raise HTTPException(status_code=400, detail="无效的内容ID")
+    return {"status": "accepted"}
+
+@app.delete("/contents/{content_id}/tags", status_code=202)
+async def remove_tags(
+    content_id: str,
+    update: TagsUpdate,
+    recorder: InteractionRecorder = Depends(get_interaction_recorder)
+):
+    """移除内容的标签"""
+    try:
+        recorder.remove_tags(content_id, update.tags)
+    except InvalidId:
+        raise HTTPException(status_code=400, detail="无效的内容ID")
+    return {"status": "accepted"}
+
 # 搜索API
-@app.get("/search/", response_model=List[ContentResponse])
+@app.get("/search/", response_model=List[ContentSummary], response_model_exclude_unset=True)
 async def search_contents(
+    request: Request,
+    response: Response,
     query: str,
-    db: DatabaseManager = Depends(get_db_manager),
-    llm: LLMProcessor = Depends(get_llm_processor)
+    fields: Optional[str] = None,
+    platform: Optional[str] = None,
+    days: Optional[int] = None,
+    mode: str = "hybrid",
+    db: AsyncDatabaseManager = Depends(get_async_db_manager),
+    llm: AsyncLLMProcessor = Depends(get_llm_processor)
 ):
-    """语义搜索内容"""
+    """搜索内容，可按平台和最近天数过滤
+    
+    mode为hybrid（默认）时融合关键词检索与语义检索，各阶段耗时通过Server-Timing响应头返回；
+    为vector时只使用语义检索。
+    """
+    if mode not in ("hybrid", "vector"):
+        raise HTTPException(status_code=400, detail=f"不支持的搜索模式: {mode}")
     try:
-        # 获取查询的向量表示
-        query_vector = llm.get_embedding(query)
+        # 获取查询的向量表示，相同查询复用缓存
+        embedding_cache = request.app.state.query_embedding_cache
+        cache_key = f"{llm.embedding_model}:{query}"
+        embedding_start = time.perf_counter()
+        query_vector = await embedding_cache.aget(cache_key)
+        if query_vector is None:
+            query_vector = await llm.get_embedding(query)
+            await embedding_cache.aset(cache_key, query_vector)
+        embedding_ms = (time.perf_counter() - embedding_start) * 1000
+        
+        start_time = datetime.now() - timedelta(days=days) if days else None
+        if mode == "hybrid":
+            results, timings = await db.hybrid_search_content_summaries(
+                query, query_vector, limit=10, fields=parse_fields(fields),
+                platform=platform, start_time=start_time
+            )
+            timings = {"embedding": embedding_ms, **timings}
+            response.headers["Server-Timing"] = ", ".join(
+                f"{name};dur={ms:.1f}" for name, ms in timings.items()
+            )
+            return results
         
         # 向量搜索
-        results = db.search_vectors(query_vector, limit=10)
+        vector_results = await db.search_similar_vectors(
+            query_vector, limit=10, platform=platform, start_time=start_time
+        )
+        
+        # 一次查询获取命中内容的摘要，并按向量相似度排序
+        content_ids = [str(result.id) for result in vector_results]
+        summaries = await db.search_content_summaries(
+            {"_id": {"$in": [ObjectId(content_id) for content_id in content_ids]}},
+            limit=len(content_ids),
+            fields=parse_fields(fields)
+        )
+        summary_by_id = {summary.id: summary for summary in summaries}
+        results = [summary_by_id[content_id] for content_id in content_ids if content_id in summary_by_id]
         
         return results
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"搜索内容时出错: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -176,6 +352,7 @@ async def search_contents(
 # 关系分析API
 @app.get("/relationships/{content_id}")
 async def get_relationships(
+    request: Request,
     content_id: str,
     depth: int = 2,
     db_manager: DatabaseManager = Depends(get_db_manager),
@@ -184,11 +361,16 @@ async def get_relationships(
 ):
     """获取内容的关系图"""
     try:
-        # 分析关系
-        analyzer.analyze_connections(content_id)
+        graph_cache = request.app.state.graph_cache
+        cache_key = f"{content_id}:{depth}"
+        graph_data = await graph_cache.aget(cache_key)
+        if graph_data is not None:
+            return graph_data
         
-        # 生成关系图
-        graph_data = visualizer.generate_relationship_graph(content_id, depth=depth)
+        # 关系分析和绘图调用同步的LLM和数据库接口，在线程池中执行，不阻塞事件循环
+        await asyncio.to_thread(analyzer.analyze_connections, content_id)
+        graph_data = await asyncio.to_thread(visualizer.generate_relationship_graph, content_id, depth=depth)
+        await graph_cache.aset(cache_key, graph_data)
         
         return graph_data
     except Exception as e:
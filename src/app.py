@@ -11,7 +11,10 @@ from notifier.push_manager import PushManager
 from notifier.wechat_pusher import WeChatPusher
 from notifier.email_pusher import EmailPusher
 from storage.database_manager import DatabaseManager
+from storage.migrations import apply_migrations, get_schema_version
+from storage.vector_index import configure_collection
 from analyzer.relationship_analyzer import RelationshipAnalyzer
+from processor.content_pipeline import ContentPipelineWorker
 from visualizer.graph_generator import GraphVisualizer
 
 # 配置日志
@@ -34,6 +37,17 @@ def main():
     parser.add_argument('--run-crawler', action='store_true', help='运行爬虫调度器')
     parser.add_argument('--run-api', action='store_true', help='运行API服务')
     parser.add_argument('--validate-only', action='store_true', help='仅验证配置')
+    parser.add_argument('--init-db', action='store_true', help='仅初始化/升级数据库结构（索引、集合）')
+    parser.add_argument('--offload-original-content', action='store_true',
+                        help='将内嵌的原始HTML压缩迁移到content_blobs集合')
+    parser.add_argument('--archive-contents', action='store_true',
+                        help='将过期且未收藏的内容移到归档集合')
+    parser.add_argument('--upgrade-content-schema', action='store_true',
+                        help='将旧结构的内容文档分批升级到当前结构版本')
+    parser.add_argument('--run-pipeline', action='store_true',
+                        help='运行增量内容处理worker（生成向量、分析关系）')
+    parser.add_argument('--backfill-embeddings', action='store_true',
+                        help='为已有内容批量重新生成向量')
     args = parser.parse_args()
     
     # 加载配置
@@ -59,6 +73,55 @@ def main():
         logger.error(f"加载配置文件失败: {e}")
         sys.exit(1)
     
+    # 如果指定了初始化数据库结构
+    if args.init_db:
+        db_manager = DatabaseManager(config=config)
+        try:
+            apply_migrations(db_manager)
+            # 向量集合的调优参数随配置变化，每次初始化都重新应用
+            if db_manager.vector_db is not None:
+                configure_collection(db_manager.vector_db, db_manager.vector_collection_config)
+            logger.info(f"当前数据库结构版本: {get_schema_version(db_manager)}")
+        finally:
+            db_manager.close()
+        return
+    
+    # 如果指定了迁移原始HTML
+    if args.offload_original_content:
+        db_manager = DatabaseManager(config=config)
+        try:
+            report = db_manager.offload_original_contents()
+            logger.info(
+                f"已迁移 {report['migrated']} 条原始内容，"
+                f"contents集合大小: {report['contents_size_before']} -> {report['contents_size_after']} 字节"
+            )
+        finally:
+            db_manager.close()
+        return
+    
+    # 如果指定了归档旧内容
+    if args.archive_contents:
+        db_manager = DatabaseManager(config=config)
+        try:
+            report = db_manager.archive_old_contents()
+            logger.info(f"已归档 {report['archived']} 条早于 {report['boundary']} 的内容")
+        finally:
+            db_manager.close()
+        return
+    
+    # 如果指定了升级内容文档结构
+    if args.upgrade_content_schema:
+        db_manager = DatabaseManager(config=config)
+        try:
+            report = db_manager.upgrade_content_documents(pause_seconds=0.1)
+            logger.info(
+                f"内容结构升级完成，升级 {report['upgraded']} 条，"
+                f"跳过 {report['skipped']} 条，失败 {len(report['failed'])} 条"
+            )
+        finally:
+            db_manager.close()
+        return
+    
     # 如果指定了运行API服务
     if args.run_api:
         logger.info("启动API服务...")
@@ -104,10 +167,29 @@ def main():
     # 在顶层应用中初始化单个 DatabaseManager 实例
     db_manager = DatabaseManager(config=config)
     
+    # 启动时执行一次未执行的数据库迁移
+    apply_migrations(db_manager)
+    
     # 传递给所有需要数据库访问的组件
     analyzer = RelationshipAnalyzer(db_manager=db_manager)
     visualizer = GraphVisualizer(db_manager=db_manager)
     
+    # 单独运行增量处理worker，适用于只部署API、不运行爬虫调度器的场景
+    if args.run_pipeline:
+        logger.info("启动增量内容处理worker...")
+        ContentPipelineWorker(
+            db_manager, analyzer=analyzer, pipeline_config=config.get_pipeline_config()
+        ).run()
+        return
+    
+    if args.backfill_embeddings:
+        logger.info("开始回填内容向量...")
+        report = ContentPipelineWorker(
+            db_manager, analyzer=analyzer, pipeline_config=config.get_pipeline_config()
+        ).backfill_embeddings()
+        logger.info(f"向量回填完成，内容 {report['contents']} 条，生成向量 {report['embedded']} 条")
+        return
+    
     # 运行爬虫调度器 (传入已创建的数据库管理器)
     if args.run_crawler:
         logger.info("启动爬虫调度器...")
@@ -86,9 +86,17 @@ class Config:
         return {
             'mongo_uri': self.config.get('database', {}).get('mongodb', {}).get('uri'),
             'qdrant_url': self.config.get('database', {}).get('qdrant', {}).get('url'),
+            'qdrant_collection': dict(self.config.get('database', {}).get('qdrant', {}).get('collection') or {}),
+            'vector_store': dict(self.config.get('database', {}).get('vector_store') or {}),
+            'archive': dict(self.config.get('database', {}).get('archive') or {}),
+            'interactions': dict(self.config.get('database', {}).get('interactions') or {}),
             'neo4j_uri': self.config.get('database', {}).get('neo4j', {}).get('uri'),
             'neo4j_user': self.config.get('database', {}).get('neo4j', {}).get('username'),
-            'neo4j_password': self.config.get('database', {}).get('neo4j', {}).get('password')
+            'neo4j_password': self.config.get('database', {}).get('neo4j', {}).get('password'),
+            'bulk_batch_size': self.config.get('database', {}).get('bulk', {}).get('batch_size', 500),
+            'mongo_max_pool_size': self.config.get('database', {}).get('mongodb', {}).get('max_pool_size', 100),
+            'mongo_min_pool_size': self.config.get('database', {}).get('mongodb', {}).get('min_pool_size', 0),
+            'neo4j_max_pool_size': self.config.get('database', {}).get('neo4j', {}).get('max_pool_size', 100)
         }
 
     def get_crawler_config(self):
@@ -106,4 +114,23 @@ class Config:
         return self.config.get('push_channels', {})
     
     def get_scheduler_config(self):
-        return self.config.get('scheduler', {}) 
\ No newline at end of file
+        return self.config.get('scheduler', {})
+    
+    def get_pipeline_config(self):
+        """获取增量处理管道配置
+        
+        Returns:
+            dict: 包含增量处理配置的字典
+        """
+        return self.config.get('pipeline', {})
+    
+    def get_cache_config(self):
+        """获取缓存配置
+        
+        Returns:
+            dict: 包含缓存配置的字典
+        """
+        cache_config = dict(self.config.get('cache', {}))
+        # 未单独配置时复用调度器的Redis
+        cache_config.setdefault('redis_url', self.get_scheduler_config().get('redis_url'))
+        return cache_config 
\ No newline at end of file
@@ -1,5 +1,8 @@
+import logging
 from storage.database_manager import DatabaseManager
 
+logger = logging.getLogger(__name__)
+
 class BaseCrawler:
     def __init__(self, config, db_manager):
         """初始化基础爬虫
@@ -13,6 +16,7 @@ class BaseCrawler:
         self.config = config
         self.db_manager = db_manager  # 使用传入的实例，不再创建新实例
         self.content_callback = None  # 内容处理回调函数
+        self.contents_callback = None  # 批量内容处理回调函数
     
     def set_content_callback(self, callback):
         """设置新内容处理回调
@@ -22,6 +26,14 @@ class BaseCrawler:
         """
         self.content_callback = callback
     
+    def set_contents_callback(self, callback):
+        """设置批量新内容处理回调，设置后批量存储的内容整批交给它处理
+        
+        Args:
+            callback: 回调函数，接收(content_id, content_data)元组列表
+        """
+        self.contents_callback = callback
+    
     def store_and_process_content(self, content_data):
         """存储内容并调用回调处理
         
@@ -40,6 +52,39 @@ class BaseCrawler:
         
         return content_id
     
+    def store_and_process_contents(self, contents_data):
+        """批量存储内容并调用回调处理，设置了批量回调时整批处理，否则逐条处理
+        
+        Args:
+            contents_data: 内容数据字典列表
+            
+        Returns:
+            List[str]: 与输入一一对应的内容ID，存储失败或已存在的为None
+        """
+        if not contents_data:
+            return []
+        
+        # 通过批量写入路径存储，按原文URL去重，避免并发爬虫重复写入
+        result = self.db_manager.store_contents_bulk(contents_data, dedupe_by_url=True)
+        
+        for error in result['errors']:
+            logger.error(f"内容存储失败, 下标: {error['index']}, 错误: {error['error']}")
+        
+        # 仅对存储成功的内容调用回调
+        stored = [
+            (content_id, content_data)
+            for content_id, content_data in zip(result['ids'], contents_data)
+            if content_id
+        ]
+        if self.contents_callback:
+            if stored:
+                self.contents_callback(stored)
+        elif self.content_callback:
+            for content_id, content_data in stored:
+                self.content_callback(content_id, content_data)
+        
+        return result['ids']
+    
     def crawl(self):
         """爬取内容的抽象方法，子类必须实现"""
         raise NotImplementedError("子类必须实现crawl方法") 
\ No newline at end of file
@@ -7,6 +7,10 @@ from crawler.xiaohongshu import XiaoHongShuCrawler
 from crawler.bilibili import BiliBiliCrawler
 from analyzer.relationship_analyzer import RelationshipAnalyzer
 from visualizer.graph_generator import GraphVisualizer
+from processor.content_pipeline import ContentPipelineWorker
+from storage.models import Content
+
+logger = logging.getLogger(__name__)
 
 class CrawlerScheduler:
     def __init__(self, crawler_config, push_manager, config, db_manager):
@@ -25,6 +29,12 @@ class CrawlerScheduler:
         self.analyzer = RelationshipAnalyzer(db_manager=self.db_manager)
         self.visualizer = GraphVisualizer(db_manager=self.db_manager)
         self.crawlers = {}
+        self.pipeline_worker = ContentPipelineWorker(
+            self.db_manager,
+            analyzer=self.analyzer,
+            on_processed=self.notify_new_content,
+            pipeline_config=self.config.get_pipeline_config()
+        )
         self._init_crawlers()
     
     def _init_crawlers(self):
@@ -51,13 +61,31 @@ class CrawlerScheduler:
     
     def process_new_content(self, content_id, content_data):
         """处理新采集的内容"""
-        # 1. 分析内容与现有内容的关系
-        self.analyzer.analyze_connections(content_id)
+        self.process_new_contents([(content_id, content_data)])
+    
+    def process_new_contents(self, items):
+        """批量处理新采集的内容
+        
+        与增量处理worker共用处理逻辑：批量生成并写入向量，再逐条分析关系，生成关系图并通知用户。
         
-        # 2. 生成关系图并保存
+        Args:
+            items: (content_id, content_data)元组列表
+        """
+        contents = []
+        for content_id, content_data in items:
+            try:
+                contents.append(Content(**{**content_data, "id": content_id}))
+            except Exception as e:
+                logger.error(f"解析内容失败, ID: {content_id}: {e}")
+        if contents:
+            self.pipeline_worker.process_contents(contents)
+    
+    def notify_new_content(self, content_id, content_data):
+        """生成已分析内容的关系图并推送通知"""
+        # 1. 生成关系图并保存
         graph_path = self.visualizer.generate_relationship_graph(content_id, depth=2)
         
-        # 3. 通知用户新内容及其关系
+        # 2. 通知用户新内容及其关系
         notification = {
             "title": f"新内容分析：{content_data.get('title', '未知标题')}",
             "message": f"已分析新内容与现有信息的关系，详情可查看Web界面",
@@ -68,10 +96,15 @@ class CrawlerScheduler:
         
     def start(self):
         """启动调度器"""
-        # 为每个爬虫注册回调，处理新内容
-        for crawler_name, crawler in self.crawlers.items():
-            # 注册回调函数，当爬虫获取到新内容时调用
-            crawler.set_content_callback(self.process_new_content)
+        if self.config.get_pipeline_config().get('enabled', False):
+            # 由变更流worker处理所有新内容（包括API写入和回填），爬虫不再注册回调
+            self.pipeline_worker.start()
+        else:
+            # 为每个爬虫注册回调，处理新内容
+            for crawler_name, crawler in self.crawlers.items():
+                # 注册回调函数，当爬虫获取到新内容时调用，批量存储的内容整批生成向量
+                crawler.set_content_callback(self.process_new_content)
+                crawler.set_contents_callback(self.process_new_contents)
         
         # 设置各平台爬虫的定时任务
         for crawler_name, crawler_conf in self.crawler_config.items():
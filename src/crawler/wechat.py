@@ -281,47 +281,22 @@ class WeChatCrawler(BaseCrawler):
         Returns:
             Content: 处理后的内容对象
         """
-        # 提取关键字和主题
-        # 这里可以使用LLM或其他NLP工具提取关键词和分类主题
-        # 简单实现：基于标题和内容的关键词提取
-        
-        title_keywords = set(re.findall(r'\w+', article_data['title']))
-        
-        # 初步设置keywords和topics
-        keywords = list(title_keywords)[:10]  # 限制关键词数量
-        topics = []
+        # 一次LLM调用得到摘要、关键词、主题、情感、实体和价值评估，
+        # 入库时即带有value_assessment，推送阶段无需再逐条评估
+        text = article_data['processed_text']
+        analysis = {
+            'summary': '',
+            'keywords': list(set(re.findall(r'\w+', article_data['title'])))[:10]  # 失败时退化为标题关键词
+        }
         
         try:
             from processor.llm_processor import LLMProcessor
             llm = LLMProcessor(config=self.config)
-            
-            # 使用LLM提取关键词和主题
-            prompt = f"""请分析以下文章内容，提取出5个关键词和3个主题分类。
-标题: {article_data['title']}
-内容摘要: {article_data['processed_text'][:500]}...
-
-以JSON格式返回，格式为:
-{{
-  "keywords": ["关键词1", "关键词2", ...],
-  "topics": ["主题1", "主题2", ...]
-}}
-"""
-            
-            llm_result = llm.understand_content(prompt)
-            
-            # 尝试解析LLM返回的结果
-            import json
-            try:
-                result_json = json.loads(llm_result)
-                keywords = result_json.get('keywords', keywords)
-                topics = result_json.get('topics', [])
-            except json.JSONDecodeError:
-                logger.warning("LLM返回结果解析失败，使用默认关键词和主题")
-                
+            analysis = llm.analyze_content(article_data['title'], text)
         except ImportError:
-            logger.warning("LLM处理器不可用，使用默认关键词和主题")
+            logger.warning("LLM处理器不可用，使用默认关键词")
         except Exception as e:
-            logger.warning(f"使用LLM提取关键词和主题时出错: {e}")
+            logger.warning(f"使用LLM分析内容时出错: {e}")
         
         # 创建内容对象
         content = Content(
@@ -333,8 +308,7 @@ class WeChatCrawler(BaseCrawler):
             publish_time=article_data['publish_time'],
             formatted_time=article_data['formatted_time'],
             crawl_time=article_data['crawl_time'],
-            topics=topics,
-            keywords=keywords,
+            **analysis,
             metadata={
                 'author': article_data['author'],
                 'word_count': len(article_data['processed_text']),
@@ -359,14 +333,17 @@ class WeChatCrawler(BaseCrawler):
                 article_list = self._search_account_articles(account)
                 logger.info(f"获取到{len(article_list)}篇文章")
                 
+                # 待批量写入的内容
+                pending_contents = []
+                
+                # 一次查询找出已经存在于数据库中的文章
+                existing_urls = self.db_manager.filter_existing_urls([article['link'] for article in article_list])
+                
                 # 对每篇文章进行处理
                 for article in article_list:
                     try:
-                        # 检查文章是否已经存在于数据库中
                         article_url = article['link']
-                        exists = self.db_manager.content_exists({'metadata.original_url': article_url})
-                        
-                        if exists:
+                        if article_url in existing_urls:
                             logger.info(f"文章已存在: {article['title']}，跳过")
                             continue
                             
@@ -381,11 +358,8 @@ class WeChatCrawler(BaseCrawler):
                         # 处理文章数据
                         content = self._process_article(article_data)
                         
-                        # 存储文章到数据库
-                        content_id = self.store_and_process_content(content.dict())
-                        logger.info(f"文章存储成功: {article['title']}, ID: {content_id}")
-                        
-                        total_articles += 1
+                        # 加入待写入列表，按公众号批量存储
+                        pending_contents.append(content.dict())
                         
                         # 随机等待，避免请求过快
                         time.sleep(random.uniform(3, 7))
@@ -393,6 +367,12 @@ class WeChatCrawler(BaseCrawler):
                     except Exception as e:
                         logger.error(f"处理文章时出错: {article['title']}, 错误: {e}")
                 
+                # 批量存储该公众号的文章
+                content_ids = self.store_and_process_contents(pending_contents)
+                stored_count = len([content_id for content_id in content_ids if content_id])
+                logger.info(f"公众号{account}文章存储完成，成功{stored_count}篇")
+                total_articles += stored_count
+                
                 # 不同公众号之间等待更长时间
                 time.sleep(random.uniform(10, 15))
                 
@@ -8,6 +8,22 @@ class BasePusher(ABC):
         """评估内容是否值得推送"""
         pass
     
+    def get_content_score(self, content):
+        """获取内容的价值评分
+        
+        优先使用入库时单次分析得到的value_assessment，旧数据没有评分时才调用LLM评估，
+        子类需提供self.llm。
+        """
+        assessment = content.get('value_assessment') if isinstance(content, dict) \
+            else getattr(content, 'value_assessment', None)
+        if assessment:
+            return assessment['overall_score'] if isinstance(assessment, dict) else assessment.overall_score
+        evaluation = self.llm.evaluate_content(
+            content,
+            criteria=["relevance", "timeliness", "importance", "uniqueness"]
+        )
+        return evaluation["score"]
+    
     @abstractmethod
     def push_content(self, content):
         """将内容推送到指定渠道"""
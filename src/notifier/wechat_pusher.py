@@ -27,11 +27,7 @@ class WeChatPusher(BasePusher):
     
     def evaluate_content_value(self, content):
         """评估内容价值"""
-        evaluation = self.llm.evaluate_content(
-            content,
-            criteria=["relevance", "timeliness", "importance", "uniqueness"]
-        )
-        return evaluation["score"] > 7.5  # 设定推送阈值
+        return self.get_content_score(content) > 7.5  # 设定推送阈值
     
     def push_content(self, content):
         """推送内容到微信"""
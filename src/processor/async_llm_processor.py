@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""异步LLM客户端
+
+AsyncLLMProcessor与LLMProcessor提供相同的方法（均为协程），请求并发执行，由以下机制
+控制在服务商配额之内:
+
+- max_in_flight: 同时进行中的请求数上限，配置位于 llm.async
+- 请求数与token数配额（llm.rate_limit）：与LLMProcessor共用按服务地址共享的限流器，
+  配置为redis后端时所有进程共享，见processor.rate_limiter；token数按请求估算，收到响应后
+  按实际用量校正
+- 限流(429)、超时和服务端错误按带抖动的指数退避重试；响应带Retry-After时按其等待，
+  并暂停共享限流器上的所有请求，避免其他协程继续触发429
+- 向量缓存与响应缓存（llm.response_cache）与LLMProcessor共用，两者对相同请求计算相同的键
+
+实例内的信号量绑定创建后首次使用的事件循环，一个事件循环使用一个实例。
+"""
+
+import json
+import random
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from openai import AsyncOpenAI, BadRequestError
+
+from config.config import Config
+from processor.embedding_cache import embedding_cache_key, get_embedding_cache
+from processor.llm_processor import (
+    ContentAnalysisError, build_analysis_messages, build_evaluation_messages, build_relationship_messages,
+    build_summary_messages, build_understand_messages, chunk_embedding_inputs, estimate_messages_tokens,
+    estimate_tokens, parse_content_analysis
+)
+from processor.rate_limiter import get_rate_limit_config, get_rate_limiter, is_retryable, parse_retry_after
+from processor.response_cache import DEFAULT_CACHED_METHODS, get_response_cache, response_cache_key
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncLLMProcessor:
+    def __init__(self, config_path='config.yml', config=None):
+        """初始化异步LLM处理器，读取配置
+
+        Args:
+            config_path: 配置文件路径，默认为'config.yml'
+            config: 已加载的配置对象，传入时忽略config_path
+        """
+        config = config or Config(config_path)
+        llm_config = config.get_llm_config()
+        async_config = llm_config.get('async', {})
+        base_url = llm_config.get('base_url', 'https://api.openai.com/v1')
+
+        # 重试由本类按Retry-After和限流器统一处理，关闭客户端自带的重试
+        self.client = AsyncOpenAI(api_key=llm_config.get('openai_api_key'), base_url=base_url, max_retries=0)
+        self.default_model = llm_config.get('default_model', 'gpt-4')
+        self.embedding_model = llm_config.get('embedding_model', 'text-embedding-ada-002')
+        self.max_tokens = llm_config.get('max_tokens', 1000)
+        analysis_config = llm_config.get('analysis', {})
+        self.analysis_max_input_chars = analysis_config.get('max_input_chars', 6000)
+        self.analysis_json_mode = analysis_config.get('json_mode', True)
+        self.embedding_cache = get_embedding_cache(llm_config.get('embedding_cache', {}))
+        response_cache_config = llm_config.get('response_cache', {})
+        self.response_cache = get_response_cache(response_cache_config)
+        self.response_cache_methods = set(response_cache_config.get('methods', DEFAULT_CACHED_METHODS))
+        embedding_batch = llm_config.get('embedding_batch', {})
+        self.embedding_batch_max_items = embedding_batch.get('max_items', 256)
+        self.embedding_batch_max_tokens = embedding_batch.get('max_tokens', 100000)
+
+        rate_limit_config = get_rate_limit_config(llm_config)
+        self.max_retries = rate_limit_config.get('max_retries', 5)
+        self.backoff_seconds = rate_limit_config.get('backoff_seconds', 1.0)
+        self.max_backoff_seconds = rate_limit_config.get('max_backoff_seconds', 60)
+        self.rate_limiter = get_rate_limiter(
+            base_url, rate_limit_config, config.get_cache_config().get('redis_url')
+        )
+        self._semaphore = asyncio.Semaphore(async_config.get('max_in_flight', 8))
+        logger.info("异步LLM处理器初始化成功")
+
+    def _backoff(self, attempt: int) -> float:
+        """带完全抖动的指数退避"""
+        return random.uniform(0, min(self.max_backoff_seconds, self.backoff_seconds * (2 ** attempt)))
+
+    async def _request(self, create, estimated_tokens: int, **kwargs):
+        """在并发和限流约束下发送请求，可重试的错误按退避重试"""
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire(estimated_tokens)
+            try:
+                async with self._semaphore:
+                    response = await create(**kwargs)
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.max_retries:
+                    raise
+                retry_after = parse_retry_after(e)
+                if retry_after is not None:
+                    delay = retry_after + random.uniform(0, self.backoff_seconds)
+                    await self.rate_limiter.apause(retry_after)
+                else:
+                    delay = self._backoff(attempt)
+                logger.warning(f"LLM请求失败，{delay:.1f}秒后第{attempt + 1}次重试: {e}")
+                await asyncio.sleep(delay)
+                continue
+
+            usage = getattr(response, "usage", None)
+            await self.rate_limiter.arecord_usage(estimated_tokens, getattr(usage, "total_tokens", None))
+            return response
+
+    async def _chat(self, method: str, messages: List[Dict[str, str]], max_tokens: Optional[int] = None,
+                    parse=None, bypass_cache: bool = False, cache_messages=None, **extra):
+        """发送对话请求，按配置读写响应缓存，参数含义同LLMProcessor._complete"""
+        parse = parse or (lambda raw: raw)
+        params = dict(extra)
+        if max_tokens:
+            params["max_tokens"] = max_tokens
+        cache = self.response_cache if method in self.response_cache_methods else None
+        cache_key = response_cache_key(self.default_model, cache_messages or messages, params) if cache else None
+        if cache_key and not bypass_cache:
+            raw = await asyncio.to_thread(cache.get, cache_key)
+            if raw is not None:
+                return parse(raw)
+
+        estimated = estimate_messages_tokens(messages) + (max_tokens or self.max_tokens)
+        response = await self._request(
+            self.client.chat.completions.create, estimated, model=self.default_model, messages=messages, **params
+        )
+        raw = response.choices[0].message.content
+        result = parse(raw)
+        if cache_key:
+            await asyncio.to_thread(cache.set, cache_key, raw)
+        return result
+
+    async def understand_content(self, content, bypass_cache=False):
+        """使用LLM理解内容"""
+        return await self._chat("understand_content", build_understand_messages(content),
+                                max_tokens=self.max_tokens, bypass_cache=bypass_cache)
+
+    async def generate_summary(self, content, bypass_cache=False):
+        """生成内容摘要"""
+        return await self._chat("generate_summary", build_summary_messages(content), bypass_cache=bypass_cache)
+
+    async def analyze_relationship(self, content1, content2, bypass_cache=False):
+        """分析两篇内容的关联关系"""
+        return await self._chat("analyze_relationship", build_relationship_messages(content1, content2),
+                                parse=json.loads, bypass_cache=bypass_cache)
+
+    async def evaluate_content(self, content, criteria=None, bypass_cache=False):
+        """评估内容的价值"""
+        return await self._chat("evaluate_content", build_evaluation_messages(content, criteria),
+                                parse=json.loads, bypass_cache=bypass_cache)
+
+    async def analyze_content(self, title, text, bypass_cache=False) -> Dict[str, Any]:
+        """一次调用完成摘要、关键词、主题、情感、实体和价值评估，格式不符时重试一次"""
+        original = messages = build_analysis_messages(title, text, self.analysis_max_input_chars)
+        extra = {"response_format": {"type": "json_object"}} if self.analysis_json_mode else {}
+        for attempt in range(2):
+            try:
+                analysis = await self._chat("analyze_content", messages, self.max_tokens,
+                                            parse=parse_content_analysis, bypass_cache=bypass_cache or attempt > 0,
+                                            cache_messages=original, **extra)
+                return analysis.to_content_fields(text)
+            except ContentAnalysisError as e:
+                if attempt:
+                    raise
+                logger.warning(f"内容分析结果不符合格式，重试: {e}")
+                messages = messages + [
+                    {"role": "assistant", "content": e.raw},
+                    {"role": "user", "content": f"输出不符合要求：{e}。请只返回符合格式的JSON。"}
+                ]
+
+    async def get_embedding(self, text):
+        """获取文本的向量表示，优先读取向量缓存"""
+        cache_key = embedding_cache_key(self.embedding_model, text) if self.embedding_cache else None
+        if cache_key:
+            vector = await asyncio.to_thread(self.embedding_cache.get, cache_key)
+            if vector is not None:
+                return vector
+
+        response = await self._request(
+            self.client.embeddings.create, estimate_tokens(text), model=self.embedding_model, input=text
+        )
+        vector = response.data[0].embedding
+        if cache_key:
+            await asyncio.to_thread(self.embedding_cache.set, cache_key, vector)
+        return vector
+
+    async def get_embeddings(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """批量获取文本的向量表示，各批并发请求，结果与输入顺序一致，失败的位置为None"""
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        pending: Dict[str, List[int]] = {}
+        for index, text in enumerate(texts):
+            key = embedding_cache_key(self.embedding_model, text)
+            if key in pending:
+                pending[key].append(index)
+                continue
+            vector = await asyncio.to_thread(self.embedding_cache.get, key) if self.embedding_cache else None
+            if vector is not None:
+                results[index] = vector
+            else:
+                pending[key] = [index]
+
+        keys = list(pending)
+        unique_texts = [texts[pending[key][0]] for key in keys]
+        chunks = chunk_embedding_inputs(unique_texts, self.embedding_batch_max_items, self.embedding_batch_max_tokens)
+        chunk_vectors = await asyncio.gather(*(self._embed_chunk([unique_texts[i] for i in chunk]) for chunk in chunks))
+        for chunk, vectors in zip(chunks, chunk_vectors):
+            for i, vector in zip(chunk, vectors):
+                if vector is None:
+                    continue
+                if self.embedding_cache:
+                    await asyncio.to_thread(self.embedding_cache.set, keys[i], vector)
+                for index in pending[keys[i]]:
+                    results[index] = vector
+        return results
+
+    async def _embed_chunk(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """请求一批文本的向量，请求无效时二分拆开以隔离出错的文本"""
+        try:
+            response = await self._request(
+                self.client.embeddings.create, sum(estimate_tokens(text) for text in texts),
+                model=self.embedding_model, input=texts
+            )
+        except BadRequestError as e:
+            if len(texts) == 1:
+                logger.error(f"向量化请求无效: {e}")
+                return [None]
+            middle = len(texts) // 2
+            first, second = await asyncio.gather(self._embed_chunk(texts[:middle]), self._embed_chunk(texts[middle:]))
+            return first + second
+        except Exception as e:
+            logger.error(f"批量向量化失败, 数量: {len(texts)}: {e}")
+            return [None] * len(texts)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    async def close(self):
+        """关闭HTTP连接"""
+        await self.client.close()
@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""基于变更流的增量内容处理
+
+ContentPipelineWorker监听contents集合的新增内容，按批生成向量并分析关系，不再依赖
+爬虫回调，因此通过API写入或回填的内容同样会被处理。覆盖已有内容不会重新处理和推送。
+
+- 副本集部署使用MongoDB change stream，每批处理完成后保存resume token，重启后从断点继续
+- 单机部署不支持change stream，退化为按服务端入库时间ingested_at轮询。_id由客户端生成，
+  多个爬虫并发写入时与提交顺序不一致，不能作为断点；入库时间也可能晚提交，因此每次从
+  断点前poll_overlap_seconds开始查询，并按最近已处理的_id去重
+
+处理语义为至少一次：一批处理完成后才保存断点，中途退出时该批会被重新处理。
+首次启动没有断点时从当前时刻开始，不会重新处理历史内容。
+"""
+
+import time
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
+
+from storage.content_schema import upgrade_content_doc
+from storage.database_manager import HOT_PROJECTION
+from storage.models import Content, VectorEmbedding
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINTS_COLLECTION = "pipeline_checkpoints"
+
+# 单机MongoDB不支持change stream时的错误码
+_CHANGE_STREAM_UNSUPPORTED = {40573}
+# resume token对应的oplog已被覆盖
+_CHANGE_STREAM_HISTORY_LOST = {286}
+
+
+def _utcnow() -> datetime:
+    """当前UTC时间，与pymongo读出的datetime一致不带时区"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _event_time(change: Dict[str, Any]) -> datetime:
+    """变更事件的服务端时间"""
+    cluster_time = change.get("clusterTime")
+    if cluster_time is None:
+        return _utcnow()
+    return cluster_time.as_datetime().replace(tzinfo=None)
+
+
+class ContentPipelineWorker:
+    """增量内容处理worker"""
+
+    def __init__(self, db_manager, analyzer=None, llm=None,
+                 on_processed: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+                 pipeline_config: Optional[Dict[str, Any]] = None, name: str = "content_pipeline"):
+        """初始化
+
+        Args:
+            db_manager: 数据库管理器
+            analyzer: 关系分析器，默认创建RelationshipAnalyzer
+            llm: LLM处理器，默认复用analyzer的实例
+            on_processed: 每条内容处理完成后的回调，参数为(内容ID, 内容字典)，例如推送通知
+            pipeline_config: 配置中的pipeline部分
+            name: 断点记录的名称，多个独立的worker需使用不同名称
+        """
+        pipeline_config = pipeline_config or {}
+        if analyzer is None:
+            from analyzer.relationship_analyzer import RelationshipAnalyzer
+            analyzer = RelationshipAnalyzer(db_manager=db_manager)
+
+        self.db_manager = db_manager
+        self.analyzer = analyzer
+        self.llm = llm or analyzer.llm
+        self.on_processed = on_processed
+        self.name = name
+        self.batch_size = pipeline_config.get('batch_size', 20)
+        self.max_wait_seconds = pipeline_config.get('max_wait_seconds', 5)
+        self.poll_interval_seconds = pipeline_config.get('poll_interval_seconds', 10)
+        self.backfill_batch_size = pipeline_config.get('backfill_batch_size', 500)
+        self.poll_overlap = timedelta(seconds=pipeline_config.get('poll_overlap_seconds', 60))
+        self.checkpoints = db_manager.db[CHECKPOINTS_COLLECTION]
+        self._stop = threading.Event()
+        # 已处理的最大服务端时间，以及重叠窗口内已处理的_id -> 服务端时间
+        self._since: Optional[datetime] = None
+        self._recent: Dict[ObjectId, datetime] = {}
+
+    def _load_checkpoint(self) -> Dict[str, Any]:
+        return self.checkpoints.find_one({"_id": self.name}) or {}
+
+    def _save_checkpoint(self, **fields):
+        self.checkpoints.update_one(
+            {"_id": self.name},
+            {"$set": {**fields, "updated_at": datetime.now()}},
+            upsert=True
+        )
+
+    def _restore_progress(self, checkpoint: Dict[str, Any]):
+        """从断点恢复轮询位置，兼容按_id记录的旧断点"""
+        since = checkpoint.get("since")
+        if since is None and checkpoint.get("last_id") is not None:
+            since = checkpoint["last_id"].generation_time.replace(tzinfo=None)
+        self._since = since or _utcnow()
+        self._recent = {entry["_id"]: entry["at"] for entry in checkpoint.get("recent", [])}
+
+    def _remember(self, entries: Iterable[Tuple[ObjectId, datetime]]):
+        """记录已处理的内容，只保留重叠窗口内的_id用于去重"""
+        for object_id, at in entries:
+            self._recent[object_id] = at
+            self._since = max(self._since, at)
+        cutoff = self._since - self.poll_overlap
+        self._recent = {object_id: at for object_id, at in self._recent.items() if at >= cutoff}
+
+    def _save_progress(self, **fields):
+        self._save_checkpoint(
+            since=self._since,
+            recent=[{"_id": object_id, "at": at} for object_id, at in self._recent.items()],
+            **fields
+        )
+
+    def process_batch(self, docs: List[Dict[str, Any]], analyze: bool = True) -> int:
+        """处理一批内容文档：批量生成向量，再逐条分析关系并触发回调
+
+        单条内容失败只记录日志，不影响同批次其他内容。
+
+        Args:
+            docs: contents集合中的文档
+            analyze: 是否分析关系并触发回调，回填向量时为False
+
+        Returns:
+            int: 成功生成向量的内容数量
+        """
+        contents = []
+        for doc in docs:
+            doc = dict(doc)
+            upgrade_content_doc(doc)
+            doc["id"] = str(doc.pop("_id"))
+            doc.pop("original_content", None)
+            try:
+                contents.append(Content(**doc))
+            except Exception as e:
+                logger.error(f"解析内容失败, ID: {doc['id']}: {e}")
+
+        processed = self.process_contents(contents, analyze=analyze)
+        logger.info(f"增量处理完成一批, 内容: {len(docs)}, 生成向量: {processed}")
+        return processed
+
+    def process_contents(self, contents: List[Content], analyze: bool = True) -> int:
+        """为已存储的内容批量生成并写入向量，再逐条分析关系并触发回调
+
+        未启用pipeline时，爬虫回调也通过该方法处理新内容。
+
+        Args:
+            contents: 已存储的内容，id不能为空
+            analyze: 是否分析关系并触发回调
+
+        Returns:
+            int: 成功生成向量的内容数量
+        """
+        # 一批内容只需少数几次向量化请求
+        vectors = self.llm.get_embeddings([content.processed_text for content in contents])
+        embedded = []
+        for content, vector in zip(contents, vectors):
+            if vector is None:
+                logger.error(f"生成向量失败, ID: {content.id}")
+                continue
+            embedded.append((content, vector))
+        if embedded:
+            self.db_manager.store_vectors_bulk(
+                [VectorEmbedding(content_id=content.id, vector=vector) for content, vector in embedded]
+            )
+
+        # 关系分析依赖向量检索，需在向量写入后执行；复用已生成的向量，不再逐条请求
+        for content, vector in embedded:
+            if not analyze:
+                continue
+            try:
+                self.analyzer.analyze_connections(content.id, vector=vector)
+                if self.on_processed:
+                    self.on_processed(content.id, content.dict())
+            except Exception as e:
+                logger.error(f"分析内容失败, ID: {content.id}: {e}")
+
+        return len(embedded)
+
+    def backfill_embeddings(self, query: Optional[Dict[str, Any]] = None,
+                            batch_size: Optional[int] = None) -> Dict[str, int]:
+        """按_id顺序为已有内容重新生成向量，用于更换向量模型或补齐缺失的向量
+
+        只写入向量，不做关系分析和通知。
+
+        Args:
+            query: 需要回填的内容条件，默认全部内容
+            batch_size: 每批处理的内容数量，默认使用配置中的pipeline.backfill_batch_size
+
+        Returns:
+            Dict: {"contents": 处理的内容数量, "embedded": 成功生成向量的数量}
+        """
+        batch_size = batch_size or self.backfill_batch_size
+        report = {"contents": 0, "embedded": 0}
+        last_id = None
+        while True:
+            batch_query = dict(query or {})
+            if last_id is not None:
+                batch_query["_id"] = {"$gt": last_id}
+            docs = list(
+                self.db_manager.contents.find(batch_query, HOT_PROJECTION)
+                .sort("_id", ASCENDING)
+                .limit(batch_size)
+            )
+            if not docs:
+                break
+            report["embedded"] += self.process_batch(docs, analyze=False)
+            report["contents"] += len(docs)
+            last_id = docs[-1]["_id"]
+            logger.info(f"已回填向量 {report['embedded']}/{report['contents']}")
+        return report
+
+    def _watch(self, resume_token=None):
+        """消费change stream，直到停止或出错
+
+        只处理insert事件：替换已有内容（store_content传入已有ID）不重新处理和推送。
+        """
+        pipeline = [{"$match": {"operationType": "insert"}}]
+        with self.db_manager.contents.watch(pipeline, resume_after=resume_token, max_await_time_ms=500) as stream:
+            logger.info("已开始监听contents变更流")
+            batch: List[Dict[str, Any]] = []
+            times: List[datetime] = []
+            deadline = 0.0
+            while not self._stop.is_set():
+                change = stream.try_next()
+                doc = change.get("fullDocument") if change is not None else None
+                if doc and doc["_id"] not in self._recent:
+                    if not batch:
+                        deadline = time.monotonic() + self.max_wait_seconds
+                    batch.append(doc)
+                    times.append(_event_time(change))
+
+                # 没有更多待读事件、攒满一批或等待超时时处理
+                if batch and (change is None or len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                    self.process_batch(batch)
+                    self._remember((doc["_id"], at) for doc, at in zip(batch, times))
+                    self._save_progress(resume_token=stream.resume_token)
+                    batch, times = [], []
+
+    def _poll(self, catch_up_only: bool = False):
+        """按服务端入库时间轮询新内容，catch_up_only为True时处理完积压即返回"""
+        logger.info(f"轮询contents新内容, 起始时间: {self._since}")
+        while not self._stop.is_set():
+            query: Dict[str, Any] = {"ingested_at": {"$gte": self._since - self.poll_overlap}}
+            if self._recent:
+                query["_id"] = {"$nin": list(self._recent)}
+            docs = list(
+                self.db_manager.contents.find(query, HOT_PROJECTION)
+                .sort([("ingested_at", ASCENDING), ("_id", ASCENDING)])
+                .limit(self.batch_size)
+            )
+            if not docs:
+                if catch_up_only:
+                    break
+                self._stop.wait(self.poll_interval_seconds)
+                continue
+
+            self.process_batch(docs)
+            self._remember((doc["_id"], doc["ingested_at"]) for doc in docs)
+            self._save_progress()
+
+    def run(self):
+        """运行worker直到调用stop"""
+        checkpoint = self._load_checkpoint()
+        resume_token = checkpoint.get("resume_token")
+        self._restore_progress(checkpoint)
+
+        while not self._stop.is_set():
+            try:
+                self._watch(resume_token)
+            except OperationFailure as e:
+                if e.code in _CHANGE_STREAM_UNSUPPORTED:
+                    logger.info("MongoDB不支持change stream，改为轮询")
+                    self._poll()
+                    return
+                if e.code in _CHANGE_STREAM_HISTORY_LOST:
+                    # 断点已过期，先按入库时间补处理积压内容，再从当前位置重新监听
+                    logger.warning("变更流断点已失效，补处理积压内容后重新监听")
+                    self._poll(catch_up_only=True)
+                    resume_token = None
+                    self._save_progress(resume_token=None)
+                    continue
+                raise
+            except Exception as e:
+                logger.error(f"监听变更流出错，{self.poll_interval_seconds}秒后重试: {e}")
+                self._stop.wait(self.poll_interval_seconds)
+                checkpoint = self._load_checkpoint()
+                resume_token = checkpoint.get("resume_token", resume_token)
+
+    def start(self) -> threading.Thread:
+        """在后台线程中运行worker"""
+        thread = threading.Thread(target=self.run, name=self.name, daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        """停止worker，当前批次处理完成后退出"""
+        self._stop.set()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""按内容寻址的持久化向量缓存
+
+同一模型对同一文本的向量是确定的，以 hash(模型名 + 规范化文本) 为键缓存在本地SQLite文件中，
+进程重启后仍然有效。LLMProcessor.get_embedding在调用API前先查询缓存，关系分析对已入库
+内容的重复向量化、相同搜索词的重复请求都不再产生API调用。
+
+配置位于 llm.embedding_cache:
+
+    embedding_cache:
+      enabled: true
+      path: "data/embedding_cache.sqlite3"
+      max_entries: 200000   # 超出后淘汰最久未使用的条目
+
+向量以float32存储，1536维的向量每条约6KB。
+"""
+
+import array
+import hashlib
+import unicodedata
+from typing import Any, Dict, List, Optional
+
+from storage.sqlite_cache import SQLiteCache, open_sqlite_cache
+
+
+def normalize_text(text: str) -> str:
+    """规范化文本：统一Unicode形式并合并空白"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def embedding_cache_key(model: str, text: str) -> str:
+    """向量缓存的键"""
+    return hashlib.sha256(f"{model}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+def _encode_vector(vector: List[float]) -> bytes:
+    return array.array("f", vector).tobytes()
+
+
+def _decode_vector(data: bytes) -> List[float]:
+    return array.array("f", data).tolist()
+
+
+class DiskEmbeddingCache(SQLiteCache):
+    """基于SQLite的向量缓存，向量以float32存储，按最近使用时间淘汰，永不过期"""
+
+    def __init__(self, path: str, max_entries: int = 200000):
+        """初始化缓存
+
+        Args:
+            path: SQLite文件路径，目录不存在时自动创建
+            max_entries: 最大条目数
+        """
+        super().__init__(path, max_entries, encode=_encode_vector, decode=_decode_vector, name="向量缓存")
+
+
+def get_embedding_cache(cache_config: Dict[str, Any]) -> Optional[DiskEmbeddingCache]:
+    """按配置获取向量缓存，同一进程内按路径复用，未启用时返回None
+
+    Args:
+        cache_config: 配置中的llm.embedding_cache部分
+    """
+    if not cache_config.get('enabled', False):
+        return None
+
+    return open_sqlite_cache(
+        cache_config.get('path', 'data/embedding_cache.sqlite3'),
+        lambda path: DiskEmbeddingCache(path, max_entries=cache_config.get('max_entries', 200000))
+    )
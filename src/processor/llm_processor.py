@@ -1,130 +1,425 @@
-from openai import OpenAI
+from openai import OpenAI, BadRequestError
 
+import json
+import time
+import random
 import logging
+from typing import Any, Dict, List, Optional
 from config.config import Config
+from processor.embedding_cache import embedding_cache_key, get_embedding_cache
+from processor.rate_limiter import get_rate_limit_config, get_rate_limiter, is_retryable, parse_retry_after
+from processor.response_cache import DEFAULT_CACHED_METHODS, get_response_cache, response_cache_key
+from storage.models import ContentAnalysis
 
 logger = logging.getLogger(__name__)
 
+
+def estimate_tokens(text):
+    """粗略估计文本的token数：中日韩字符按每字1个token，其余按每4个字符1个token"""
+    cjk = sum(1 for char in text if char >= '\u2e80')
+    return cjk + (len(text) - cjk) // 4 + 1
+
+
+def chunk_embedding_inputs(texts, max_items, max_tokens):
+    """按单次请求的条数和token上限切分输入，返回下标列表，保持原有顺序
+    
+    单条超过token上限的文本单独成批，由服务端决定是否截断或报错。
+    """
+    chunks = []
+    current, current_tokens = [], 0
+    for index, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if current and (len(current) >= max_items or current_tokens + tokens > max_tokens):
+            chunks.append(current)
+            current, current_tokens = [], 0
+        current.append(index)
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def estimate_messages_tokens(messages):
+    """粗略估计对话消息的token数"""
+    return sum(estimate_tokens(message["content"]) for message in messages)
+
+
+def build_understand_messages(content):
+    """理解内容的对话消息"""
+    return [
+        {"role": "system", "content": "你是一个信息分析助手，负责理解和提炼内容要点。"},
+        {"role": "user", "content": f"请分析以下内容，提取核心观点、主题分类、情感倾向：\n\n{content}"}
+    ]
+
+
+def build_summary_messages(content):
+    """生成摘要的对话消息"""
+    return [
+        {"role": "system", "content": "你是一个摘要生成助手。"},
+        {"role": "user", "content": f"请为以下内容生成不超过100字的摘要：\n\n{content}"}
+    ]
+
+
+def build_relationship_messages(content1, content2):
+    """分析两篇内容关联关系的对话消息"""
+    prompt = f"""
+        请分析以下两篇内容之间的关联关系:
+        
+        内容1：{content1['title']}
+        {content1['processed_text']}
+        
+        内容2：{content2['title']}
+        {content2['processed_text']}
+        
+        请分析它们是否存在关联，关联类型是什么，以及关联的具体描述。按照JSON格式返回结果：
+        {{
+            "has_relation": true/false,
+            "relation_type": "因果关系/时序关系/主题相关/...",
+            "description": "具体关联描述"
+        }}
+        """
+    return [
+        {"role": "system", "content": "你是一个内容关联分析助手。"},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def build_evaluation_messages(content, criteria=None):
+    """评估内容价值的对话消息"""
+    if criteria is None:
+        criteria = ["relevance", "timeliness", "importance", "uniqueness"]
+        
+    prompt = f"""
+        请评估以下内容的价值，评分标准包括：{', '.join(criteria)}
+        
+        内容：{content['title']}
+        {content['processed_text']}
+        
+        请给出1-10的评分，并简要说明理由。按照JSON格式返回结果：
+        {{
+            "score": 8.5,
+            "reason": "评分理由",
+            "criteria_scores": {{
+                "relevance": 9,
+                "timeliness": 8,
+                ...
+            }}
+        }}
+        """
+    return [
+        {"role": "system", "content": "你是一个内容价值评估助手。"},
+        {"role": "user", "content": prompt}
+    ]
+
+
+ANALYSIS_SCHEMA = """{
+  "summary": "不超过100字的摘要",
+  "keywords": ["关键词1", "关键词2", "关键词3", "关键词4", "关键词5"],
+  "topics": ["主题1", "主题2", "主题3"],
+  "sentiment": {"score": -1到1之间的小数, "label": "positive/negative/neutral", "emotions": {"joy": 0到1}},
+  "entities": [{"text": "实体原文", "type": "PERSON/ORG/LOCATION/PRODUCT/EVENT/OTHER"}],
+  "value_assessment": {"overall_score": 1到10, "relevance": 1到10, "timeliness": 1到10, "importance": 1到10, "uniqueness": 1到10}
+}"""
+
+
+def build_analysis_messages(title, text, max_chars=None):
+    """一次完成摘要、关键词、主题、情感、实体和价值评估的对话消息
+    
+    Args:
+        title: 标题
+        text: 正文
+        max_chars: 正文最多发送的字符数，为None时不截断
+    """
+    if max_chars and len(text) > max_chars:
+        text = text[:max_chars]
+    return [
+        {"role": "system", "content": "你是一个信息分析助手，只输出符合要求的JSON，不输出其他内容。"},
+        {"role": "user", "content": f"请分析以下文章，按如下JSON格式返回分析结果：\n{ANALYSIS_SCHEMA}\n\n"
+                                    f"标题：{title}\n正文：\n{text}"}
+    ]
+
+
+class ContentAnalysisError(ValueError):
+    """分析结果不符合格式，raw为模型的原始输出"""
+    
+    def __init__(self, message, raw):
+        super().__init__(message)
+        self.raw = raw
+
+
+def parse_content_analysis(raw: str) -> ContentAnalysis:
+    """解析并校验分析结果，兼容模型用```json代码块包裹的输出
+    
+    Raises:
+        ContentAnalysisError: 不是合法JSON或不符合ContentAnalysis结构
+    """
+    text = raw.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        text = text[text.index("\n") + 1:] if "\n" in text else text
+    try:
+        return ContentAnalysis(**json.loads(text))
+    except Exception as e:
+        raise ContentAnalysisError(f"内容分析结果不符合格式: {e}", raw) from e
+
+
 class LLMProcessor:
-    def __init__(self, config_path='config.yml'):
+    def __init__(self, config_path='config.yml', config=None):
         """初始化LLM处理器，读取配置
         
         Args:
             config_path: 配置文件路径，默认为'config.yml'
+            config: 已加载的配置对象，传入时忽略config_path
         """
         try:
             # 加载配置
-            config = Config(config_path)
+            config = config or Config(config_path)
             # 获取LLM配置部分
             llm_config = config.get_llm_config()
+            base_url = llm_config.get('base_url', 'https://api.openai.com/v1')
             
+            # 重试由本类按Retry-After和限流器统一处理，关闭客户端自带的重试
             self.client = OpenAI(
                 api_key=llm_config.get('openai_api_key'),
-                base_url=llm_config.get('base_url', 'https://api.openai.com/v1')
+                base_url=base_url,
+                max_retries=0
             )
             # 可选：设置模型参数
             self.default_model = llm_config.get('default_model', 'gpt-4')
             self.embedding_model = llm_config.get('embedding_model', 'text-embedding-ada-002')
             self.max_tokens = llm_config.get('max_tokens', 1000)
+            # 单次内容分析
+            analysis_config = llm_config.get('analysis', {})
+            self.analysis_max_input_chars = analysis_config.get('max_input_chars', 6000)
+            self.analysis_json_mode = analysis_config.get('json_mode', True)
+            # 持久化向量缓存，未启用时为None
+            self.embedding_cache = get_embedding_cache(llm_config.get('embedding_cache', {}))
+            # 持久化响应缓存，未启用时为None
+            response_cache_config = llm_config.get('response_cache', {})
+            self.response_cache = get_response_cache(response_cache_config)
+            self.response_cache_methods = set(response_cache_config.get('methods', DEFAULT_CACHED_METHODS))
+            # 批量向量化的单次请求上限与重试
+            embedding_batch = llm_config.get('embedding_batch', {})
+            self.embedding_batch_max_items = embedding_batch.get('max_items', 256)
+            self.embedding_batch_max_tokens = embedding_batch.get('max_tokens', 100000)
+            self.embedding_batch_max_retries = embedding_batch.get('max_retries', 3)
+            self.embedding_batch_backoff_seconds = embedding_batch.get('backoff_seconds', 1.0)
+            # 请求数与token数限流，与AsyncLLMProcessor共用同一服务地址的限流器
+            rate_limit_config = get_rate_limit_config(llm_config)
+            self.max_retries = rate_limit_config.get('max_retries', 5)
+            self.backoff_seconds = rate_limit_config.get('backoff_seconds', 1.0)
+            self.max_backoff_seconds = rate_limit_config.get('max_backoff_seconds', 60)
+            self.rate_limiter = get_rate_limiter(
+                base_url, rate_limit_config, config.get_cache_config().get('redis_url')
+            )
 
             logger.info("LLM处理器初始化成功")
         except Exception as e:
             logger.error(f"初始化LLM处理器失败: {e}")
             raise
         
-    def understand_content(self, content):
+    def _complete(self, method, messages, parse=None, bypass_cache=False, cache_messages=None, **params):
+        """发送对话请求，按配置读写响应缓存
+        
+        Args:
+            method: 调用方法名，决定是否启用缓存
+            messages: 对话消息
+            parse: 响应解析函数，解析失败时抛出异常且不写入缓存
+            bypass_cache: 为True时跳过读取缓存，新的响应仍会写入
+            cache_messages: 计算缓存键使用的消息，默认为messages
+            params: 其他请求参数，参与计算缓存键
+        """
+        parse = parse or (lambda raw: raw)
+        cache = self.response_cache if method in self.response_cache_methods else None
+        cache_key = response_cache_key(self.default_model, cache_messages or messages, params) if cache else None
+        if cache_key and not bypass_cache:
+            raw = cache.get(cache_key)
+            if raw is not None:
+                return parse(raw)
+        
+        estimated = estimate_messages_tokens(messages) + params.get('max_tokens', self.max_tokens)
+        response = self._request(self.client.chat.completions.create, estimated,
+                                 model=self.default_model, messages=messages, **params)
+        raw = response.choices[0].message.content
+        result = parse(raw)
+        if cache_key:
+            cache.set(cache_key, raw)
+        return result
+    
+    def _request(self, create, estimated_tokens, **kwargs):
+        """在限流约束下发送请求，限流、超时和服务端错误按Retry-After或指数退避重试"""
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.wait(estimated_tokens)
+            try:
+                response = create(**kwargs)
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.max_retries:
+                    raise
+                retry_after = parse_retry_after(e)
+                if retry_after is not None:
+                    # 暂停共享限流器上的所有请求，避免其他线程和进程继续触发429
+                    self.rate_limiter.pause(retry_after)
+                    delay = retry_after + random.uniform(0, self.backoff_seconds)
+                else:
+                    delay = random.uniform(0, min(self.max_backoff_seconds, self.backoff_seconds * (2 ** attempt)))
+                logger.warning(f"LLM请求失败，{delay:.1f}秒后第{attempt + 1}次重试: {e}")
+                time.sleep(delay)
+                continue
+            
+            usage = getattr(response, "usage", None)
+            self.rate_limiter.record_usage(estimated_tokens, getattr(usage, "total_tokens", None))
+            return response
+    
+    def understand_content(self, content, bypass_cache=False):
         """使用LLM理解内容"""
-        response = self.client.chat.completions.create(
-            model=self.default_model,
-            messages=[
-                {"role": "system", "content": "你是一个信息分析助手，负责理解和提炼内容要点。"},
-                {"role": "user", "content": f"请分析以下内容，提取核心观点、主题分类、情感倾向：\n\n{content}"}
-            ],
-            max_tokens=self.max_tokens
-        )
-        return response.choices[0].message['content']
+        return self._complete("understand_content", build_understand_messages(content),
+                              bypass_cache=bypass_cache, max_tokens=self.max_tokens)
     
-    def generate_summary(self, content):
+    def generate_summary(self, content, bypass_cache=False):
         """生成内容摘要"""
-        response = self.client.chat.completions.create(
-            model=self.default_model,
-            messages=[
-                {"role": "system", "content": "你是一个摘要生成助手。"},
-                {"role": "user", "content": f"请为以下内容生成不超过100字的摘要：\n\n{content}"}
-            ]
-        )
-        return response.choices[0].message['content']
+        return self._complete("generate_summary", build_summary_messages(content), bypass_cache=bypass_cache)
         
-    def get_embedding(self, text):
-        """获取文本的向量表示"""
-        response = self.client.embeddings.create(
-            model=self.embedding_model,
-            input=text
-        )
-        return response['data'][0]['embedding']
+    def analyze_content(self, title, text, bypass_cache=False) -> Dict[str, Any]:
+        """一次调用完成摘要、关键词、主题、情感、实体和价值评估
         
-    def analyze_relationship(self, content1, content2):
-        """分析两篇内容的关联关系"""
-        prompt = f"""
-        请分析以下两篇内容之间的关联关系:
-        
-        内容1：{content1['title']}
-        {content1['processed_text']}
-        
-        内容2：{content2['title']}
-        {content2['processed_text']}
+        输出不符合格式时将错误反馈给模型重试一次。
         
-        请分析它们是否存在关联，关联类型是什么，以及关联的具体描述。按照JSON格式返回结果：
-        {{
-            "has_relation": true/false,
-            "relation_type": "因果关系/时序关系/主题相关/...",
-            "description": "具体关联描述"
-        }}
+        Args:
+            title: 标题
+            text: 正文
+            bypass_cache: 为True时跳过读取响应缓存
+            
+        Returns:
+            Dict: 可直接传给Content的字段（summary/keywords/topics/sentiment/entities/value_assessment）
+            
+        Raises:
+            ValueError: 重试后仍不符合格式
         """
+        original = messages = build_analysis_messages(title, text, self.analysis_max_input_chars)
+        kwargs = {"response_format": {"type": "json_object"}} if self.analysis_json_mode else {}
+        # 重试得到的合格响应按原始请求缓存，重放时直接命中
+        for attempt in range(2):
+            try:
+                analysis = self._complete("analyze_content", messages, parse=parse_content_analysis,
+                                          bypass_cache=bypass_cache or attempt > 0, cache_messages=original,
+                                          max_tokens=self.max_tokens, **kwargs)
+                return analysis.to_content_fields(text)
+            except ContentAnalysisError as e:
+                if attempt:
+                    raise
+                logger.warning(f"内容分析结果不符合格式，重试: {e}")
+                messages = messages + [
+                    {"role": "assistant", "content": e.raw},
+                    {"role": "user", "content": f"输出不符合要求：{e}。请只返回符合格式的JSON。"}
+                ]
+    
+    def get_embedding(self, text):
+        """获取文本的向量表示，优先读取向量缓存"""
+        cache_key = embedding_cache_key(self.embedding_model, text) if self.embedding_cache else None
+        if cache_key:
+            vector = self.embedding_cache.get(cache_key)
+            if vector is not None:
+                return vector
         
-        response = self.client.chat.completions.create(
-            model=self.default_model,
-            messages=[
-                {"role": "system", "content": "你是一个内容关联分析助手。"},
-                {"role": "user", "content": prompt}
-            ]
+        response = self._request(
+            self.client.embeddings.create, estimate_tokens(text),
+            model=self.embedding_model, input=text
         )
+        vector = response.data[0].embedding
+        if cache_key:
+            self.embedding_cache.set(cache_key, vector)
+        return vector
+    
+    def get_embeddings(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """批量获取文本的向量表示，结果与输入顺序一致
         
-        # 解析返回的JSON
-        import json
-        return json.loads(response.choices[0].message['content'])
+        先查询向量缓存并合并重复文本，其余文本按embedding_batch的条数和token上限切分，
+        每次请求发送一批。某一批失败时只重试该批，失败的文本在结果中为None，不影响其他批次。
         
-    def evaluate_content(self, content, criteria=None):
-        """评估内容的价值"""
-        if criteria is None:
-            criteria = ["relevance", "timeliness", "importance", "uniqueness"]
+        Args:
+            texts: 文本列表
             
-        prompt = f"""
-        请评估以下内容的价值，评分标准包括：{', '.join(criteria)}
+        Returns:
+            List: 向量列表，失败的位置为None
+        """
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        # 规范化后相同的文本只请求一次：缓存键 -> 输入下标列表
+        pending = {}
+        for index, text in enumerate(texts):
+            key = embedding_cache_key(self.embedding_model, text)
+            if key in pending:
+                pending[key].append(index)
+                continue
+            vector = self.embedding_cache.get(key) if self.embedding_cache else None
+            if vector is not None:
+                results[index] = vector
+            else:
+                pending[key] = [index]
         
-        内容：{content['title']}
-        {content['processed_text']}
+        keys = list(pending)
+        unique_texts = [texts[pending[key][0]] for key in keys]
+        for chunk in chunk_embedding_inputs(unique_texts, self.embedding_batch_max_items,
+                                            self.embedding_batch_max_tokens):
+            vectors = self._embed_with_retry([unique_texts[i] for i in chunk])
+            for i, vector in zip(chunk, vectors):
+                if vector is None:
+                    continue
+                if self.embedding_cache:
+                    self.embedding_cache.set(keys[i], vector)
+                for index in pending[keys[i]]:
+                    results[index] = vector
         
-        请给出1-10的评分，并简要说明理由。按照JSON格式返回结果：
-        {{
-            "score": 8.5,
-            "reason": "评分理由",
-            "criteria_scores": {{
-                "relevance": 9,
-                "timeliness": 8,
-                ...
-            }}
-        }}
+        logger.info(f"批量向量化完成, 文本: {len(texts)}, 请求: {len(unique_texts)}, "
+                    f"失败: {sum(1 for vector in results if vector is None)}")
+        return results
+    
+    def _embed_with_retry(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """请求一批文本的向量
+        
+        网络错误、限流等临时错误按指数退避重试该批，响应带Retry-After时按其等待；请求本身无效
+        （例如某条文本超长）时重试没有意义，二分拆开以隔离出错的文本。
         """
+        estimated = sum(estimate_tokens(text) for text in texts)
+        for attempt in range(self.embedding_batch_max_retries + 1):
+            self.rate_limiter.wait(estimated)
+            try:
+                response = self.client.embeddings.create(model=self.embedding_model, input=texts)
+                usage = getattr(response, "usage", None)
+                self.rate_limiter.record_usage(estimated, getattr(usage, "total_tokens", None))
+                # 按返回的index还原输入顺序
+                return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+            except BadRequestError as e:
+                if len(texts) == 1:
+                    logger.error(f"向量化请求无效: {e}")
+                    return [None]
+                middle = len(texts) // 2
+                return self._embed_with_retry(texts[:middle]) + self._embed_with_retry(texts[middle:])
+            except Exception as e:
+                if attempt == self.embedding_batch_max_retries:
+                    logger.error(f"批量向量化失败, 数量: {len(texts)}: {e}")
+                    return [None] * len(texts)
+                delay = self.embedding_batch_backoff_seconds * (2 ** attempt)
+                retry_after = parse_retry_after(e)
+                if retry_after is not None:
+                    self.rate_limiter.pause(retry_after)
+                    delay = max(delay, retry_after)
+                logger.warning(f"批量向量化失败，{delay:.1f}秒后第{attempt + 1}次重试: {e}")
+                time.sleep(delay)
+    
+    def get_embedding_cache_stats(self):
+        """向量缓存的命中统计，未启用时返回None"""
+        return self.embedding_cache.stats() if self.embedding_cache else None
+    
+    def get_response_cache_stats(self):
+        """响应缓存的命中统计，未启用时返回None"""
+        return self.response_cache.stats() if self.response_cache else None
         
-        response = self.client.chat.completions.create(
-            model=self.default_model,
-            messages=[
-                {"role": "system", "content": "你是一个内容价值评估助手。"},
-                {"role": "user", "content": prompt}
-            ]
-        )
+    def analyze_relationship(self, content1, content2, bypass_cache=False):
+        """分析两篇内容的关联关系"""
+        return self._complete("analyze_relationship", build_relationship_messages(content1, content2),
+                              parse=json.loads, bypass_cache=bypass_cache)
         
-        # 解析返回的JSON
-        import json
-        return json.loads(response.choices[0].message['content']) 
\ No newline at end of file
+    def evaluate_content(self, content, criteria=None, bypass_cache=False):
+        """评估内容的价值"""
+        return self._complete("evaluate_content", build_evaluation_messages(content, criteria),
+                              parse=json.loads, bypass_cache=bypass_cache)
@@ -0,0 +1,334 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""LLM请求限流与重试判定
+
+LLMProcessor与AsyncLLMProcessor共用，按服务地址共享请求数(RPM)与token数(TPM)配额:
+
+- memory: 令牌桶保存在进程内，配额按进程计算。多个进程（多个uvicorn worker、爬虫调度器、
+  pipeline worker）访问同一服务时，需将配额除以进程数
+- redis: 令牌桶保存在Redis中，用Lua脚本原子地扣减，所有进程共享同一配额；Retry-After
+  要求的暂停同样对所有进程生效。Redis不可用时退化为进程内限流
+
+配置位于 llm.rate_limit:
+
+    rate_limit:
+      backend: "memory"
+      redis_url: "redis://localhost:6379/1"  # 未配置时复用cache.redis_url
+      requests_per_minute: 500
+      tokens_per_minute: 150000
+      max_retries: 5
+      backoff_seconds: 1.0
+      max_backoff_seconds: 60
+
+兼容旧配置：未在rate_limit中配置的配额与重试参数读取llm.async下的同名配置。
+"""
+
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional
+
+from openai import APIConnectionError, APIStatusError
+
+from storage.cache import KEY_PREFIX, _get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# 可重试的HTTP状态码
+_RETRYABLE_STATUS = {408, 409, 429}
+
+# 可从llm.async继承的旧配置项
+_LEGACY_KEYS = ("requests_per_minute", "tokens_per_minute", "max_retries", "backoff_seconds", "max_backoff_seconds")
+
+# 令牌桶在Redis中的过期时间，空闲超过一分钟的桶已回满，过期后按满桶重建
+_BUCKET_TTL_SECONDS = 120
+
+# KEYS: 暂停标记, 各令牌桶; ARGV: 是否强制扣减, 各桶的(每分钟容量, 扣减数量)
+# 所有桶都满足时一起扣减并返回0，否则不扣减，返回需要等待的秒数（字符串，避免Lua数字被截断为整数）
+_RESERVE_SCRIPT = """
+local pause = redis.call('PTTL', KEYS[1])
+if ARGV[1] ~= '1' and pause > 0 then
+  return tostring(pause / 1000)
+end
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local levels = {}
+local wait = 0
+for i = 2, #KEYS do
+  local capacity = tonumber(ARGV[i * 2 - 2])
+  local amount = tonumber(ARGV[i * 2 - 1])
+  local state = redis.call('HMGET', KEYS[i], 'tokens', 'updated_at')
+  local tokens = tonumber(state[1]) or capacity
+  local updated = tonumber(state[2]) or now
+  tokens = math.min(capacity, tokens + math.max(0, now - updated) * capacity / 60)
+  levels[i] = tokens
+  if ARGV[1] ~= '1' and tokens < amount then
+    wait = math.max(wait, (amount - tokens) * 60 / capacity)
+  end
+end
+for i = 2, #KEYS do
+  local tokens = levels[i]
+  if wait == 0 then
+    tokens = math.min(tonumber(ARGV[i * 2 - 2]), tokens - tonumber(ARGV[i * 2 - 1]))
+  end
+  redis.call('HSET', KEYS[i], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+  redis.call('EXPIRE', KEYS[i], ARGV[#ARGV])
+end
+return tostring(wait)
+"""
+
+# KEYS: 暂停标记; ARGV: 暂停毫秒数。只延长不缩短
+_PAUSE_SCRIPT = """
+if redis.call('PTTL', KEYS[1]) < tonumber(ARGV[1]) then
+  redis.call('SET', KEYS[1], '1', 'PX', ARGV[1])
+end
+return 1
+"""
+
+
+def get_rate_limit_config(llm_config: Dict[str, Any]) -> Dict[str, Any]:
+    """合并llm.rate_limit与llm.async中的旧配置项"""
+    rate_limit_config = dict(llm_config.get('rate_limit', {}))
+    async_config = llm_config.get('async', {})
+    for key in _LEGACY_KEYS:
+        if key not in rate_limit_config and key in async_config:
+            rate_limit_config[key] = async_config[key]
+    return rate_limit_config
+
+
+class TokenBucket:
+    """按分钟配额匀速补充的令牌桶，可在多个事件循环/线程间共享"""
+
+    def __init__(self, capacity_per_minute: float):
+        self.capacity = float(capacity_per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self, amount: float) -> float:
+        """尝试取出令牌，成功返回0，否则返回需要等待的秒数
+
+        超过桶容量的请求按容量计，避免永远无法满足。
+        """
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return 0.0
+            return (amount - self.tokens) / self.rate
+
+    def adjust(self, delta: float):
+        """按实际用量校正：delta为正表示多扣，为负表示退还"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class RateLimiter:
+    """进程内的请求数与token数组合限流，并支持按Retry-After整体暂停
+
+    reserve/record_usage/pause由子类替换存储位置；wait供同步客户端阻塞等待，
+    acquire/arecord_usage/apause供协程使用，进程内限流直接执行。
+    """
+
+    def __init__(self, requests_per_minute: Optional[float], tokens_per_minute: Optional[float]):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.blocked_until = 0.0
+
+    def reserve(self, estimated_tokens: int) -> float:
+        """尝试取得一次请求的配额，成功返回0，否则返回需要等待的秒数"""
+        pause = self.blocked_until - time.monotonic()
+        if pause > 0:
+            return pause
+        wait = self.requests.try_acquire(1) if self.requests else 0.0
+        if wait:
+            return wait
+        wait = self.tokens.try_acquire(estimated_tokens) if self.tokens else 0.0
+        if wait and self.requests:
+            # 请求配额已取出，token配额不足时退还
+            self.requests.adjust(-1)
+        return wait
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        """按响应中的实际token用量校正"""
+        if self.tokens and actual_tokens is not None:
+            self.tokens.adjust(actual_tokens - estimated_tokens)
+
+    def pause(self, seconds: float):
+        """服务端要求等待时，暂停所有共享该限流器的请求"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def wait(self, estimated_tokens: int):
+        """阻塞等待直到请求数和token数配额都满足"""
+        while True:
+            delay = self.reserve(estimated_tokens)
+            if not delay:
+                return
+            time.sleep(delay)
+
+    async def acquire(self, estimated_tokens: int):
+        """等待直到请求数和token数配额都满足，不阻塞事件循环"""
+        while True:
+            delay = await self._areserve(estimated_tokens)
+            if not delay:
+                return
+            await asyncio.sleep(delay)
+
+    async def _areserve(self, estimated_tokens: int) -> float:
+        return self.reserve(estimated_tokens)
+
+    async def arecord_usage(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        self.record_usage(estimated_tokens, actual_tokens)
+
+    async def apause(self, seconds: float):
+        self.pause(seconds)
+
+
+class RedisRateLimiter(RateLimiter):
+    """基于Redis的共享限流，所有进程按同一配额限流
+
+    Redis请求失败时使用进程内限流兜底，避免限流器故障导致无法调用LLM。
+    """
+
+    def __init__(self, client, namespace: str, requests_per_minute: Optional[float],
+                 tokens_per_minute: Optional[float]):
+        """初始化Redis限流器
+
+        Args:
+            client: redis.Redis客户端（或接口兼容的对象）
+            namespace: 键的命名空间，同一服务地址使用相同的命名空间
+            requests_per_minute: 每分钟请求数配额
+            tokens_per_minute: 每分钟token数配额
+        """
+        super().__init__(requests_per_minute, tokens_per_minute)
+        self.client = client
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        prefix = f"{KEY_PREFIX}:rate_limit:{namespace}"
+        self.pause_key = f"{prefix}:pause"
+        self.requests_key = f"{prefix}:requests"
+        self.tokens_key = f"{prefix}:tokens"
+
+    def _eval_buckets(self, requests: float, tokens: float, force: bool) -> float:
+        keys: List[str] = [self.pause_key]
+        args: List[Any] = ["1" if force else "0"]
+        if self.requests_per_minute:
+            keys.append(self.requests_key)
+            args += [self.requests_per_minute, min(requests, self.requests_per_minute)]
+        if self.tokens_per_minute:
+            keys.append(self.tokens_key)
+            args += [self.tokens_per_minute, min(tokens, self.tokens_per_minute)]
+        args.append(_BUCKET_TTL_SECONDS)
+        return float(self.client.eval(_RESERVE_SCRIPT, len(keys), *keys, *args))
+
+    def reserve(self, estimated_tokens: int) -> float:
+        """原子地从共享令牌桶中取得配额"""
+        try:
+            return self._eval_buckets(1, estimated_tokens, force=False)
+        except Exception as e:
+            logger.warning(f"Redis限流失败，使用进程内限流: {e}")
+            return super().reserve(estimated_tokens)
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        """按实际用量校正共享的token桶"""
+        if not self.tokens_per_minute or actual_tokens is None:
+            return
+        try:
+            self._eval_buckets(0, actual_tokens - estimated_tokens, force=True)
+        except Exception as e:
+            logger.warning(f"校正Redis限流用量失败: {e}")
+
+    def pause(self, seconds: float):
+        """暂停所有进程中共享该限流器的请求"""
+        super().pause(seconds)
+        try:
+            self.client.eval(_PAUSE_SCRIPT, 1, self.pause_key, max(1, int(seconds * 1000)))
+        except Exception as e:
+            logger.warning(f"写入Redis限流暂停失败: {e}")
+
+    async def _areserve(self, estimated_tokens: int) -> float:
+        """在线程池中访问Redis，避免网络往返阻塞事件循环"""
+        return await asyncio.to_thread(self.reserve, estimated_tokens)
+
+    async def arecord_usage(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        await asyncio.to_thread(self.record_usage, estimated_tokens, actual_tokens)
+
+    async def apause(self, seconds: float):
+        await asyncio.to_thread(self.pause, seconds)
+
+
+_rate_limiters: Dict[str, RateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(base_url: str, rate_limit_config: Dict[str, Any],
+                     default_redis_url: Optional[str] = None) -> RateLimiter:
+    """按服务地址获取限流器，同一进程内的所有实例共享
+
+    Args:
+        base_url: LLM服务地址
+        rate_limit_config: get_rate_limit_config合并后的限流配置
+        default_redis_url: rate_limit未配置redis_url时使用的地址
+    """
+    with _rate_limiters_lock:
+        if base_url not in _rate_limiters:
+            requests_per_minute = rate_limit_config.get('requests_per_minute')
+            tokens_per_minute = rate_limit_config.get('tokens_per_minute')
+            redis_url = rate_limit_config.get('redis_url') or default_redis_url
+            if rate_limit_config.get('backend', 'memory') == 'redis' and redis_url:
+                namespace = hashlib.sha1(base_url.encode("utf-8")).hexdigest()[:16]
+                _rate_limiters[base_url] = RedisRateLimiter(
+                    _get_redis_client(redis_url), namespace, requests_per_minute, tokens_per_minute
+                )
+            else:
+                if rate_limit_config.get('backend', 'memory') == 'redis':
+                    logger.warning("限流后端配置为redis但缺少redis_url，使用进程内限流")
+                _rate_limiters[base_url] = RateLimiter(requests_per_minute, tokens_per_minute)
+        return _rate_limiters[base_url]
+
+
+def parse_retry_after(error: Exception) -> Optional[float]:
+    """从错误响应中读取服务端要求的等待秒数，支持retry-after-ms与Retry-After（秒或HTTP日期）"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error: Exception) -> bool:
+    """限流、超时、连接错误和服务端错误可以重试"""
+    if isinstance(error, APIConnectionError):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code in _RETRYABLE_STATUS or error.status_code >= 500
+    return False
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""持久化LLM响应缓存
+
+重新爬取、失败重试和重新分析时，understand_content、analyze_relationship、evaluate_content
+等方法会发送完全相同的请求。以 hash(模型名 + 消息 + 请求参数) 为键将响应文本缓存在本地
+SQLite文件中，重放和重跑不再产生API调用。
+
+默认关闭，配置位于 llm.response_cache:
+
+    response_cache:
+      enabled: false
+      path: "data/llm_response_cache.sqlite3"
+      ttl_seconds: 604800   # 超过有效期的条目视为未命中
+      max_entries: 50000    # 超出后淘汰最久未使用的条目
+      methods: ["understand_content", "analyze_relationship", "evaluate_content", "analyze_content"]
+
+只缓存解析成功的响应；调用时传入bypass_cache=True跳过读取缓存，新的响应仍会写入。
+"""
+
+import json
+import hashlib
+from typing import Any, Dict, List, Optional
+
+from storage.sqlite_cache import SQLiteCache, open_sqlite_cache
+
+# 默认启用缓存的方法
+DEFAULT_CACHED_METHODS = ["understand_content", "analyze_relationship", "evaluate_content", "analyze_content"]
+
+
+def response_cache_key(model: str, messages: List[Dict[str, str]], params: Optional[Dict[str, Any]] = None) -> str:
+    """响应缓存的键，参数顺序不影响结果"""
+    payload = json.dumps(
+        {"model": model, "messages": messages, "params": params or {}},
+        ensure_ascii=False, sort_keys=True, separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DiskResponseCache(SQLiteCache):
+    """基于SQLite的响应文本缓存，支持过期时间，按最近使用时间淘汰"""
+
+    def __init__(self, path: str, ttl_seconds: Optional[float] = 604800, max_entries: int = 50000):
+        """初始化缓存
+
+        Args:
+            path: SQLite文件路径，目录不存在时自动创建
+            ttl_seconds: 有效期（秒），为None时永不过期
+            max_entries: 最大条目数
+        """
+        super().__init__(path, max_entries, ttl_seconds=ttl_seconds, name="LLM响应缓存")
+
+
+def get_response_cache(cache_config: Dict[str, Any]) -> Optional[DiskResponseCache]:
+    """按配置获取响应缓存，同一进程内按路径复用，未启用时返回None
+
+    Args:
+        cache_config: 配置中的llm.response_cache部分
+    """
+    if not cache_config.get('enabled', False):
+        return None
+
+    return open_sqlite_cache(
+        cache_config.get('path', 'data/llm_response_cache.sqlite3'),
+        lambda path: DiskResponseCache(
+            path,
+            ttl_seconds=cache_config.get('ttl_seconds', 604800),
+            max_entries=cache_config.get('max_entries', 50000)
+        )
+    )
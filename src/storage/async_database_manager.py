@@ -0,0 +1,497 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+import asyncio
+import logging
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple, Union
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import DuplicateKeyError
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http import models
+from neo4j import AsyncGraphDatabase
+
+from storage.content_schema import upgrade_content_doc
+from storage.models import Content, ContentSummary, UserConfig, Relationship, VectorEmbedding
+from storage.vector_index import CONTENT_VECTORS, build_search_params, build_vector_payload, build_vector_filter
+from storage.vector_store import VectorStore, create_vector_store
+from storage.cache import CacheBackend, create_cache
+from storage.database_manager import (
+    DatabaseManager, PAGE_SORT, HOT_PROJECTION, build_summary_projection, build_keyset_query, encode_page_cursor,
+    build_neighborhood_cypher, relation_from_record, filter_relations, reciprocal_rank_fusion,
+    ARCHIVE_STATE_ID, ARCHIVE_BOUNDARY_TTL, needs_cold_tier, merge_tier_docs,
+    compress_original_content, decompress_original_content
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDatabaseManager:
+    """异步数据库管理器，供API等事件循环场景使用
+
+    接口与DatabaseManager保持一致，所有方法均为协程。爬虫和调度器仍使用同步的DatabaseManager。
+    索引和集合的创建由同步管理器负责，这里只建立连接。
+    """
+
+    def __init__(self, config=None, content_cache: Optional[CacheBackend] = None,
+                 relations_cache: Optional[CacheBackend] = None, vector_store: Optional[VectorStore] = None):
+        """初始化异步数据库连接
+
+        Args:
+            config: 配置对象
+            content_cache: 内容缓存，传入同步管理器的缓存可保证两条写入路径的失效一致
+            relations_cache: 关系邻域缓存，同上
+            vector_store: 同步管理器的向量存储，仅在使用嵌入式后端时复用
+        """
+        assert config is not None, "配置对象不能为None"
+        db_config = config.get_database_config()
+
+        if content_cache is None:
+            content_cache = create_cache(config.get_cache_config(), 'content', default_max_size=2048)
+        self.content_cache = content_cache
+
+        if relations_cache is None:
+            relations_cache = create_cache(config.get_cache_config(), 'relations', default_max_size=4096)
+        self.relations_cache = relations_cache
+        self.neighborhood_cache_limit = config.get_cache_config().get('relations', {}).get('max_neighbors', 500)
+
+        # MongoDB连接
+        self.mongo_client = AsyncIOMotorClient(
+            db_config['mongo_uri'],
+            maxPoolSize=db_config.get('mongo_max_pool_size', 100),
+            minPoolSize=db_config.get('mongo_min_pool_size', 0)
+        )
+        self.db = self.mongo_client.personal_assistant
+        self.contents = self.db.contents
+        self.user_configs = self.db.user_configs
+        self.content_blobs = self.db.content_blobs
+        self.contents_archive = self.db.contents_archive
+        self.archive_state = self.db.archive_state
+        self._archive_boundary: Optional[datetime] = None
+        self._archive_boundary_expires_at = 0.0
+
+        # 向量存储：Qdrant使用异步客户端；嵌入式后端同一进程只能打开一次，复用同步实例并在线程池中调用
+        vector_store_config = db_config.get('vector_store') or {}
+        if vector_store_config.get('backend', 'qdrant') == 'embedded':
+            self.vector_db = None
+            self.vector_store = vector_store or create_vector_store(
+                vector_store_config, db_config.get('qdrant_collection') or {}
+            )
+        else:
+            self.vector_db = AsyncQdrantClient(url=db_config['qdrant_url'])
+            self.vector_store = None
+        self.vector_search_params = build_search_params(db_config.get('qdrant_collection') or {})
+
+        # Neo4j连接
+        self.graph_db = AsyncGraphDatabase.driver(
+            db_config['neo4j_uri'],
+            auth=(db_config['neo4j_user'], db_config['neo4j_password']),
+            max_connection_pool_size=db_config.get('neo4j_max_pool_size', 100)
+        )
+
+        logger.info("异步数据库管理器初始化完成")
+
+    async def store_content(self, content: Content) -> str:
+        """存储内容到MongoDB，原始HTML压缩后单独存放；新内容带原文URL时按URL upsert"""
+        content_dict = content.dict(exclude_none=True)
+        content_dict.pop("id", None)
+        original_content = content_dict.pop("original_content", None)
+        original_url = content.metadata.original_url
+
+        # 如果没有id，自动生成
+        if not content.id and original_url:
+            content_id, inserted = await self._upsert_by_url(original_url, content_dict)
+            content.id = content_id
+            if not inserted:
+                logger.info(f"原文URL已存在，跳过存储, ID: {content_id}")
+                return content_id
+        elif not content.id:
+            result = await self.contents.insert_one(content_dict)
+            content_id = str(result.inserted_id)
+            content.id = content_id
+            await self._stamp_ingested([result.inserted_id])
+        else:
+            content_id = content.id
+            result = await self.contents.replace_one({"_id": ObjectId(content_id)}, content_dict, upsert=True)
+            await self.content_cache.adelete(content_id)
+            if result.upserted_id is not None:
+                await self._stamp_ingested([result.upserted_id])
+
+        if original_content is not None:
+            blob = compress_original_content(content_id, original_content)
+            await self.content_blobs.replace_one({"_id": blob["_id"]}, blob, upsert=True)
+
+        logger.info(f"内容存储完成, ID: {content_id}")
+        return content_id
+
+    async def store_vector(self, embedding: VectorEmbedding, content: Optional[Content] = None):
+        """存储内容向量，并从内容补充过滤检索需要的payload字段"""
+        if content is None:
+            content = await self.get_content(embedding.content_id)
+        if content is not None:
+            embedding.payload = {**build_vector_payload(content), **embedding.payload}
+
+        if self.vector_store is not None:
+            await asyncio.to_thread(self.vector_store.upsert, [embedding])
+            logger.info(f"向量存储完成, 内容ID: {embedding.content_id}")
+            return
+
+        await self.vector_db.upsert(
+            collection_name=CONTENT_VECTORS,
+            points=[
+                models.PointStruct(
+                    id=embedding.content_id,
+                    vector=embedding.vector,
+                    payload=embedding.payload
+                )
+            ]
+        )
+        logger.info(f"向量存储完成, 内容ID: {embedding.content_id}")
+
+    async def create_relation(self, relationship: Relationship):
+        """在Neo4j中创建或更新关系，同一(源, 目标, 类型)只保留一条边"""
+        cypher = DatabaseManager._merge_relations_cypher(relationship.relation_type)
+        rows = [{
+            "source_id": relationship.source_id,
+            "target_id": relationship.target_id,
+            "properties": relationship.properties
+        }]
+        async with self.graph_db.session() as session:
+            result = await session.run(cypher, rows=rows)
+            await result.consume()
+        await self.relations_cache.adelete_many([relationship.source_id, relationship.target_id])
+
+        logger.info(f"关系写入完成: {relationship.source_id} --[{relationship.relation_type}]--> {relationship.target_id}")
+
+    async def get_content(self, content_id: str, include_original: bool = False) -> Optional[Content]:
+        """根据ID获取内容，优先读取缓存；include_original为True时加载原始HTML"""
+        content_dict = await self.content_cache.aget(content_id)
+        if content_dict is None:
+            content_dict = await self.contents.find_one({"_id": ObjectId(content_id)}, HOT_PROJECTION)
+            if not content_dict:
+                content_dict = await self.contents_archive.find_one({"_id": ObjectId(content_id)}, HOT_PROJECTION)
+            if not content_dict:
+                return None
+            upgrade_content_doc(content_dict)
+            content_dict["id"] = str(content_dict.pop("_id"))
+            await self.content_cache.aset(content_id, content_dict)
+
+        content = Content(**content_dict)
+        if include_original and content.original_content is None:
+            content.original_content = await self.get_original_content(content_id)
+        return content
+
+    async def _upsert_by_url(self, original_url: str, content_dict: Dict[str, Any]) -> Tuple[str, bool]:
+        """按原文URL upsert新内容，返回(内容ID, 是否新插入)"""
+        object_id = ObjectId()
+        try:
+            result = await self.contents.update_one(
+                {"metadata.original_url": original_url},
+                {"$setOnInsert": {**content_dict, "_id": object_id}},
+                upsert=True
+            )
+            if result.upserted_id is not None:
+                await self._stamp_ingested([result.upserted_id])
+                return str(result.upserted_id), True
+        except DuplicateKeyError:
+            # 并发写入同一URL时唯一索引冲突，说明已被其他进程插入
+            pass
+        existing = await self.contents.find_one({"metadata.original_url": original_url}, {"_id": 1})
+        return str(existing["_id"]), False
+
+    async def _stamp_ingested(self, object_ids: List[ObjectId]):
+        """为新插入的内容记录服务端入库时间，同DatabaseManager._stamp_ingested"""
+        if object_ids:
+            await self.contents.update_many({"_id": {"$in": object_ids}}, {"$currentDate": {"ingested_at": True}})
+
+    async def get_original_content(self, content_id: str) -> Optional[str]:
+        """获取内容的原始HTML，兼容尚未迁移到content_blobs的文档"""
+        blob = await self.content_blobs.find_one({"_id": ObjectId(content_id)})
+        if blob:
+            return decompress_original_content(blob)
+
+        # 未迁移的文档可能已被归档，原始HTML仍内嵌在归档文档中
+        doc = await self.contents.find_one({"_id": ObjectId(content_id)}, {"original_content": 1})
+        if doc is None:
+            doc = await self.contents_archive.find_one({"_id": ObjectId(content_id)}, {"original_content": 1})
+        return doc.get("original_content") if doc else None
+
+    async def get_contents_by_ids(self, content_ids: List[str]) -> List[Content]:
+        """根据ID列表批量获取内容，按输入顺序返回，不存在的ID会被跳过"""
+        found: Dict[str, Dict[str, Any]] = {}
+        missing = []
+        for content_id in dict.fromkeys(content_ids):
+            cached = await self.content_cache.aget(content_id)
+            if cached is not None:
+                found[content_id] = cached
+            else:
+                missing.append(content_id)
+
+        if missing:
+            object_ids = [ObjectId(content_id) for content_id in missing]
+            docs = await self.contents.find({"_id": {"$in": object_ids}}, HOT_PROJECTION).to_list(length=None)
+            if len(docs) < len(missing):
+                # 热数据中没有的ID再到归档中查找
+                hot_ids = {doc["_id"] for doc in docs}
+                docs.extend(await self.contents_archive.find(
+                    {"_id": {"$in": [object_id for object_id in object_ids if object_id not in hot_ids]}},
+                    HOT_PROJECTION
+                ).to_list(length=None))
+            for doc in docs:
+                upgrade_content_doc(doc)
+                doc["id"] = str(doc.pop("_id"))
+                await self.content_cache.aset(doc["id"], doc)
+                found[doc["id"]] = doc
+
+        return [Content(**found[content_id]) for content_id in content_ids if content_id in found]
+
+    async def get_archive_boundary(self) -> Optional[datetime]:
+        """获取归档边界，见DatabaseManager.get_archive_boundary"""
+        if time.monotonic() >= self._archive_boundary_expires_at:
+            state = await self.archive_state.find_one({"_id": ARCHIVE_STATE_ID})
+            self._archive_boundary = state.get("boundary") if state else None
+            self._archive_boundary_expires_at = time.monotonic() + ARCHIVE_BOUNDARY_TTL
+        return self._archive_boundary
+
+    async def _find_tiered(self, query: Dict[str, Any], projection: Optional[Dict[str, Any]],
+                           limit: int, skip: int = 0) -> List[Dict[str, Any]]:
+        """按(publish_time, _id)倒序查询，查询时间范围覆盖归档内容时合并冷数据"""
+        docs = await self.contents.find(query, projection).sort(PAGE_SORT).skip(skip).limit(limit).to_list(length=limit)
+        if not needs_cold_tier(query, docs, limit, await self.get_archive_boundary()):
+            return docs
+
+        if skip:
+            docs = await self.contents.find(query, projection).sort(PAGE_SORT).limit(skip + limit).to_list(length=None)
+        cold_docs = await self.contents_archive.find(query, projection).sort(PAGE_SORT).limit(skip + limit).to_list(length=None)
+        return merge_tier_docs(docs, cold_docs, skip, limit)
+
+    async def search_contents(self, query: Dict[str, Any], limit: int = 20, skip: int = 0) -> List[Content]:
+        """基于条件搜索内容，时间范围覆盖归档内容时合并冷数据"""
+        results = []
+        for doc in await self._find_tiered(query, HOT_PROJECTION, limit, skip):
+            upgrade_content_doc(doc)
+            doc["id"] = str(doc.pop("_id"))
+            results.append(Content(**doc))
+
+        return results
+
+    async def search_content_summaries(self, query: Dict[str, Any], limit: int = 20, skip: int = 0,
+                                       fields: Optional[List[str]] = None) -> List[ContentSummary]:
+        """基于条件搜索内容摘要，只读取列表展示需要的字段"""
+        projection = build_summary_projection(fields)
+        # 合并冷热数据需要publish_time
+        projection["publish_time"] = 1
+
+        results = []
+        for doc in await self._find_tiered(query, projection, limit, skip):
+            upgrade_content_doc(doc, partial=True)
+            doc["id"] = str(doc.pop("_id"))
+            if fields is not None and "publish_time" not in fields:
+                doc.pop("publish_time", None)
+            results.append(ContentSummary(**doc))
+
+        return results
+
+    async def search_content_summaries_page(self, query: Dict[str, Any], limit: int = 20, cursor: Optional[str] = None,
+                                            fields: Optional[List[str]] = None) -> Tuple[List[ContentSummary], Optional[str]]:
+        """基于条件分页搜索内容摘要，返回(摘要列表, 下一页游标)"""
+        projection = build_summary_projection(fields)
+        # 生成游标需要publish_time
+        projection["publish_time"] = 1
+        docs = await self._find_tiered(build_keyset_query(query, cursor), projection, limit)
+        next_cursor = encode_page_cursor(docs[-1]) if len(docs) == limit else None
+
+        results = []
+        for doc in docs:
+            upgrade_content_doc(doc, partial=True)
+            doc["id"] = str(doc.pop("_id"))
+            if fields is not None and "publish_time" not in fields:
+                doc.pop("publish_time", None)
+            results.append(ContentSummary(**doc))
+
+        return results, next_cursor
+
+    async def text_search_contents(self, text_query: str, limit: int = 20) -> List[Content]:
+        """基于文本搜索内容"""
+        cursor = self.contents.find(
+            {"$text": {"$search": text_query}}, HOT_PROJECTION
+        ).sort([("score", {"$meta": "textScore"})]).limit(limit)
+
+        results = []
+        async for doc in cursor:
+            upgrade_content_doc(doc)
+            doc["id"] = str(doc.pop("_id"))
+            results.append(Content(**doc))
+
+        return results
+
+    async def text_search_content_summaries(self, text_query: str, limit: int = 20,
+                                            fields: Optional[List[str]] = None) -> List[ContentSummary]:
+        """基于文本搜索内容摘要，只读取列表展示需要的字段"""
+        projection = build_summary_projection(fields)
+        projection["score"] = {"$meta": "textScore"}
+        cursor = self.contents.find(
+            {"$text": {"$search": text_query}}, projection
+        ).sort([("score", {"$meta": "textScore"})]).limit(limit)
+
+        results = []
+        async for doc in cursor:
+            upgrade_content_doc(doc, partial=True)
+            doc["id"] = str(doc.pop("_id"))
+            doc.pop("score", None)
+            results.append(ContentSummary(**doc))
+
+        return results
+
+    async def _text_search_ids(self, text_query: str, limit: int,
+                               query: Optional[Dict[str, Any]] = None) -> List[str]:
+        """全文检索，只返回按相关性排序的内容ID"""
+        cursor = self.contents.find(
+            {"$text": {"$search": text_query}, **(query or {})},
+            {"_id": 1, "score": {"$meta": "textScore"}}
+        ).sort([("score", {"$meta": "textScore"})]).limit(limit)
+        return [str(doc["_id"]) async for doc in cursor]
+
+    async def hybrid_search_content_summaries(self, text_query: str, query_vector: List[float], limit: int = 10,
+                                              fields: Optional[List[str]] = None, candidate_limit: int = 50,
+                                              platform: Optional[str] = None,
+                                              start_time: Optional[datetime] = None,
+                                              rrf_k: int = 60) -> Tuple[List[ContentSummary], Dict[str, float]]:
+        """关键词+语义混合检索
+
+        全文检索和向量检索并发执行，结果用倒数排名融合后去重，再一次查询获取摘要。
+
+        Args:
+            text_query: 关键词查询
+            query_vector: 查询向量
+            limit: 返回数量
+            fields: 摘要字段，见build_summary_projection
+            candidate_limit: 每路检索召回的候选数量
+            platform: 平台过滤
+            start_time: 发布时间下限
+            rrf_k: RRF平滑常数
+
+        Returns:
+            Tuple: (摘要列表, 各阶段耗时毫秒数{"text", "vector", "fetch"})
+        """
+        timings: Dict[str, float] = {}
+
+        async def timed(name, coro):
+            start = time.perf_counter()
+            try:
+                return await coro
+            finally:
+                timings[name] = (time.perf_counter() - start) * 1000
+
+        text_filter: Dict[str, Any] = {}
+        if platform:
+            text_filter["platform"] = platform
+        if start_time is not None:
+            text_filter["publish_time"] = {"$gte": start_time}
+
+        text_ids, vector_hits = await asyncio.gather(
+            timed("text", self._text_search_ids(text_query, candidate_limit, text_filter)),
+            timed("vector", self.search_similar_vectors(
+                query_vector, limit=candidate_limit, platform=platform, start_time=start_time
+            ))
+        )
+
+        fused = reciprocal_rank_fusion([text_ids, [str(hit.id) for hit in vector_hits]], k=rrf_k)[:limit]
+        content_ids = [content_id for content_id, _ in fused]
+
+        summaries = []
+        if content_ids:
+            summaries = await timed("fetch", self.search_content_summaries(
+                {"_id": {"$in": [ObjectId(content_id) for content_id in content_ids]}},
+                limit=len(content_ids),
+                fields=fields
+            ))
+        summary_by_id = {summary.id: summary for summary in summaries}
+        results = [summary_by_id[content_id] for content_id in content_ids if content_id in summary_by_id]
+
+        logger.info(f"混合检索完成, 全文候选: {len(text_ids)}, 向量候选: {len(vector_hits)}, 返回: {len(results)}, "
+                    + ", ".join(f"{name}: {ms:.1f}ms" for name, ms in timings.items()))
+        return results, timings
+
+    async def search_similar_vectors(self, vector: List[float], limit: int = 10,
+                                     platform: Optional[Union[str, List[str]]] = None,
+                                     start_time: Optional[datetime] = None,
+                                     end_time: Optional[datetime] = None,
+                                     topics: Optional[List[str]] = None,
+                                     exclude_ids: Optional[List[str]] = None) -> List[Any]:
+        """搜索相似向量，过滤条件在向量存储中执行，参数同DatabaseManager.search_similar_vectors"""
+        if self.vector_store is not None:
+            return await asyncio.to_thread(
+                self.vector_store.search, vector, limit, platform, start_time, end_time, topics, exclude_ids
+            )
+
+        return await self.vector_db.search(
+            collection_name=CONTENT_VECTORS,
+            query_vector=vector,
+            query_filter=build_vector_filter(platform, start_time, end_time, topics, exclude_ids),
+            search_params=self.vector_search_params,
+            limit=limit
+        )
+
+    async def _query_relations(self, content_id: str, relation_type: Optional[str] = None,
+                               limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """执行一次无向邻域查询"""
+        async with self.graph_db.session() as session:
+            result = await session.run(
+                build_neighborhood_cypher(limit),
+                content_id=content_id,
+                relation_type=relation_type,
+                limit=limit
+            )
+            records = await result.data()
+        return [relation_from_record(record) for record in records]
+
+    async def get_relations(self, content_id: str, relation_type: Optional[str] = None,
+                            limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """获取内容的关系（出边和入边），优先读取邻域缓存"""
+        relations = await self.relations_cache.aget(content_id)
+        if relations is None:
+            relations = await self._query_relations(content_id, limit=self.neighborhood_cache_limit)
+            await self.relations_cache.aset(content_id, relations)
+
+        if len(relations) >= self.neighborhood_cache_limit:
+            # 邻域超过缓存上限，缓存的结果不完整，直接按条件查询
+            return await self._query_relations(content_id, relation_type, limit)
+
+        return filter_relations(relations, relation_type, limit)
+
+    async def store_user_config(self, user_config: UserConfig) -> str:
+        """存储用户配置"""
+        user_dict = user_config.dict(exclude_none=True)
+
+        # 如果没有id，自动生成
+        if not user_config.id:
+            result = await self.user_configs.insert_one(user_dict)
+            user_id = str(result.inserted_id)
+            user_config.id = user_id
+        else:
+            user_id = user_config.id
+            await self.user_configs.replace_one({"_id": ObjectId(user_id)}, user_dict, upsert=True)
+
+        logger.info(f"用户配置存储完成, ID: {user_id}")
+        return user_id
+
+    async def get_user_config(self, user_id: str) -> Optional[UserConfig]:
+        """根据用户ID获取配置"""
+        user_dict = await self.user_configs.find_one({"user_id": user_id})
+        if user_dict:
+            user_dict["id"] = str(user_dict.pop("_id"))
+            return UserConfig(**user_dict)
+        return None
+
+    async def close(self):
+        """关闭所有数据库连接"""
+        self.mongo_client.close()
+        # 嵌入式向量存储由同步管理器负责落盘
+        if self.vector_db is not None:
+            await self.vector_db.close()
+        await self.graph_db.close()
+        logger.info("异步数据库连接已关闭")
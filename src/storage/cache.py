@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""可插拔的缓存后端
+
+- LRUCache: 进程内LRU缓存，默认后端，也用作测试和单机部署时的本地替身
+- RedisCache: 基于Redis的共享缓存，多个uvicorn worker之间共享结果
+
+协程中使用aget/aset/adelete/adelete_many，进程内缓存直接执行，Redis后端在线程池中执行，
+不阻塞事件循环。
+
+缓存值需为可序列化的基础类型（dict/list/str/数字/datetime等），Redis后端使用
+msgpack二进制格式序列化。通过create_cache按配置创建指定命名空间的缓存。
+"""
+
+import time
+import asyncio
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Hashable, Iterable, Optional
+
+import msgpack
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "insightflow"
+
+# msgpack扩展类型编号
+_EXT_DATETIME = 1
+
+
+class CacheBackend(ABC):
+    """缓存后端基类，统一统计命中次数"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    @abstractmethod
+    def get(self, key: Hashable) -> Optional[Any]:
+        """读取缓存，未命中时返回None"""
+        pass
+
+    @abstractmethod
+    def set(self, key: Hashable, value: Any):
+        """写入缓存"""
+        pass
+
+    @abstractmethod
+    def delete(self, key: Hashable):
+        """删除缓存条目"""
+        pass
+
+    def delete_many(self, keys: Iterable[Hashable]):
+        """批量删除缓存条目"""
+        for key in keys:
+            self.delete(key)
+
+    @abstractmethod
+    def clear(self):
+        """清空缓存"""
+        pass
+
+    async def aget(self, key: Hashable) -> Optional[Any]:
+        """在协程中读取缓存，有网络或磁盘I/O的后端需覆盖以免阻塞事件循环"""
+        return self.get(key)
+
+    async def aset(self, key: Hashable, value: Any):
+        """在协程中写入缓存"""
+        self.set(key, value)
+
+    async def adelete(self, key: Hashable):
+        """在协程中删除缓存条目"""
+        self.delete(key)
+
+    async def adelete_many(self, keys: Iterable[Hashable]):
+        """在协程中批量删除缓存条目"""
+        self.delete_many(keys)
+
+    def _record(self, hit: bool):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """返回命中统计，供监控使用"""
+        total = self.hits + self.misses
+        return {
+            "backend": self.__class__.__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+
+class LRUCache(CacheBackend):
+    """进程内LRU缓存，条目带过期时间，线程安全"""
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: Optional[float] = 300):
+        """初始化缓存
+
+        Args:
+            max_size: 最大条目数，超出后淘汰最久未使用的条目
+            ttl_seconds: 条目过期时间（秒），为None表示不过期
+        """
+        super().__init__()
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """读取缓存，未命中或已过期时返回None"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._record(False)
+                return None
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self._record(False)
+                return None
+
+            self._data.move_to_end(key)
+            self._record(True)
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        """写入缓存"""
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        """删除缓存条目"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_many(self, keys: Iterable[Hashable]):
+        """批量删除缓存条目"""
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """返回命中统计，供监控使用"""
+        stats = super().stats()
+        with self._lock:
+            stats.update({"size": len(self._data), "max_size": self.max_size})
+        return stats
+
+
+def _msgpack_default(obj):
+    if isinstance(obj, datetime):
+        return msgpack.ExtType(_EXT_DATETIME, obj.isoformat().encode("utf-8"))
+    raise TypeError(f"无法序列化的类型: {type(obj)}")
+
+
+def _msgpack_ext_hook(code, data):
+    if code == _EXT_DATETIME:
+        return datetime.fromisoformat(data.decode("utf-8"))
+    return msgpack.ExtType(code, data)
+
+
+def pack(value: Any) -> bytes:
+    """将缓存值序列化为msgpack二进制"""
+    return msgpack.packb(value, default=_msgpack_default, use_bin_type=True)
+
+
+def unpack(data: bytes) -> Any:
+    """反序列化msgpack二进制"""
+    return msgpack.unpackb(data, ext_hook=_msgpack_ext_hook, raw=False)
+
+
+class RedisCache(CacheBackend):
+    """基于Redis的共享缓存，键按命名空间隔离"""
+
+    def __init__(self, client, namespace: str, ttl_seconds: Optional[float] = 300):
+        """初始化Redis缓存
+
+        Args:
+            client: redis.Redis客户端（或接口兼容的对象）
+            namespace: 命名空间，例如content、query_embedding、graph
+            ttl_seconds: 条目过期时间（秒），为None表示不过期
+        """
+        super().__init__()
+        self.client = client
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+
+    def _key(self, key: Hashable) -> str:
+        return f"{KEY_PREFIX}:{self.namespace}:{key}"
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """读取缓存，Redis不可用时视为未命中"""
+        try:
+            data = self.client.get(self._key(key))
+        except Exception as e:
+            logger.warning(f"读取Redis缓存失败: {e}")
+            data = None
+
+        self._record(data is not None)
+        return unpack(data) if data is not None else None
+
+    def set(self, key: Hashable, value: Any):
+        """写入缓存"""
+        try:
+            ttl = int(self.ttl_seconds) if self.ttl_seconds else None
+            self.client.set(self._key(key), pack(value), ex=ttl)
+        except Exception as e:
+            logger.warning(f"写入Redis缓存失败: {e}")
+
+    def delete(self, key: Hashable):
+        """删除缓存条目"""
+        self.delete_many([key])
+
+    def delete_many(self, keys: Iterable[Hashable]):
+        """批量删除缓存条目"""
+        redis_keys = [self._key(key) for key in keys]
+        if not redis_keys:
+            return
+        try:
+            self.client.delete(*redis_keys)
+        except Exception as e:
+            # 失效失败会导致读到旧数据，记录为错误
+            logger.error(f"删除Redis缓存失败: {e}")
+
+    async def aget(self, key: Hashable) -> Optional[Any]:
+        """在线程池中读取，避免网络往返阻塞事件循环"""
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: Hashable, value: Any):
+        """在线程池中写入"""
+        await asyncio.to_thread(self.set, key, value)
+
+    async def adelete(self, key: Hashable):
+        """在线程池中删除"""
+        await asyncio.to_thread(self.delete, key)
+
+    async def adelete_many(self, keys: Iterable[Hashable]):
+        """在线程池中批量删除"""
+        await asyncio.to_thread(self.delete_many, list(keys))
+
+    def clear(self):
+        """清空当前命名空间下的缓存"""
+        redis_keys = list(self.client.scan_iter(match=f"{KEY_PREFIX}:{self.namespace}:*"))
+        if redis_keys:
+            self.client.delete(*redis_keys)
+
+
+_redis_clients: Dict[str, Any] = {}
+
+
+def _get_redis_client(redis_url: str):
+    """同一进程内按URL复用Redis连接池"""
+    if redis_url not in _redis_clients:
+        import redis
+        _redis_clients[redis_url] = redis.Redis.from_url(redis_url)
+    return _redis_clients[redis_url]
+
+
+def create_cache(cache_config: Dict[str, Any], namespace: str,
+                 default_max_size: int = 1024, default_ttl: Optional[float] = 300) -> CacheBackend:
+    """按配置创建指定命名空间的缓存
+
+    Args:
+        cache_config: 配置中的cache部分，backend为memory（默认）或redis
+        namespace: 命名空间，同时也是cache配置下该缓存的配置键
+        default_max_size: 进程内缓存的默认容量
+        default_ttl: 默认过期时间（秒）
+
+    Returns:
+        CacheBackend: 缓存实例
+    """
+    namespace_config = cache_config.get(namespace, {})
+    ttl = namespace_config.get('ttl_seconds', default_ttl)
+
+    if cache_config.get('backend', 'memory') == 'redis':
+        redis_url = cache_config.get('redis_url')
+        if redis_url:
+            return RedisCache(_get_redis_client(redis_url), namespace, ttl_seconds=ttl)
+        logger.warning("缓存后端配置为redis但缺少redis_url，使用进程内缓存")
+
+    return LRUCache(
+        max_size=namespace_config.get('max_size', default_max_size),
+        ttl_seconds=ttl
+    )
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Content文档的结构版本与按需升级
+
+每个文档带有schema_version字段（缺失视为0）。修改Content结构时递增
+models.CONTENT_SCHEMA_VERSION，并登记从上一版本升级的函数:
+
+    @content_upgrade(1, "sentiment.emotions改为列表")
+    def _upgrade_v1(doc):
+        ...
+
+读取时通过upgrade_content_doc在内存中依次执行升级，旧文档无需停机迁移即可解码；
+DatabaseManager.upgrade_content_documents在后台分批把升级结果写回数据库。
+
+升级函数直接修改传入的文档字典。摘要查询的投影包含schema_version，当前版本的文档
+直接跳过；旧文档只对投影字段执行升级，因此升级函数需能处理只包含部分字段的文档。
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, NamedTuple
+
+from storage.models import CONTENT_SCHEMA_VERSION
+
+logger = logging.getLogger(__name__)
+
+
+class ContentUpgrade(NamedTuple):
+    """从from_version升级到from_version + 1"""
+    from_version: int
+    description: str
+    apply: Callable[[Dict[str, Any]], None]
+
+
+CONTENT_UPGRADES: Dict[int, ContentUpgrade] = {}
+
+
+def content_upgrade(from_version: int, description: str):
+    """注册升级函数的装饰器"""
+    def decorator(func):
+        if from_version in CONTENT_UPGRADES:
+            raise ValueError(f"升级版本重复: {from_version}")
+        CONTENT_UPGRADES[from_version] = ContentUpgrade(from_version, description, func)
+        return func
+    return decorator
+
+
+def get_doc_schema_version(doc: Dict[str, Any]) -> int:
+    """文档的结构版本，早期文档没有该字段"""
+    return doc.get("schema_version", 0)
+
+
+def upgrade_content_doc(doc: Dict[str, Any], partial: bool = False) -> bool:
+    """将文档原地升级到当前结构版本
+
+    Args:
+        doc: contents集合中的文档
+        partial: 文档是否为投影后的部分字段；此时不补充投影之外的字段，也不写入schema_version
+
+    Returns:
+        bool: 文档是否被升级
+    """
+    version = get_doc_schema_version(doc)
+    if version >= CONTENT_SCHEMA_VERSION:
+        return False
+
+    projected = set(doc)
+    for from_version in range(version, CONTENT_SCHEMA_VERSION):
+        CONTENT_UPGRADES[from_version].apply(doc)
+
+    if partial:
+        for key in set(doc) - projected:
+            del doc[key]
+    else:
+        doc["schema_version"] = CONTENT_SCHEMA_VERSION
+    return True
+
+
+def build_upgrade_update(original: Dict[str, Any], upgraded: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """生成将原文档更新为升级后文档的$set/$unset，只包含变化的顶层字段
+
+    使用更新而不是整篇替换，不会触发只监听insert/replace的增量处理管道。
+    """
+    update: Dict[str, Dict[str, Any]] = {}
+    changed = {key: value for key, value in upgraded.items() if key not in original or original[key] != value}
+    removed = {key: "" for key in original if key not in upgraded}
+    if changed:
+        update["$set"] = changed
+    if removed:
+        update["$unset"] = removed
+    return update
+
+
+_SENTIMENT_SCORES = {"positive": 1.0, "neutral": 0.0, "negative": -1.0}
+
+
+def _sentiment_label(score: float) -> str:
+    if score > 0:
+        return "positive"
+    if score < 0:
+        return "negative"
+    return "neutral"
+
+
+@content_upgrade(0, "补齐早期爬虫写入的字段，规范情感、实体和价值评估的格式")
+def _upgrade_legacy_content(doc: Dict[str, Any]):
+    # 早期爬虫直接存储解析结果：正文字段为content，发布时间为Unix时间戳
+    if "processed_text" not in doc and "content" in doc:
+        doc["processed_text"] = doc.pop("content")
+    if isinstance(doc.get("publish_time"), (int, float)):
+        doc["publish_time"] = datetime.fromtimestamp(doc["publish_time"])
+    if "formatted_time" not in doc and isinstance(doc.get("publish_time"), datetime):
+        doc["formatted_time"] = doc["publish_time"].strftime("%Y-%m-%d %H:%M:%S")
+    doc.setdefault("summary", "")
+    if "metadata" not in doc:
+        text = doc.get("processed_text") or ""
+        doc["metadata"] = {"word_count": len(text), "read_time_minutes": len(text) // 500}
+
+    # 情感曾只存标签或分数
+    sentiment = doc.get("sentiment")
+    if isinstance(sentiment, str):
+        doc["sentiment"] = {"score": _SENTIMENT_SCORES.get(sentiment, 0.0), "label": sentiment}
+    elif isinstance(sentiment, (int, float)):
+        doc["sentiment"] = {"score": float(sentiment), "label": _sentiment_label(sentiment)}
+
+    # 实体曾只存文本，按正文补充位置
+    entities = doc.get("entities")
+    if entities and any(isinstance(entity, str) for entity in entities):
+        text = doc.get("processed_text") or ""
+        upgraded = []
+        for entity in entities:
+            if isinstance(entity, str):
+                start = text.find(entity)
+                entity = {"text": entity, "type": "UNKNOWN", "start": start,
+                          "end": start + len(entity) if start >= 0 else -1}
+            upgraded.append(entity)
+        doc["entities"] = upgraded
+
+    # 价值评估曾只存总分，缺失的分项使用总分
+    assessment = doc.get("value_assessment")
+    if isinstance(assessment, (int, float)):
+        assessment = {"overall_score": float(assessment)}
+    if isinstance(assessment, dict) and "overall_score" in assessment:
+        for field in ("relevance", "timeliness", "importance", "uniqueness"):
+            assessment.setdefault(field, assessment["overall_score"])
+        doc["value_assessment"] = assessment
+
+
+_missing_upgrades = [v for v in range(CONTENT_SCHEMA_VERSION) if v not in CONTENT_UPGRADES]
+if _missing_upgrades:
+    raise RuntimeError(f"缺少Content结构升级函数: {_missing_upgrades}")
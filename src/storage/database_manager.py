@@ -1,23 +1,214 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import copy
+import json
+import time
+import zlib
+import base64
 import logging
-from typing import List, Dict, Any, Optional, Union
-from datetime import datetime
-from bson import ObjectId
+from typing import List, Dict, Any, Optional, Tuple, Union
+from datetime import datetime, timedelta
+from bson import Binary, ObjectId
+from bson.errors import InvalidId
 
-from pymongo import MongoClient, DESCENDING, ASCENDING
+from pymongo import MongoClient, ASCENDING, DESCENDING, InsertOne, ReplaceOne, UpdateOne
 from pymongo.collection import Collection
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from pymongo.database import Database
 from qdrant_client import QdrantClient
-from qdrant_client.http import models
 from neo4j import GraphDatabase
 
-from storage.models import Content, UserConfig, Relationship, VectorEmbedding
+from storage.content_schema import build_upgrade_update, get_doc_schema_version, upgrade_content_doc
+from storage.models import (
+    CONTENT_SCHEMA_VERSION, Content, ContentSummary, UserConfig, Relationship, VectorEmbedding
+)
+from storage.vector_index import build_vector_payload
+from storage.vector_store import create_vector_store
+from storage.cache import create_cache
 
 logger = logging.getLogger(__name__)
 
 
+def build_summary_projection(fields: Optional[List[str]] = None) -> Dict[str, int]:
+    """构建内容摘要查询的MongoDB投影
+    
+    Args:
+        fields: 需要返回的字段，必须是ContentSummary的字段；为None时返回全部摘要字段
+        
+    Returns:
+        Dict: MongoDB投影
+    """
+    summary_fields = [name for name in ContentSummary.__fields__ if name != "id"]
+    if fields is None:
+        fields = summary_fields
+    
+    unknown = [name for name in fields if name != "id" and name not in summary_fields]
+    if unknown:
+        raise ValueError(f"不支持的字段: {', '.join(unknown)}")
+    
+    projection = {name: 1 for name in fields if name != "id"}
+    # 读取时据此跳过已是当前结构版本的文档
+    projection["schema_version"] = 1
+    return projection
+
+
+# 一次无向查询同时返回出边和入边
+NEIGHBORHOOD_CYPHER = """
+    MATCH (c:Content {id: $content_id})-[r]-(other:Content)
+    WHERE $relation_type IS NULL OR type(r) = $relation_type
+    RETURN startNode(r) = c AS outgoing, type(r) AS relation_type,
+           properties(r) AS properties, other.id AS other_id
+"""
+
+
+def build_neighborhood_cypher(limit: Optional[int] = None) -> str:
+    """构建邻域查询语句，limit作为参数传入"""
+    return NEIGHBORHOOD_CYPHER + (" LIMIT $limit" if limit is not None else "")
+
+
+def relation_from_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """将邻域查询的一条记录转换为关系字典"""
+    relation = {
+        "direction": "outgoing" if record["outgoing"] else "incoming",
+        "relation_type": record["relation_type"],
+        "properties": record["properties"]
+    }
+    relation["target_id" if record["outgoing"] else "source_id"] = record["other_id"]
+    return relation
+
+
+def filter_relations(relations: List[Dict[str, Any]], relation_type: Optional[str] = None,
+                     limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """按关系类型和数量过滤缓存的邻域"""
+    if relation_type:
+        relations = [relation for relation in relations if relation["relation_type"] == relation_type]
+    return relations[:limit] if limit is not None else list(relations)
+
+
+def compress_original_content(content_id: Union[str, ObjectId], html: str) -> Dict[str, Any]:
+    """构建content_blobs集合中的原始HTML文档（zlib压缩）"""
+    data = html.encode("utf-8")
+    return {
+        "_id": ObjectId(content_id),
+        "codec": "zlib",
+        "size": len(data),
+        "data": Binary(zlib.compress(data))
+    }
+
+
+def decompress_original_content(blob: Dict[str, Any]) -> str:
+    """还原content_blobs集合中的原始HTML"""
+    return zlib.decompress(blob["data"]).decode("utf-8")
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """倒数排名融合(RRF)，合并多路检索结果并按ID去重
+    
+    Args:
+        rankings: 每路检索按相关性排序的ID列表
+        k: 平滑常数，越大则各路排名靠后的结果权重衰减越慢
+        
+    Returns:
+        List[Tuple]: (ID, 融合分数)，按分数从高到低排列
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(dict.fromkeys(ranking)):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+# 读取完整内容时排除原始HTML，需要时通过get_original_content单独加载
+HOT_PROJECTION = {"original_content": 0}
+
+
+# 键集分页的排序，与(publish_time, _id)复合索引一致
+PAGE_SORT = [("publish_time", DESCENDING), ("_id", DESCENDING)]
+
+
+def encode_page_cursor(doc: Dict[str, Any]) -> str:
+    """根据一页中最后一条文档生成不透明的分页游标"""
+    payload = {"t": doc["publish_time"].isoformat(), "id": str(doc["_id"])}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii")
+
+
+def build_keyset_query(query: Dict[str, Any], cursor: Optional[str] = None) -> Dict[str, Any]:
+    """在查询条件上追加游标位置之后的键集条件
+    
+    Args:
+        query: 原始查询条件
+        cursor: encode_page_cursor生成的游标，为None时表示第一页
+        
+    Returns:
+        Dict: MongoDB查询条件
+    """
+    if not cursor:
+        return query
+    
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        publish_time = datetime.fromisoformat(payload["t"])
+        last_id = ObjectId(payload["id"])
+    except (ValueError, KeyError, TypeError, InvalidId) as e:
+        raise ValueError(f"无效的分页游标: {cursor}") from e
+    
+    keyset = {"$or": [
+        {"publish_time": {"$lt": publish_time}},
+        {"publish_time": publish_time, "_id": {"$lt": last_id}}
+    ]}
+    return {"$and": [query, keyset]} if query else keyset
+
+
+# 归档边界记录在archive_state集合中，早于边界且未收藏的内容已移到contents_archive
+ARCHIVE_STATE_ID = "contents"
+# 各进程缓存归档边界的时间（秒）
+ARCHIVE_BOUNDARY_TTL = 60
+
+
+def publish_time_lower_bound(query: Dict[str, Any]) -> Optional[datetime]:
+    """提取查询条件中publish_time的下限，没有下限时返回None"""
+    bounds = []
+    condition = query.get("publish_time")
+    if isinstance(condition, datetime):
+        bounds.append(condition)
+    elif isinstance(condition, dict):
+        bounds.extend(condition[op] for op in ("$gte", "$gt", "$eq") if isinstance(condition.get(op), datetime))
+    for sub_query in query.get("$and", []):
+        bound = publish_time_lower_bound(sub_query)
+        if bound is not None:
+            bounds.append(bound)
+    return max(bounds) if bounds else None
+
+
+def needs_cold_tier(query: Dict[str, Any], hot_docs: List[Dict[str, Any]], limit: int,
+                    boundary: Optional[datetime]) -> bool:
+    """判断按(publish_time, _id)倒序的查询结果是否可能包含归档内容
+    
+    只有查询的时间范围覆盖归档边界之前，且热数据不足一页或页尾已越过边界时才需要查询冷数据。
+    """
+    if boundary is None:
+        return False
+    lower_bound = publish_time_lower_bound(query)
+    if lower_bound is not None and lower_bound >= boundary:
+        return False
+    if len(hot_docs) < limit:
+        return True
+    last_time = hot_docs[-1].get("publish_time")
+    return last_time is None or last_time < boundary
+
+
+def merge_tier_docs(hot_docs: List[Dict[str, Any]], cold_docs: List[Dict[str, Any]],
+                    skip: int, limit: int) -> List[Dict[str, Any]]:
+    """按(publish_time, _id)倒序合并冷热数据的查询结果"""
+    docs = sorted(
+        hot_docs + cold_docs,
+        key=lambda doc: (doc.get("publish_time") or datetime.min, doc["_id"]),
+        reverse=True
+    )
+    return docs[skip:skip + limit]
+
+
 class DatabaseManager:
     """数据库管理器，统一管理三种不同类型的数据库连接"""
     
@@ -35,209 +226,813 @@ class DatabaseManager:
         neo4j_uri = db_config['neo4j_uri']
         neo4j_user = db_config['neo4j_user']
         neo4j_password = db_config['neo4j_password']
-
+        self.bulk_batch_size = db_config.get('bulk_batch_size') or 500
+        self.archive_config = db_config.get('archive') or {}
+        
+        # get_content的读穿透缓存，写入内容时失效；后端可配置为进程内或Redis
+        self.content_cache = create_cache(config.get_cache_config(), 'content', default_max_size=2048)
+        
+        # get_relations的邻域缓存，写入关系时使两端节点的缓存失效
+        self.relations_cache = create_cache(config.get_cache_config(), 'relations', default_max_size=4096)
+        self.neighborhood_cache_limit = config.get_cache_config().get('relations', {}).get('max_neighbors', 500)
             
-        # MongoDB连接
-        self.mongo_client = MongoClient(mongo_uri)
+        # MongoDB连接（连接池由客户端维护，同一进程内应共享同一个管理器）
+        self.mongo_client = MongoClient(
+            mongo_uri,
+            maxPoolSize=db_config.get('mongo_max_pool_size', 100),
+            minPoolSize=db_config.get('mongo_min_pool_size', 0)
+        )
         self.db: Database = self.mongo_client.personal_assistant
         self.contents: Collection = self.db.contents
         self.user_configs: Collection = self.db.user_configs
+        # 原始HTML与热字段分离存放，避免膨胀contents集合的工作集
+        self.content_blobs: Collection = self.db.content_blobs
+        # 冷数据：归档的旧内容，只在查询时间范围需要时访问
+        self.contents_archive: Collection = self.db.contents_archive
+        self.archive_state: Collection = self.db.archive_state
+        self._archive_boundary: Optional[datetime] = None
+        self._archive_boundary_expires_at = 0.0
         
-        # 创建索引
-        self._create_mongodb_indexes()
-        
-        # Qdrant连接
-        self.vector_db = QdrantClient(url=qdrant_url)
-        self._init_qdrant_collections()
+        # 向量存储：默认使用Qdrant，单机部署和测试可使用嵌入式后端（此时vector_db为None）
+        vector_store_config = db_config.get('vector_store') or {}
+        self.vector_collection_config = db_config.get('qdrant_collection') or {}
+        self.vector_db = QdrantClient(url=qdrant_url) if vector_store_config.get('backend', 'qdrant') == 'qdrant' else None
+        self.vector_store = create_vector_store(vector_store_config, self.vector_collection_config, self.vector_db)
         
         # Neo4j连接
         self.graph_db = GraphDatabase.driver(
             neo4j_uri,
-            auth=(neo4j_user, neo4j_password)
+            auth=(neo4j_user, neo4j_password),
+            max_connection_pool_size=db_config.get('neo4j_max_pool_size', 100)
         )
         
+        # 索引和集合由storage.migrations统一创建，构造时不执行任何DDL
         logger.info("数据库管理器初始化完成")
     
-    def _create_mongodb_indexes(self):
-        """为MongoDB创建必要的索引"""
-        # 内容集合的索引
-        self.contents.create_index([("title", "text"), ("processed_text", "text")])
-        self.contents.create_index([("platform", ASCENDING), ("publish_time", DESCENDING)])
-        self.contents.create_index("topics")
-        self.contents.create_index("keywords")
-        
-        # 用户配置集合的索引
-        self.user_configs.create_index("user_id", unique=True)
-        self.user_configs.create_index("email")
-        
-        logger.info("MongoDB索引创建完成")
-    
-    def _init_qdrant_collections(self):
-        """初始化Qdrant集合"""
-        try:
-            # 检查集合是否存在，不存在则创建
-            collections = self.vector_db.get_collections().collections
-            collection_names = [c.name for c in collections]
-            
-            if "content_vectors" not in collection_names:
-                # 创建内容向量集合，使用1536维 (OpenAI ada-002模型)
-                self.vector_db.create_collection(
-                    collection_name="content_vectors",
-                    vectors_config=models.VectorParams(size=1536, distance=models.Distance.COSINE)
-                )
-                logger.info("Qdrant 'content_vectors'集合创建完成")
-        except Exception as e:
-            logger.error(f"初始化Qdrant集合失败: {e}")
-    
     def store_content(self, content: Content) -> str:
-        """存储内容到MongoDB"""
+        """存储内容到MongoDB，原始HTML压缩后单独存放
+        
+        新内容带原文URL时按URL upsert，URL已存在时不重复插入，返回已有内容的ID。
+        """
         content_dict = content.dict(exclude_none=True)
+        content_dict.pop("id", None)
+        original_content = content_dict.pop("original_content", None)
+        original_url = content.metadata.original_url
         
         # 如果没有id，自动生成
-        if not content.id:
+        if not content.id and original_url:
+            content_id, inserted = self._upsert_by_url(original_url, content_dict)
+            content.id = content_id
+            if not inserted:
+                logger.info(f"原文URL已存在，跳过存储, ID: {content_id}")
+                return content_id
+        elif not content.id:
             result = self.contents.insert_one(content_dict)
             content_id = str(result.inserted_id)
             content.id = content_id
+            self._stamp_ingested([result.inserted_id])
         else:
             content_id = content.id
-            self.contents.replace_one({"_id": ObjectId(content_id)}, content_dict, upsert=True)
+            result = self.contents.replace_one({"_id": ObjectId(content_id)}, content_dict, upsert=True)
+            self.content_cache.delete(content_id)
+            if result.upserted_id is not None:
+                self._stamp_ingested([result.upserted_id])
+        
+        if original_content is not None:
+            blob = compress_original_content(content_id, original_content)
+            self.content_blobs.replace_one({"_id": blob["_id"]}, blob, upsert=True)
         
         logger.info(f"内容存储完成, ID: {content_id}")
         return content_id
     
-    def store_vector(self, embedding: VectorEmbedding):
-        """存储内容向量到Qdrant"""
-        self.vector_db.upsert(
-            collection_name="content_vectors",
-            points=[
-                models.PointStruct(
-                    id=embedding.content_id,
-                    vector=embedding.vector,
-                    payload=embedding.payload
-                )
-            ]
-        )
+    def _upsert_by_url(self, original_url: str, content_dict: Dict[str, Any]) -> Tuple[str, bool]:
+        """按原文URL upsert新内容，与store_contents_bulk的去重写入一致
+        
+        Returns:
+            Tuple: (内容ID, 是否新插入)
+        """
+        object_id = ObjectId()
+        try:
+            result = self.contents.update_one(
+                {"metadata.original_url": original_url},
+                {"$setOnInsert": {**content_dict, "_id": object_id}},
+                upsert=True
+            )
+            if result.upserted_id is not None:
+                self._stamp_ingested([result.upserted_id])
+                return str(result.upserted_id), True
+        except DuplicateKeyError:
+            # 并发写入同一URL时唯一索引冲突，说明已被其他进程插入
+            pass
+        existing = self.contents.find_one({"metadata.original_url": original_url}, {"_id": 1})
+        return str(existing["_id"]), False
+    
+    def _stamp_ingested(self, object_ids: List[ObjectId]):
+        """为新插入的内容记录服务端入库时间ingested_at
+        
+        客户端生成的_id与提交顺序不一致，增量处理的轮询以该时间为准，见processor.content_pipeline。
+        覆盖已有内容时不更新，避免重复处理。
+        """
+        if object_ids:
+            self.contents.update_many({"_id": {"$in": object_ids}}, {"$currentDate": {"ingested_at": True}})
+    
+    def store_vector(self, embedding: VectorEmbedding, content: Optional[Content] = None):
+        """存储内容向量，并从内容补充过滤检索需要的payload字段
+        
+        Args:
+            embedding: 向量嵌入
+            content: 向量对应的内容，未提供时按content_id读取
+        """
+        if content is None:
+            content = self.get_content(embedding.content_id)
+        if content is not None:
+            embedding.payload = {**build_vector_payload(content), **embedding.payload}
+        
+        self.vector_store.upsert([embedding])
         logger.info(f"向量存储完成, 内容ID: {embedding.content_id}")
     
-    def create_relation(self, relationship: Relationship):
-        """在Neo4j中创建关系"""
+    def create_relation(self, relationship: Relationship) -> Dict[str, Any]:
+        """在Neo4j中创建或更新关系，同一(源, 目标, 类型)只保留一条边"""
+        result = self.create_relations_bulk([relationship])
+        if result["errors"]:
+            raise RuntimeError(result["errors"][0]["error"])
+        
+        logger.info(f"关系写入完成: {relationship.source_id} --[{relationship.relation_type}]--> {relationship.target_id}")
+        return result
+    
+    def _iter_batches(self, items: List[Any], batch_size: Optional[int] = None):
+        """按批次切分列表，返回(起始下标, 批次)"""
+        batch_size = batch_size or self.bulk_batch_size
+        for start in range(0, len(items), batch_size):
+            yield start, items[start:start + batch_size]
+    
+    def filter_existing_urls(self, urls: List[str]) -> set:
+        """批量检查哪些原文URL已经存储过
+        
+        一次$in查询，依赖metadata.original_url上的唯一索引。
+        
+        Args:
+            urls: 原文URL列表
+            
+        Returns:
+            set: 已存在的URL集合
+        """
+        if not urls:
+            return set()
+        
+        query = {"metadata.original_url": {"$in": list(set(urls))}}
+        projection = {"metadata.original_url": 1, "_id": 0}
+        existing = {doc["metadata"]["original_url"] for doc in self.contents.find(query, projection)}
+        # 已归档的内容同样视为已存在，避免旧文章被重新抓取到热数据中
+        if len(existing) < len(query["metadata.original_url"]["$in"]):
+            query["metadata.original_url"]["$in"] = [url for url in query["metadata.original_url"]["$in"]
+                                                     if url not in existing]
+            existing.update(doc["metadata"]["original_url"] for doc in self.contents_archive.find(query, projection))
+        return existing
+    
+    def store_contents_bulk(self, contents: List[Union[Content, Dict[str, Any]]],
+                            batch_size: Optional[int] = None,
+                            dedupe_by_url: bool = False) -> Dict[str, Any]:
+        """批量存储内容到MongoDB
+        
+        使用无序批量写入，单条失败不影响同批次其他内容。
+        
+        Args:
+            contents: Content对象或内容字典列表
+            batch_size: 每批写入数量，默认使用配置中的bulk.batch_size
+            dedupe_by_url: 是否按metadata.original_url去重写入，已存在的URL不会重复插入
+            
+        Returns:
+            Dict: {"ids": 与输入一一对应的内容ID(失败或重复为None),
+                   "errors": [{"index", "error"}], "duplicates": 因URL已存在而跳过的下标}
+        """
+        ids: List[Optional[str]] = [None] * len(contents)
+        errors: List[Dict[str, Any]] = []
+        duplicates: List[int] = []
+        
+        for start, batch in self._iter_batches(contents, batch_size):
+            operations = []
+            # 操作下标 -> (输入下标, 内容ID)
+            op_index = []
+            # 输入下标 -> 原始HTML
+            original_contents = {}
+            for offset, item in enumerate(batch):
+                try:
+                    content = item if isinstance(item, Content) else Content(**item)
+                except Exception as e:
+                    errors.append({"index": start + offset, "error": str(e)})
+                    continue
+                
+                content_dict = content.dict(exclude_none=True)
+                content_dict.pop("id", None)
+                original_contents[start + offset] = content_dict.pop("original_content", None)
+                original_url = content.metadata.original_url
+                if content.id:
+                    object_id = ObjectId(content.id)
+                    content_dict["_id"] = object_id
+                    operations.append(ReplaceOne({"_id": object_id}, content_dict, upsert=True))
+                elif dedupe_by_url and original_url:
+                    # 按URL upsert，并发爬虫写入同一URL时只有一个会插入
+                    object_id = ObjectId()
+                    content_dict["_id"] = object_id
+                    operations.append(UpdateOne(
+                        {"metadata.original_url": original_url},
+                        {"$setOnInsert": content_dict},
+                        upsert=True
+                    ))
+                else:
+                    object_id = ObjectId()
+                    content_dict["_id"] = object_id
+                    operations.append(InsertOne(content_dict))
+                op_index.append((start + offset, str(object_id)))
+            
+            if not operations:
+                continue
+            
+            failed = set()
+            upserted_ops = set()
+            try:
+                result = self.contents.bulk_write(operations, ordered=False)
+                upserted_ops = set(result.upserted_ids or {})
+            except BulkWriteError as e:
+                upserted_ops = {upserted["index"] for upserted in e.details.get("upserted", [])}
+                for write_error in e.details.get("writeErrors", []):
+                    op = write_error["index"]
+                    index = op_index[op][0]
+                    failed.add(index)
+                    # URL去重写入时的唯一索引冲突说明已被其他进程写入
+                    if isinstance(operations[op], UpdateOne) and write_error.get("code") == 11000:
+                        duplicates.append(index)
+                    else:
+                        errors.append({"index": index, "error": write_error.get("errmsg", "")})
+            except Exception as e:
+                logger.error(f"批量存储内容失败: {e}")
+                for index, _ in op_index:
+                    failed.add(index)
+                    errors.append({"index": index, "error": str(e)})
+            
+            self.content_cache.delete_many(content_id for _, content_id in op_index)
+            
+            inserted = []
+            for op, (index, content_id) in enumerate(op_index):
+                if index in failed:
+                    continue
+                if isinstance(operations[op], UpdateOne) and op not in upserted_ops:
+                    # 匹配到已有文档，未插入
+                    duplicates.append(index)
+                    continue
+                ids[index] = content_id
+                if isinstance(operations[op], InsertOne) or op in upserted_ops:
+                    inserted.append(ObjectId(content_id))
+            self._stamp_ingested(inserted)
+            
+            # 主文档写入成功后再写入压缩的原始HTML
+            blob_operations = []
+            for index, content_id in op_index:
+                if ids[index] and original_contents.get(index) is not None:
+                    blob = compress_original_content(content_id, original_contents[index])
+                    blob_operations.append(ReplaceOne({"_id": blob["_id"]}, blob, upsert=True))
+            if blob_operations:
+                try:
+                    self.content_blobs.bulk_write(blob_operations, ordered=False)
+                except Exception as e:
+                    logger.error(f"批量存储原始内容失败: {e}")
+        
+        errors.sort(key=lambda error: error["index"])
+        duplicates.sort()
+        logger.info(f"批量内容存储完成, 成功: {len(contents) - len(errors) - len(duplicates)}, "
+                    f"重复: {len(duplicates)}, 失败: {len(errors)}")
+        return {"ids": ids, "errors": errors, "duplicates": duplicates}
+    
+    def store_vectors_bulk(self, embeddings: List[VectorEmbedding],
+                           batch_size: Optional[int] = None) -> Dict[str, Any]:
+        """批量存储内容向量
+        
+        Args:
+            embeddings: 向量嵌入列表
+            batch_size: 每批upsert的点数量，默认使用配置中的bulk.batch_size
+            
+        Returns:
+            Dict: {"success_count": 成功数量, "errors": [{"index", "content_id", "error"}]}
+        """
+        errors: List[Dict[str, Any]] = []
+        
+        for start, batch in self._iter_batches(embeddings, batch_size):
+            # 一次读取本批内容，补充过滤检索需要的payload字段
+            contents = {content.id: content for content in self.get_contents_by_ids(
+                [embedding.content_id for embedding in batch]
+            )}
+            for embedding in batch:
+                if embedding.content_id in contents:
+                    embedding.payload = {**build_vector_payload(contents[embedding.content_id]), **embedding.payload}
+            try:
+                self.vector_store.upsert(batch)
+            except Exception as e:
+                logger.error(f"批量存储向量失败: {e}")
+                for offset, embedding in enumerate(batch):
+                    errors.append({
+                        "index": start + offset,
+                        "content_id": embedding.content_id,
+                        "error": str(e)
+                    })
+        
+        logger.info(f"批量向量存储完成, 成功: {len(embeddings) - len(errors)}, 失败: {len(errors)}")
+        return {"success_count": len(embeddings) - len(errors), "errors": errors}
+    
+    @staticmethod
+    def _escape_relation_type(relation_type: str) -> str:
+        """转义关系类型，关系类型无法作为Cypher参数传入"""
+        return "`" + relation_type.replace("`", "``") + "`"
+    
+    @classmethod
+    def _merge_relations_cypher(cls, relation_type: str) -> str:
+        """按(源, 目标, 类型)幂等写入关系的UNWIND语句"""
+        return f"""
+            UNWIND $rows AS row
+            MERGE (s:Content {{id: row.source_id}})
+            MERGE (t:Content {{id: row.target_id}})
+            MERGE (s)-[r:{cls._escape_relation_type(relation_type)}]->(t)
+            SET r += row.properties
+        """
+    
+    @classmethod
+    def _write_relations_batch(cls, tx, batch: List[Any]) -> int:
+        """在一个事务中写入一批关系，返回新建的关系数量"""
+        # 关系类型不能参数化，事务内按类型分组，每种类型一条语句
+        grouped: Dict[str, List[Dict[str, Any]]] = {}
+        for _, relationship in batch:
+            grouped.setdefault(relationship.relation_type, []).append({
+                "source_id": relationship.source_id,
+                "target_id": relationship.target_id,
+                "properties": relationship.properties
+            })
+        
+        created = 0
+        for relation_type, rows in grouped.items():
+            summary = tx.run(cls._merge_relations_cypher(relation_type), rows=rows).consume()
+            created += summary.counters.relationships_created
+        return created
+    
+    def create_relations_bulk(self, relationships: List[Relationship],
+                              batch_size: Optional[int] = None) -> Dict[str, Any]:
+        """批量在Neo4j中创建或更新关系
+        
+        以(源, 目标, 类型)为键MERGE，重复分析不会产生重复的边，已存在的边只更新属性。
+        每个批次在一个事务中执行，事务内每种关系类型一条参数化的UNWIND语句。
+        
+        Args:
+            relationships: 关系列表
+            batch_size: 每个事务写入的关系数量，默认使用配置中的bulk.batch_size
+            
+        Returns:
+            Dict: {"created": 新建数量, "updated": 更新数量, "success_count": 成功数量,
+                   "errors": [{"index", "error"}]}
+        """
+        errors: List[Dict[str, Any]] = []
+        created = 0
+        
+        indexed = list(enumerate(relationships))
         with self.graph_db.session() as session:
-            # 确保源节点和目标节点存在
-            session.run("""
-                MERGE (s:Content {id: $source_id})
-                MERGE (t:Content {id: $target_id})
-            """, source_id=relationship.source_id, target_id=relationship.target_id)
+            for _, batch in self._iter_batches(indexed, batch_size):
+                try:
+                    created += session.execute_write(self._write_relations_batch, batch)
+                    self.relations_cache.delete_many({
+                        node_id
+                        for _, relationship in batch
+                        for node_id in (relationship.source_id, relationship.target_id)
+                    })
+                except Exception as e:
+                    logger.error(f"批量写入关系失败: {e}")
+                    for index, _ in batch:
+                        errors.append({"index": index, "error": str(e)})
+        
+        success_count = len(relationships) - len(errors)
+        logger.info(f"批量关系写入完成, 新建: {created}, 更新: {success_count - created}, 失败: {len(errors)}")
+        return {
+            "created": created,
+            "updated": success_count - created,
+            "success_count": success_count,
+            "errors": errors
+        }
+    
+    def get_content(self, content_id: str, include_original: bool = False) -> Optional[Content]:
+        """根据ID获取内容，优先读取缓存
+        
+        Args:
+            content_id: 内容ID
+            include_original: 是否加载原始HTML，只有详情页需要
+        """
+        content_dict = self.content_cache.get(content_id)
+        if content_dict is None:
+            content_dict = self.contents.find_one({"_id": ObjectId(content_id)}, HOT_PROJECTION)
+            if not content_dict:
+                content_dict = self.contents_archive.find_one({"_id": ObjectId(content_id)}, HOT_PROJECTION)
+            if not content_dict:
+                return None
+            upgrade_content_doc(content_dict)
+            content_dict["id"] = str(content_dict.pop("_id"))
+            self.content_cache.set(content_id, content_dict)
+        
+        content = Content(**content_dict)
+        if include_original and content.original_content is None:
+            content.original_content = self.get_original_content(content_id)
+        return content
+    
+    def get_original_content(self, content_id: str) -> Optional[str]:
+        """获取内容的原始HTML，兼容尚未迁移到content_blobs的文档"""
+        blob = self.content_blobs.find_one({"_id": ObjectId(content_id)})
+        if blob:
+            return decompress_original_content(blob)
+        
+        # 未迁移的文档可能已被归档，原始HTML仍内嵌在归档文档中
+        doc = self.contents.find_one({"_id": ObjectId(content_id)}, {"original_content": 1})
+        if doc is None:
+            doc = self.contents_archive.find_one({"_id": ObjectId(content_id)}, {"original_content": 1})
+        return doc.get("original_content") if doc else None
+    
+    def offload_original_contents(self, batch_size: Optional[int] = None) -> Dict[str, Any]:
+        """将contents集合中仍内嵌的原始HTML迁移到content_blobs集合
+        
+        可重复执行，每批先写入压缩后的HTML再从主文档中移除该字段。
+        
+        Args:
+            batch_size: 每批迁移的文档数量，默认使用配置中的bulk.batch_size
+            
+        Returns:
+            Dict: 迁移文档数、原始/压缩后字节数以及contents集合迁移前后的数据大小
+        """
+        batch_size = batch_size or self.bulk_batch_size
+        size_before = self.db.command("collstats", "contents").get("size", 0)
+        report = {"migrated": 0, "original_bytes": 0, "compressed_bytes": 0}
+        
+        while True:
+            docs = list(self.contents.find(
+                {"original_content": {"$exists": True}},
+                {"original_content": 1}
+            ).limit(batch_size))
+            if not docs:
+                break
             
-            # 创建它们之间的关系
-            properties_str = ", ".join([f"{k}: ${k}" for k in relationship.properties.keys()])
-            if properties_str:
-                properties_str = " {" + properties_str + "}"
+            blobs = [compress_original_content(doc["_id"], doc["original_content"] or "") for doc in docs]
+            self.content_blobs.bulk_write(
+                [ReplaceOne({"_id": blob["_id"]}, blob, upsert=True) for blob in blobs],
+                ordered=False
+            )
+            self.contents.bulk_write(
+                [UpdateOne({"_id": doc["_id"]}, {"$unset": {"original_content": ""}}) for doc in docs],
+                ordered=False
+            )
+            self.content_cache.delete_many(str(doc["_id"]) for doc in docs)
+            
+            report["migrated"] += len(docs)
+            report["original_bytes"] += sum(blob["size"] for blob in blobs)
+            report["compressed_bytes"] += sum(len(blob["data"]) for blob in blobs)
+            logger.info(f"已迁移原始内容 {report['migrated']} 条")
+        
+        report["contents_size_before"] = size_before
+        report["contents_size_after"] = self.db.command("collstats", "contents").get("size", 0)
+        logger.info(f"原始内容迁移完成: {report}")
+        return report
+    
+    def get_contents_by_ids(self, content_ids: List[str]) -> List[Content]:
+        """根据ID列表批量获取内容，按输入顺序返回，不存在的ID会被跳过
+        
+        缓存未命中的ID通过一次$in查询获取。
+        """
+        found: Dict[str, Dict[str, Any]] = {}
+        missing = []
+        for content_id in dict.fromkeys(content_ids):
+            cached = self.content_cache.get(content_id)
+            if cached is not None:
+                found[content_id] = cached
+            else:
+                missing.append(content_id)
+        
+        if missing:
+            cursor = self.contents.find(
+                {"_id": {"$in": [ObjectId(content_id) for content_id in missing]}}, HOT_PROJECTION
+            )
+            docs = list(cursor)
+            if len(docs) < len(missing):
+                # 热数据中没有的ID再到归档中查找
+                hot_ids = {doc["_id"] for doc in docs}
+                docs.extend(self.contents_archive.find(
+                    {"_id": {"$in": [ObjectId(content_id) for content_id in missing
+                                     if ObjectId(content_id) not in hot_ids]}},
+                    HOT_PROJECTION
+                ))
+            for doc in docs:
+                upgrade_content_doc(doc)
+                doc["id"] = str(doc.pop("_id"))
+                self.content_cache.set(doc["id"], doc)
+                found[doc["id"]] = doc
+        
+        return [Content(**found[content_id]) for content_id in content_ids if content_id in found]
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """获取缓存命中统计"""
+        return {"content": self.content_cache.stats(), "relations": self.relations_cache.stats()}
+    
+    def get_archive_boundary(self) -> Optional[datetime]:
+        """获取归档边界，早于该时间的内容可能在冷数据中；从未归档时返回None"""
+        if time.monotonic() >= self._archive_boundary_expires_at:
+            state = self.archive_state.find_one({"_id": ARCHIVE_STATE_ID})
+            self._archive_boundary = state.get("boundary") if state else None
+            self._archive_boundary_expires_at = time.monotonic() + ARCHIVE_BOUNDARY_TTL
+        return self._archive_boundary
+    
+    def _find_tiered(self, query: Dict[str, Any], projection: Optional[Dict[str, Any]],
+                     limit: int, skip: int = 0) -> List[Dict[str, Any]]:
+        """按(publish_time, _id)倒序查询，查询时间范围覆盖归档内容时合并冷数据
+        
+        projection需包含publish_time。
+        """
+        docs = list(self.contents.find(query, projection).sort(PAGE_SORT).skip(skip).limit(limit))
+        if not needs_cold_tier(query, docs, limit, self.get_archive_boundary()):
+            return docs
+        
+        if skip:
+            docs = list(self.contents.find(query, projection).sort(PAGE_SORT).limit(skip + limit))
+        cold_docs = list(self.contents_archive.find(query, projection).sort(PAGE_SORT).limit(skip + limit))
+        return merge_tier_docs(docs, cold_docs, skip, limit)
+    
+    def archive_old_contents(self, max_age_days: Optional[int] = None, drop_vectors: Optional[bool] = None,
+                             batch_size: Optional[int] = None) -> Dict[str, Any]:
+        """将早于指定天数且未收藏的内容移到contents_archive集合
+        
+        先推进归档边界再分批迁移（写入冷数据后再从热数据删除），迁移过程中的读请求仍能查到内容。
+        其他进程最多ARCHIVE_BOUNDARY_TTL秒后才会感知新的边界，期间按时间范围的查询可能漏掉刚归档的内容。
+        
+        Args:
+            max_age_days: 保留在热数据中的天数，默认使用配置中的archive.max_age_days
+            drop_vectors: 是否同时删除向量，默认使用配置中的archive.drop_vectors
+            batch_size: 每批迁移的数量，默认使用配置中的bulk.batch_size
             
-            cypher = f"""
-                MATCH (s:Content {{id: $source_id}}), (t:Content {{id: $target_id}})
-                CREATE (s)-[r:{relationship.relation_type}{properties_str}]->(t)
-                RETURN r
-            """
+        Returns:
+            Dict: {"boundary": 归档边界, "archived": 迁移数量, "vectors_dropped": 删除的向量数量}
+        """
+        if max_age_days is None:
+            max_age_days = self.archive_config.get('max_age_days', 365)
+        if drop_vectors is None:
+            drop_vectors = self.archive_config.get('drop_vectors', False)
+        batch_size = batch_size or self.bulk_batch_size
+        
+        boundary = datetime.now() - timedelta(days=max_age_days)
+        self.archive_state.update_one(
+            {"_id": ARCHIVE_STATE_ID},
+            {"$max": {"boundary": boundary}, "$set": {"updated_at": datetime.now()}},
+            upsert=True
+        )
+        self._archive_boundary_expires_at = 0.0
+        
+        query = {"publish_time": {"$lt": boundary}, "user_interactions.is_favorited": {"$ne": True}}
+        report = {"boundary": boundary, "archived": 0, "vectors_dropped": 0}
+        while True:
+            docs = list(self.contents.find(query).limit(batch_size))
+            if not docs:
+                break
             
-            session.run(cypher, 
-                source_id=relationship.source_id, 
-                target_id=relationship.target_id,
-                **relationship.properties
+            self.contents_archive.bulk_write(
+                [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in docs],
+                ordered=False
             )
+            object_ids = [doc["_id"] for doc in docs]
+            self.contents.delete_many({"_id": {"$in": object_ids}})
+            content_ids = [str(object_id) for object_id in object_ids]
+            self.content_cache.delete_many(content_ids)
+            report["archived"] += len(docs)
             
-            logger.info(f"关系创建完成: {relationship.source_id} --[{relationship.relation_type}]--> {relationship.target_id}")
+            if drop_vectors:
+                try:
+                    self.vector_store.delete(content_ids)
+                    report["vectors_dropped"] += len(content_ids)
+                except Exception as e:
+                    logger.error(f"删除归档内容的向量失败: {e}")
+            logger.info(f"已归档内容 {report['archived']} 条")
+        
+        logger.info(f"内容归档完成: {report}")
+        return report
     
-    def get_content(self, content_id: str) -> Optional[Content]:
-        """根据ID获取内容"""
-        content_dict = self.contents.find_one({"_id": ObjectId(content_id)})
-        if content_dict:
-            content_dict["id"] = str(content_dict.pop("_id"))
-            return Content(**content_dict)
-        return None
+    def upgrade_content_documents(self, batch_size: Optional[int] = None,
+                                  pause_seconds: float = 0.0) -> Dict[str, Any]:
+        """将低于当前结构版本的内容文档分批升级并写回，热数据和归档都会处理
+        
+        读取时已按需升级，该方法只是把结果持久化，可在服务运行期间执行且可重复执行。
+        每条文档以$set/$unset更新变化的字段，并以原版本号作为条件，期间被其他写入修改的文档会跳过，
+        留待下次执行。升级后仍无法解码的文档不会写回。
+        
+        Args:
+            batch_size: 每批处理的文档数量，默认使用配置中的bulk.batch_size
+            pause_seconds: 每批之间的停顿，降低对线上读写的影响
+            
+        Returns:
+            Dict: {"upgraded": 写回数量, "skipped": 并发修改而跳过的数量, "failed": 无法升级的文档ID}
+        """
+        batch_size = batch_size or self.bulk_batch_size
+        report = {"upgraded": 0, "skipped": 0, "failed": []}
+        
+        for collection in (self.contents, self.contents_archive):
+            last_id = None
+            while True:
+                query = {"schema_version": {"$not": {"$gte": CONTENT_SCHEMA_VERSION}}}
+                if last_id is not None:
+                    query["_id"] = {"$gt": last_id}
+                docs = list(collection.find(query, HOT_PROJECTION).sort("_id", ASCENDING).limit(batch_size))
+                if not docs:
+                    break
+                last_id = docs[-1]["_id"]
+                
+                operations = []
+                for doc in docs:
+                    version = get_doc_schema_version(doc)
+                    upgraded = copy.deepcopy(doc)
+                    try:
+                        upgrade_content_doc(upgraded)
+                        Content(**{key: value for key, value in upgraded.items() if key != "_id"})
+                    except Exception as e:
+                        logger.warning(f"内容结构升级失败, ID: {doc['_id']}: {e}")
+                        report["failed"].append(str(doc["_id"]))
+                        continue
+                    operations.append(UpdateOne(
+                        {"_id": doc["_id"], "schema_version": version if version else {"$exists": False}},
+                        build_upgrade_update(doc, upgraded)
+                    ))
+                
+                if operations:
+                    result = collection.bulk_write(operations, ordered=False)
+                    report["upgraded"] += result.modified_count
+                    report["skipped"] += len(operations) - result.matched_count
+                    self.content_cache.delete_many(str(doc["_id"]) for doc in docs)
+                logger.info(f"已升级内容结构 {report['upgraded']} 条")
+                if pause_seconds:
+                    time.sleep(pause_seconds)
+        
+        logger.info(f"内容结构升级完成, 升级: {report['upgraded']}, 跳过: {report['skipped']}, "
+                    f"失败: {len(report['failed'])}")
+        return report
     
     def search_contents(self, query: Dict[str, Any], limit: int = 20, skip: int = 0) -> List[Content]:
-        """基于条件搜索内容"""
-        cursor = self.contents.find(query).sort("publish_time", DESCENDING).skip(skip).limit(limit)
-        
+        """基于条件搜索内容，时间范围覆盖归档内容时合并冷数据"""
         results = []
-        for doc in cursor:
+        for doc in self._find_tiered(query, HOT_PROJECTION, limit, skip):
+            upgrade_content_doc(doc)
             doc["id"] = str(doc.pop("_id"))
             results.append(Content(**doc))
         
         return results
     
+    def search_content_summaries(self, query: Dict[str, Any], limit: int = 20, skip: int = 0,
+                                 fields: Optional[List[str]] = None) -> List[ContentSummary]:
+        """基于条件搜索内容摘要，只读取列表展示需要的字段"""
+        projection = build_summary_projection(fields)
+        # 合并冷热数据需要publish_time
+        projection["publish_time"] = 1
+        
+        results = []
+        for doc in self._find_tiered(query, projection, limit, skip):
+            upgrade_content_doc(doc, partial=True)
+            doc["id"] = str(doc.pop("_id"))
+            if fields is not None and "publish_time" not in fields:
+                doc.pop("publish_time", None)
+            results.append(ContentSummary(**doc))
+        
+        return results
+    
+    def _find_page(self, query: Dict[str, Any], projection: Optional[Dict[str, Any]],
+                   limit: int, cursor: Optional[str]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """按(publish_time, _id)键集分页查询原始文档，返回(文档列表, 下一页游标)"""
+        docs = self._find_tiered(build_keyset_query(query, cursor), projection, limit)
+        next_cursor = encode_page_cursor(docs[-1]) if len(docs) == limit else None
+        return docs, next_cursor
+    
+    def search_contents_page(self, query: Dict[str, Any], limit: int = 20,
+                             cursor: Optional[str] = None) -> Tuple[List[Content], Optional[str]]:
+        """基于条件分页搜索内容，翻页耗时与页码深度无关
+        
+        Args:
+            query: 查询条件
+            limit: 每页数量
+            cursor: 上一页返回的游标，为None时返回第一页
+            
+        Returns:
+            Tuple: (内容列表, 下一页游标，没有更多内容时为None)
+        """
+        docs, next_cursor = self._find_page(query, HOT_PROJECTION, limit, cursor)
+        
+        results = []
+        for doc in docs:
+            upgrade_content_doc(doc)
+            doc["id"] = str(doc.pop("_id"))
+            results.append(Content(**doc))
+        
+        return results, next_cursor
+    
+    def search_content_summaries_page(self, query: Dict[str, Any], limit: int = 20, cursor: Optional[str] = None,
+                                      fields: Optional[List[str]] = None) -> Tuple[List[ContentSummary], Optional[str]]:
+        """基于条件分页搜索内容摘要，返回(摘要列表, 下一页游标)"""
+        projection = build_summary_projection(fields)
+        # 生成游标需要publish_time
+        projection["publish_time"] = 1
+        docs, next_cursor = self._find_page(query, projection, limit, cursor)
+        
+        results = []
+        for doc in docs:
+            upgrade_content_doc(doc, partial=True)
+            doc["id"] = str(doc.pop("_id"))
+            if fields is not None and "publish_time" not in fields:
+                doc.pop("publish_time", None)
+            results.append(ContentSummary(**doc))
+        
+        return results, next_cursor
+    
     def text_search_contents(self, text_query: str, limit: int = 20) -> List[Content]:
         """基于文本搜索内容"""
         cursor = self.contents.find(
-            {"$text": {"$search": text_query}}
+            {"$text": {"$search": text_query}}, HOT_PROJECTION
         ).sort([("score", {"$meta": "textScore"})]).limit(limit)
         
         results = []
         for doc in cursor:
+            upgrade_content_doc(doc)
             doc["id"] = str(doc.pop("_id"))
             results.append(Content(**doc))
         
         return results
     
-    def search_similar_vectors(self, vector: List[float], limit: int = 10) -> List[Any]:
-        """搜索相似向量"""
-        results = self.vector_db.search(
-            collection_name="content_vectors",
-            query_vector=vector,
-            limit=limit
-        )
+    def text_search_content_summaries(self, text_query: str, limit: int = 20,
+                                      fields: Optional[List[str]] = None) -> List[ContentSummary]:
+        """基于文本搜索内容摘要，只读取列表展示需要的字段"""
+        projection = build_summary_projection(fields)
+        projection["score"] = {"$meta": "textScore"}
+        cursor = self.contents.find(
+            {"$text": {"$search": text_query}}, projection
+        ).sort([("score", {"$meta": "textScore"})]).limit(limit)
+        
+        results = []
+        for doc in cursor:
+            upgrade_content_doc(doc, partial=True)
+            doc["id"] = str(doc.pop("_id"))
+            doc.pop("score", None)
+            results.append(ContentSummary(**doc))
+        
         return results
     
-    def get_relations(self, content_id: str, relation_type: Optional[str] = None) -> List[Dict[str, Any]]:
-        """获取内容的关系"""
+    def search_similar_vectors(self, vector: List[float], limit: int = 10,
+                               platform: Optional[Union[str, List[str]]] = None,
+                               start_time: Optional[datetime] = None,
+                               end_time: Optional[datetime] = None,
+                               topics: Optional[List[str]] = None,
+                               exclude_ids: Optional[List[str]] = None) -> List[Any]:
+        """搜索相似向量，过滤条件在向量存储中执行，不需要多取再过滤
+        
+        Args:
+            vector: 查询向量
+            limit: 返回数量
+            platform: 平台，传入列表时匹配其中任意一个
+            start_time: 发布时间下限（含）
+            end_time: 发布时间上限（含）
+            topics: 主题，命中其中任意一个即可
+            exclude_ids: 需要排除的内容ID
+        """
+        return self.vector_store.search(
+            vector, limit=limit, platform=platform, start_time=start_time, end_time=end_time,
+            topics=topics, exclude_ids=exclude_ids
+        )
+    
+    def _query_relations(self, content_id: str, relation_type: Optional[str] = None,
+                         limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """执行一次无向邻域查询"""
         with self.graph_db.session() as session:
-            # 构建关系类型过滤条件
-            relation_filter = ""
-            if relation_type:
-                relation_filter = f"type(r) = '{relation_type}'"
-            
-            # 查询所有出发的关系
-            outgoing_query = f"""
-                MATCH (s:Content {{id: $content_id}})-[r{relation_filter and '-[' + relation_filter + ']-' or ''}]->(t:Content)
-                RETURN r, t
-            """
-            
-            # 查询所有到达的关系
-            incoming_query = f"""
-                MATCH (s:Content {{id: $content_id}})<-[r{relation_filter and '-[' + relation_filter + ']-' or ''}]-(t:Content)
-                RETURN r, t
-            """
-            
-            # 执行查询
-            outgoing_results = list(session.run(outgoing_query, content_id=content_id))
-            incoming_results = list(session.run(incoming_query, content_id=content_id))
-            
-            # 处理结果
-            relations = []
-            
-            for record in outgoing_results:
-                relation = record["r"]
-                target = record["t"]
-                
-                relations.append({
-                    "direction": "outgoing",
-                    "relation_type": type(relation).__name__,
-                    "target_id": target["id"],
-                    "properties": dict(relation)
-                })
-            
-            for record in incoming_results:
-                relation = record["r"]
-                source = record["t"]  # 注意这里t其实是源节点
-                
-                relations.append({
-                    "direction": "incoming",
-                    "relation_type": type(relation).__name__,
-                    "source_id": source["id"],
-                    "properties": dict(relation)
-                })
+            records = session.run(
+                build_neighborhood_cypher(limit),
+                content_id=content_id,
+                relation_type=relation_type,
+                limit=limit
+            ).data()
+        return [relation_from_record(record) for record in records]
+    
+    def get_relations(self, content_id: str, relation_type: Optional[str] = None,
+                      limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """获取内容的关系（出边和入边），优先读取邻域缓存
+        
+        Args:
+            content_id: 内容ID
+            relation_type: 只返回该类型的关系，为None时返回全部
+            limit: 最多返回的关系数量，为None时不限制
             
-            return relations
+        Returns:
+            List[Dict]: 关系列表，出边包含target_id，入边包含source_id
+        """
+        relations = self.relations_cache.get(content_id)
+        if relations is None:
+            relations = self._query_relations(content_id, limit=self.neighborhood_cache_limit)
+            self.relations_cache.set(content_id, relations)
+        
+        if len(relations) >= self.neighborhood_cache_limit:
+            # 邻域超过缓存上限，缓存的结果不完整，直接按条件查询
+            return self._query_relations(content_id, relation_type, limit)
+        
+        return filter_relations(relations, relation_type, limit)
     
     def store_user_config(self, user_config: UserConfig) -> str:
         """存储用户配置"""
@@ -266,6 +1061,7 @@ class DatabaseManager:
     def close(self):
         """关闭所有数据库连接"""
         self.mongo_client.close()
-        # Qdrant客户端不需要明确关闭
+        # Qdrant客户端不需要明确关闭，嵌入式向量存储需要落盘
+        self.vector_store.close()
         self.graph_db.close()
         logger.info("数据库连接已关闭") 
\ No newline at end of file
@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""用户交互的写后缓冲
+
+浏览、收藏、标签等事件先在内存中按内容合并，由后台线程定期以$inc/$set批量更新
+user_interactions字段，热门内容被打开上千次也只产生一次小的更新，不会反复重写包含
+原始HTML的整篇文档。更新操作不会触发增量处理管道（只监听insert）。
+
+配置位于 database.interactions:
+
+    interactions:
+      flush_interval_seconds: 5  # 后台刷新间隔
+      max_pending: 1000          # 待刷新的内容数量达到该值时立即刷新
+
+进程异常退出时最多丢失一个刷新间隔内的计数；正常关闭时close会刷新剩余事件。
+
+写入失败时只重试未生效的操作：批量写入按顺序执行，BulkWriteError给出第一个失败操作的
+下标，之前的操作已生效。无法确定哪些操作已生效的错误（如网络中断）只重试幂等的
+$max/$set/标签更新，浏览计数宁可少计也不重复累加。
+"""
+
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, ServerSelectionTimeoutError
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingInteractions:
+    """单条内容尚未写入的交互"""
+
+    __slots__ = ("views", "last_viewed", "is_favorited", "tags")
+
+    def __init__(self):
+        self.views = 0
+        self.last_viewed: Optional[datetime] = None
+        self.is_favorited: Optional[bool] = None
+        # 标签 -> True为添加，False为移除，同一标签以最后一次操作为准
+        self.tags: Dict[str, bool] = {}
+
+
+def build_interaction_updates(content_id: str, pending: _PendingInteractions) -> List[UpdateOne]:
+    """将合并后的交互转换为更新操作
+
+    同一字段不能在一次更新中同时$addToSet和$pull，标签有移除时单独生成一条更新。
+    """
+    _id = ObjectId(content_id)
+    update: Dict[str, Dict[str, Any]] = {}
+    if pending.views:
+        update["$inc"] = {"user_interactions.view_count": pending.views}
+    if pending.last_viewed is not None:
+        update["$max"] = {"user_interactions.last_viewed": pending.last_viewed}
+    if pending.is_favorited is not None:
+        update["$set"] = {"user_interactions.is_favorited": pending.is_favorited}
+
+    added = [tag for tag, add in pending.tags.items() if add]
+    removed = [tag for tag, add in pending.tags.items() if not add]
+    if added:
+        update["$addToSet"] = {"user_interactions.tags": {"$each": added}}
+
+    operations = [UpdateOne({"_id": _id}, update)] if update else []
+    if removed:
+        operations.append(UpdateOne({"_id": _id}, {"$pull": {"user_interactions.tags": {"$in": removed}}}))
+    return operations
+
+
+def _has_main_update(pending: _PendingInteractions) -> bool:
+    """是否需要生成$inc/$max/$set/$addToSet更新，与build_interaction_updates一致"""
+    return bool(pending.views or pending.last_viewed is not None or pending.is_favorited is not None
+                or any(pending.tags.values()))
+
+
+def _pending_subset(pending: _PendingInteractions, main: bool, pull: bool,
+                    views: bool = True) -> _PendingInteractions:
+    """取出未生效的部分交互
+
+    Args:
+        main: 包含$inc/$max/$set/$addToSet更新对应的交互
+        pull: 包含标签移除
+        views: 包含浏览次数，不确定$inc是否已生效时为False
+    """
+    subset = _PendingInteractions()
+    if main:
+        subset.views = pending.views if views else 0
+        subset.last_viewed = pending.last_viewed
+        subset.is_favorited = pending.is_favorited
+    subset.tags = {tag: add for tag, add in pending.tags.items() if (main if add else pull)}
+    return subset
+
+
+class InteractionRecorder:
+    """用户交互记录器，线程安全"""
+
+    def __init__(self, db_manager, interactions_config: Optional[Dict[str, Any]] = None):
+        """初始化
+
+        Args:
+            db_manager: 同步数据库管理器，刷新时使用其contents/contents_archive集合和内容缓存
+            interactions_config: 配置中的database.interactions部分
+        """
+        interactions_config = interactions_config or {}
+        self.db_manager = db_manager
+        self.flush_interval_seconds = interactions_config.get('flush_interval_seconds', 5)
+        self.max_pending = interactions_config.get('max_pending', 1000)
+        self._pending: Dict[str, _PendingInteractions] = {}
+        self._lock = threading.Lock()
+        # 保证同一时间只有一个刷新在执行，避免同一内容的两批更新乱序
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        # 缓冲达到max_pending时唤醒后台线程提前刷新
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.flushed_events = 0
+        self.flushed_writes = 0
+
+    def _get_pending(self, content_id: str) -> _PendingInteractions:
+        ObjectId(content_id)  # 提前校验ID，非法ID不进入缓冲
+        pending = self._pending.get(content_id)
+        if pending is None:
+            pending = self._pending[content_id] = _PendingInteractions()
+        return pending
+
+    def _after_record(self):
+        if len(self._pending) >= self.max_pending:
+            self._wakeup.set()
+
+    def record_view(self, content_id: str, viewed_at: Optional[datetime] = None):
+        """记录一次浏览"""
+        viewed_at = viewed_at or datetime.now()
+        with self._lock:
+            pending = self._get_pending(content_id)
+            pending.views += 1
+            if pending.last_viewed is None or viewed_at > pending.last_viewed:
+                pending.last_viewed = viewed_at
+        self._after_record()
+
+    def set_favorite(self, content_id: str, is_favorited: bool = True):
+        """收藏或取消收藏，以最后一次操作为准"""
+        with self._lock:
+            self._get_pending(content_id).is_favorited = is_favorited
+        self._after_record()
+
+    def add_tags(self, content_id: str, tags: Iterable[str]):
+        """添加标签"""
+        with self._lock:
+            pending = self._get_pending(content_id)
+            for tag in tags:
+                pending.tags[tag] = True
+        self._after_record()
+
+    def remove_tags(self, content_id: str, tags: Iterable[str]):
+        """移除标签"""
+        with self._lock:
+            pending = self._get_pending(content_id)
+            for tag in tags:
+                pending.tags[tag] = False
+        self._after_record()
+
+    def pending_count(self) -> int:
+        """待刷新的内容数量"""
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self) -> int:
+        """将缓冲的交互写入数据库
+
+        未生效的事件会合并回缓冲，下次刷新重试。
+
+        Returns:
+            int: 更新的内容数量
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+
+            try:
+                ids = [ObjectId(content_id) for content_id in pending]
+                hot_ids = {str(doc["_id"]) for doc in self.db_manager.contents.find({"_id": {"$in": ids}}, {"_id": 1})}
+            except Exception as e:
+                logger.error(f"刷新用户交互失败, 将在下次重试: {e}")
+                self._requeue(pending)
+                return 0
+
+            # 已归档的内容写入contents_archive，两个集合分别写入，失败时只重试失败的部分
+            flushed: Dict[str, _PendingInteractions] = {}
+            for collection, in_hot in ((self.db_manager.contents, True), (self.db_manager.contents_archive, False)):
+                part = {content_id: p for content_id, p in pending.items() if (content_id in hot_ids) == in_hot}
+                # (内容ID, 是否为标签移除)与操作一一对应
+                owners = []
+                operations = []
+                for content_id, p in part.items():
+                    content_operations = build_interaction_updates(content_id, p)
+                    if _has_main_update(p):
+                        owners.append((content_id, False))
+                    if not all(p.tags.values()):
+                        owners.append((content_id, True))
+                    operations.extend(content_operations)
+                if not operations:
+                    continue
+                try:
+                    collection.bulk_write(operations, ordered=True)
+                    applied = len(operations)
+                except BulkWriteError as e:
+                    # 有序写入在第一个失败的操作处停止，之前的操作均已生效；只有写关注错误时全部已生效
+                    write_errors = e.details.get("writeErrors") or []
+                    applied = write_errors[0]["index"] if write_errors else len(operations)
+                    if applied < len(operations):
+                        logger.error(f"刷新用户交互部分失败, 未生效的{len(operations) - applied}个操作将在下次重试: {e}")
+                except ServerSelectionTimeoutError as e:
+                    # 没有可用的服务器，操作未发送
+                    logger.error(f"刷新用户交互失败, 将在下次重试: {e}")
+                    self._requeue(part)
+                    continue
+                except Exception as e:
+                    # 无法确定哪些操作已生效，只重试幂等的更新
+                    lost_views = sum(p.views for p in part.values())
+                    logger.error(f"刷新用户交互失败, 重试幂等更新, 放弃{lost_views}次浏览计数: {e}")
+                    self._requeue({content_id: _pending_subset(p, main=True, pull=True, views=False)
+                                   for content_id, p in part.items()})
+                    continue
+
+                unapplied: Dict[str, set] = {}
+                for content_id, is_pull in owners[applied:]:
+                    unapplied.setdefault(content_id, set()).add(is_pull)
+                self._requeue({
+                    content_id: _pending_subset(part[content_id], main=False in failed, pull=True in failed)
+                    for content_id, failed in unapplied.items()
+                })
+                flushed.update({content_id: p for content_id, p in part.items() if content_id not in unapplied})
+                self.flushed_writes += applied
+
+            # 部分生效的内容同样需要失效缓存
+            self.db_manager.content_cache.delete_many(pending.keys())
+            self.flushed_events += sum(
+                p.views + (p.is_favorited is not None) + len(p.tags) for p in flushed.values()
+            )
+            logger.debug(f"用户交互刷新完成, 内容: {len(flushed)}")
+            return len(flushed)
+
+    def _requeue(self, pending: Dict[str, _PendingInteractions]):
+        """将写入失败的交互合并回缓冲，保留刷新期间新记录的事件"""
+        with self._lock:
+            for content_id, failed in pending.items():
+                if not _has_main_update(failed) and not failed.tags:
+                    continue
+                current = self._pending.get(content_id)
+                if current is None:
+                    self._pending[content_id] = failed
+                    continue
+                current.views += failed.views
+                if failed.last_viewed is not None and (
+                        current.last_viewed is None or failed.last_viewed > current.last_viewed):
+                    current.last_viewed = failed.last_viewed
+                if current.is_favorited is None:
+                    current.is_favorited = failed.is_favorited
+                current.tags = {**failed.tags, **current.tags}
+
+    def stats(self) -> Dict[str, Any]:
+        """刷新统计，flushed_events/flushed_writes即合并比例"""
+        return {
+            "pending": self.pending_count(),
+            "flushed_events": self.flushed_events,
+            "flushed_writes": self.flushed_writes
+        }
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval_seconds)
+            self._wakeup.clear()
+            self.flush()
+
+    def start(self) -> threading.Thread:
+        """启动后台刷新线程"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="interaction_recorder", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def close(self):
+        """停止后台线程并刷新剩余事件"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""数据库结构迁移
+
+索引、集合等DDL操作以带版本号的迁移登记在这里，已执行的版本记录在MongoDB的
+schema_migrations集合中。迁移只在启动时或通过 `app.py --init-db` 执行一次，
+DatabaseManager的构造函数不再执行任何DDL。
+
+新增迁移时使用递增的版本号:
+
+    @migration(3, "为xx字段创建索引")
+    def _add_xx_index(db_manager):
+        db_manager.contents.create_index("xx")
+"""
+
+import logging
+from datetime import datetime
+from typing import Callable, List, NamedTuple
+
+from pymongo import ASCENDING, DESCENDING, ReplaceOne
+from storage.vector_index import CONTENT_VECTORS, PAYLOAD_INDEXES, build_collection_params, configure_collection
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_COLLECTION = "schema_migrations"
+
+
+class Migration(NamedTuple):
+    """一次结构迁移"""
+    version: int
+    description: str
+    apply: Callable
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, description: str):
+    """注册迁移的装饰器"""
+    def decorator(func):
+        if any(m.version == version for m in MIGRATIONS):
+            raise ValueError(f"迁移版本重复: {version}")
+        MIGRATIONS.append(Migration(version, description, func))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return func
+    return decorator
+
+
+@migration(1, "创建内容集合和用户配置集合的索引")
+def _create_mongodb_indexes(db_manager):
+    # 内容集合的索引
+    db_manager.contents.create_index([("title", "text"), ("processed_text", "text")])
+    db_manager.contents.create_index([("platform", ASCENDING), ("publish_time", DESCENDING)])
+    db_manager.contents.create_index("topics")
+    db_manager.contents.create_index("keywords")
+
+    # 用户配置集合的索引
+    db_manager.user_configs.create_index("user_id", unique=True)
+    db_manager.user_configs.create_index("email")
+
+
+@migration(2, "创建Qdrant content_vectors集合")
+def _init_qdrant_collections(db_manager):
+    if db_manager.vector_db is None:
+        # 使用嵌入式向量存储，不需要Qdrant集合
+        return
+    collections = db_manager.vector_db.get_collections().collections
+    collection_names = [c.name for c in collections]
+
+    if CONTENT_VECTORS not in collection_names:
+        # 按 database.qdrant.collection 配置的维度和距离创建，未配置时为1536维余弦 (OpenAI ada-002模型)
+        db_manager.vector_db.create_collection(
+            collection_name=CONTENT_VECTORS,
+            **build_collection_params(db_manager.vector_collection_config)
+        )
+
+
+@migration(3, "创建(publish_time, _id)键集分页索引")
+def _create_keyset_pagination_indexes(db_manager):
+    # 在原有platform/publish_time索引基础上追加_id，作为同一时间内容的排序依据
+    db_manager.contents.create_index(
+        [("platform", ASCENDING), ("publish_time", DESCENDING), ("_id", DESCENDING)]
+    )
+    db_manager.contents.create_index([("publish_time", DESCENDING), ("_id", DESCENDING)])
+
+
+def _dedupe_original_urls(db_manager) -> int:
+    """为创建唯一索引清理重复的原文URL，每个URL保留最新抓取的一条
+
+    旧版本写入不去重，同一URL可能有多条内容。其余的移入contents_archive：按ID读取时
+    仍能从归档取到，已有的关系和引用不会失效；同时删除它们的向量，避免检索结果重复。
+
+    Returns:
+        int: 移出的重复内容数量
+    """
+    pipeline = [
+        {"$match": {"metadata.original_url": {"$type": "string"}}},
+        {"$sort": {"crawl_time": DESCENDING, "_id": DESCENDING}},
+        {"$group": {"_id": "$metadata.original_url", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ]
+    removed = 0
+    for group in db_manager.contents.aggregate(pipeline, allowDiskUse=True):
+        stale_ids = group["ids"][1:]
+        docs = list(db_manager.contents.find({"_id": {"$in": stale_ids}}))
+        if docs:
+            db_manager.contents_archive.bulk_write(
+                [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in docs], ordered=False
+            )
+        db_manager.contents.delete_many({"_id": {"$in": stale_ids}})
+        try:
+            db_manager.vector_store.delete([str(object_id) for object_id in stale_ids])
+        except Exception as e:
+            logger.error(f"删除重复内容的向量失败: {e}")
+        removed += len(stale_ids)
+        logger.warning(f"原文URL重复: {group['_id']}，保留 {group['ids'][0]}，归档 {len(stale_ids)} 条")
+    return removed
+
+
+@migration(4, "创建原文URL唯一索引")
+def _create_original_url_index(db_manager):
+    # 已有数据可能存在重复URL，先清理，否则创建唯一索引会因DuplicateKeyError失败
+    removed = _dedupe_original_urls(db_manager)
+    if removed:
+        logger.warning(f"已将 {removed} 条原文URL重复的内容移入归档")
+    # MongoDB的hashed索引不支持unique，这里使用普通唯一索引；只约束有URL的文档
+    db_manager.contents.create_index(
+        "metadata.original_url",
+        unique=True,
+        partialFilterExpression={"metadata.original_url": {"$type": "string"}}
+    )
+
+
+@migration(5, "为Neo4j内容节点id创建唯一约束")
+def _create_content_node_constraint(db_manager):
+    # 关系写入按节点id MERGE，没有约束时每次MERGE都是全标签扫描
+    with db_manager.graph_db.session() as session:
+        session.run(
+            "CREATE CONSTRAINT content_id IF NOT EXISTS FOR (c:Content) REQUIRE c.id IS UNIQUE"
+        ).consume()
+
+
+@migration(6, "应用向量集合的HNSW/量化配置并创建payload索引")
+def _configure_vector_collection(db_manager):
+    # v2按配置的维度和距离创建集合，此处更新HNSW/量化等参数（维度和距离创建后不可改）；
+    # 调整配置后可通过 app.py --init-db 重新应用，见storage.vector_index
+    if db_manager.vector_db is None:
+        return
+    configure_collection(db_manager.vector_db, db_manager.vector_collection_config)
+
+
+@migration(7, "为向量集合的topics创建payload索引")
+def _create_vector_topics_index(db_manager):
+    if db_manager.vector_db is None:
+        return
+    db_manager.vector_db.create_payload_index(
+        collection_name=CONTENT_VECTORS,
+        field_name="topics",
+        field_schema=PAYLOAD_INDEXES["topics"]
+    )
+
+
+@migration(8, "创建归档集合的索引")
+def _create_archive_indexes(db_manager):
+    # 与热数据的分页和平台查询索引一致；原文URL用于抓取去重，不要求唯一
+    db_manager.contents_archive.create_index([("publish_time", DESCENDING), ("_id", DESCENDING)])
+    db_manager.contents_archive.create_index(
+        [("platform", ASCENDING), ("publish_time", DESCENDING), ("_id", DESCENDING)]
+    )
+    db_manager.contents_archive.create_index("metadata.original_url")
+
+
+@migration(9, "创建入库时间索引")
+def _create_ingested_at_index(db_manager):
+    # 增量处理的轮询按服务端入库时间查询新内容
+    db_manager.contents.create_index([("ingested_at", ASCENDING), ("_id", ASCENDING)])
+
+
+def get_schema_version(db_manager) -> int:
+    """获取当前已执行的最高迁移版本，未执行过任何迁移时返回0"""
+    latest = db_manager.db[MIGRATIONS_COLLECTION].find_one(sort=[("version", DESCENDING)])
+    return latest["version"] if latest else 0
+
+
+def apply_migrations(db_manager) -> List[int]:
+    """执行所有未执行的迁移
+
+    Args:
+        db_manager: 数据库管理器实例
+
+    Returns:
+        List[int]: 本次执行的迁移版本号
+    """
+    registry = db_manager.db[MIGRATIONS_COLLECTION]
+    applied_versions = {doc["version"] for doc in registry.find({}, {"version": 1})}
+
+    applied = []
+    for m in MIGRATIONS:
+        if m.version in applied_versions:
+            continue
+
+        logger.info(f"执行数据库迁移 v{m.version}: {m.description}")
+        m.apply(db_manager)
+        # 多个进程同时启动时以upsert记录，保证每个版本只有一条记录
+        registry.update_one(
+            {"version": m.version},
+            {"$setOnInsert": {
+                "version": m.version,
+                "description": m.description,
+                "applied_at": datetime.now()
+            }},
+            upsert=True
+        )
+        applied.append(m.version)
+
+    if applied:
+        logger.info(f"数据库迁移完成，已执行版本: {applied}")
+    else:
+        logger.info("数据库结构已是最新版本")
+    return applied
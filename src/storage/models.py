@@ -5,6 +5,9 @@ from datetime import datetime
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel, Field
 
+# Content文档的结构版本，修改Content结构时递增并在storage.content_schema中登记升级函数
+CONTENT_SCHEMA_VERSION = 1
+
 
 class Entity(BaseModel):
     """文本中提取的实体"""
@@ -51,7 +54,7 @@ class Content(BaseModel):
     """内容数据模型"""
     id: Optional[str] = None  # MongoDB的_id会自动生成
     title: str
-    original_content: str
+    original_content: Optional[str] = None  # 原始HTML压缩存放在content_blobs集合，按需加载
     processed_text: str
     summary: str
     source: str  # 例如：微信公众号-XX
@@ -66,6 +69,7 @@ class Content(BaseModel):
     metadata: Metadata
     value_assessment: Optional[ValueAssessment] = None
     user_interactions: UserInteractions = Field(default_factory=UserInteractions)
+    schema_version: int = CONTENT_SCHEMA_VERSION
     
     class Config:
         schema_extra = {
@@ -91,6 +95,58 @@ class Content(BaseModel):
         }
 
 
+class ContentSummary(BaseModel):
+    """内容摘要，用于列表卡片展示，不包含原始HTML和处理后的正文
+    
+    所有字段均可选，按查询投影只填充请求的字段。
+    """
+    id: Optional[str] = None
+    title: Optional[str] = None
+    summary: Optional[str] = None
+    source: Optional[str] = None
+    platform: Optional[str] = None
+    publish_time: Optional[datetime] = None
+    formatted_time: Optional[str] = None
+    topics: Optional[List[str]] = None
+    keywords: Optional[List[str]] = None
+
+
+class EntityMention(BaseModel):
+    """LLM识别的实体，位置由正文查找得到"""
+    text: str
+    type: str
+
+
+class ContentAnalysis(BaseModel):
+    """单次LLM调用返回的内容分析结果，字段与Content对应"""
+    summary: str
+    keywords: List[str] = Field(default_factory=list)
+    topics: List[str] = Field(default_factory=list)
+    sentiment: Sentiment
+    entities: List[EntityMention] = Field(default_factory=list)
+    value_assessment: ValueAssessment
+
+    def to_content_fields(self, text: str) -> Dict[str, Any]:
+        """转换为可直接传给Content的字段，实体位置按其在正文中首次出现的位置计算"""
+        entities = []
+        for mention in self.entities:
+            start = text.find(mention.text)
+            entities.append(Entity(
+                text=mention.text,
+                type=mention.type,
+                start=start,
+                end=start + len(mention.text) if start >= 0 else -1
+            ))
+        return {
+            "summary": self.summary,
+            "keywords": self.keywords,
+            "topics": self.topics,
+            "sentiment": self.sentiment,
+            "entities": entities,
+            "value_assessment": self.value_assessment,
+        }
+
+
 class NotificationSettings(BaseModel):
     """通知设置"""
     email: Optional[Dict[str, Any]] = None
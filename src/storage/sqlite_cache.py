@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""基于SQLite的持久化LRU缓存
+
+向量缓存（processor.embedding_cache）与LLM响应缓存（processor.response_cache）的共同实现：
+条目保存在本地SQLite文件中，进程重启后仍然有效；超出容量时按最近使用时间淘汰，可选的
+过期时间从写入时刻计算。值的编码方式由子类通过encode/decode指定。
+"""
+
+import os
+import time
+import logging
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from storage.cache import CacheBackend
+
+logger = logging.getLogger(__name__)
+
+# 超出容量时一次多淘汰一部分，避免每次写入都触发淘汰
+_EVICT_FRACTION = 0.1
+
+
+class SQLiteCache(CacheBackend):
+    """基于SQLite的LRU缓存，支持可选的过期时间，线程安全"""
+
+    def __init__(self, path: str, max_entries: int, ttl_seconds: Optional[float] = None,
+                 encode: Callable[[Any], Any] = lambda value: value,
+                 decode: Callable[[Any], Any] = lambda data: data, name: str = "缓存"):
+        """初始化缓存
+
+        Args:
+            path: SQLite文件路径，目录不存在时自动创建
+            max_entries: 最大条目数
+            ttl_seconds: 有效期（秒），为None时永不过期
+            encode: 将值编码为SQLite可存储的str或bytes
+            decode: 将存储的数据解码为值
+            name: 日志中使用的缓存名称
+        """
+        super().__init__()
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.name = name
+        self._encode = encode
+        self._decode = decode
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries (last_used)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """读取缓存，未命中或已过期时返回None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._conn.commit()
+                self._size -= 1
+                row = None
+            if row is None:
+                self._record(False)
+                return None
+            self._conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self._record(True)
+        return self._decode(row[0])
+
+    def set(self, key: Hashable, value: Any):
+        """写入缓存，覆盖时重新计算有效期"""
+        data = self._encode(value)
+        now = time.time()
+        with self._lock:
+            exists = self._conn.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, created_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, data, now, now)
+            )
+            if not exists:
+                self._size += 1
+            if self._size > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """先清理过期条目，仍超出时淘汰最久未使用的条目，调用方需持有锁"""
+        if self.ttl_seconds is not None:
+            cursor = self._conn.execute("DELETE FROM entries WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+            self._size -= cursor.rowcount
+        if self._size > self.max_entries:
+            target = int(self.max_entries * (1 - _EVICT_FRACTION))
+            self._conn.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY last_used ASC LIMIT ?)",
+                (self._size - target,)
+            )
+            self._size = target
+        logger.info(f"{self.name}已淘汰至 {self._size} 条")
+
+    def delete(self, key: Hashable):
+        """删除缓存条目"""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._size -= cursor.rowcount
+            self._conn.commit()
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+            self._size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """返回命中统计，供监控使用"""
+        stats = super().stats()
+        with self._lock:
+            stats.update({"size": self._size, "max_size": self.max_entries, "ttl_seconds": self.ttl_seconds})
+        return stats
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+
+_sqlite_caches: Dict[str, SQLiteCache] = {}
+_sqlite_caches_lock = threading.Lock()
+
+
+def open_sqlite_cache(path: str, factory: Callable[[str], SQLiteCache]) -> SQLiteCache:
+    """同一进程内按路径复用缓存实例，首次打开时调用factory(path)创建"""
+    with _sqlite_caches_lock:
+        if path not in _sqlite_caches:
+            _sqlite_caches[path] = factory(path)
+        return _sqlite_caches[path]
@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Qdrant向量集合的调优参数
+
+配置位于 database.qdrant.collection，未配置的项使用Qdrant默认值:
+
+    collection:
+      vector_size: 1536
+      distance: cosine
+      on_disk: false            # 原始向量存放在磁盘，配合量化使用可大幅降低内存
+      hnsw:
+        m: 16
+        ef_construct: 100
+      quantization:
+        type: none              # none / scalar / product
+        always_ram: true
+        quantile: 0.99          # scalar
+        compression: x16        # product: x4 / x8 / x16 / x32 / x64
+      search:
+        hnsw_ef: 128
+        rescore: true           # 使用原始向量对量化结果重排
+        oversampling: 2.0
+
+configure_collection可重复执行，集合已存在时只更新可在线调整的参数并补建payload索引。
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from qdrant_client.http import models
+
+logger = logging.getLogger(__name__)
+
+CONTENT_VECTORS = "content_vectors"
+
+# 过滤检索使用的payload字段；publish_time以Unix时间戳存储，支持范围过滤
+PAYLOAD_INDEXES = {
+    "platform": models.PayloadSchemaType.KEYWORD,
+    "publish_time": models.PayloadSchemaType.FLOAT,
+    "topics": models.PayloadSchemaType.KEYWORD,
+}
+
+_DISTANCES = {
+    "cosine": models.Distance.COSINE,
+    "dot": models.Distance.DOT,
+    "euclid": models.Distance.EUCLID,
+}
+
+
+def build_hnsw_config(collection_config: Dict[str, Any]) -> Optional[models.HnswConfigDiff]:
+    """构建HNSW参数，未配置时返回None"""
+    hnsw = collection_config.get("hnsw") or {}
+    if not hnsw:
+        return None
+    return models.HnswConfigDiff(
+        m=hnsw.get("m"),
+        ef_construct=hnsw.get("ef_construct"),
+        on_disk=hnsw.get("on_disk")
+    )
+
+
+def build_quantization_config(collection_config: Dict[str, Any]):
+    """构建量化参数，type为none或未配置时返回None"""
+    quantization = collection_config.get("quantization") or {}
+    quantization_type = (quantization.get("type") or "none").lower()
+    always_ram = quantization.get("always_ram", True)
+
+    if quantization_type == "none":
+        return None
+    if quantization_type == "scalar":
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8,
+                quantile=quantization.get("quantile"),
+                always_ram=always_ram
+            )
+        )
+    if quantization_type == "product":
+        return models.ProductQuantization(
+            product=models.ProductQuantizationConfig(
+                compression=models.CompressionRatio(quantization.get("compression", "x16")),
+                always_ram=always_ram
+            )
+        )
+    raise ValueError(f"不支持的量化类型: {quantization_type}")
+
+
+def build_collection_params(collection_config: Dict[str, Any]) -> Dict[str, Any]:
+    """构建create_collection的参数"""
+    distance = collection_config.get("distance", "cosine").lower()
+    if distance not in _DISTANCES:
+        raise ValueError(f"不支持的距离类型: {distance}")
+
+    return {
+        "vectors_config": models.VectorParams(
+            size=collection_config.get("vector_size", 1536),
+            distance=_DISTANCES[distance],
+            on_disk=collection_config.get("on_disk")
+        ),
+        "hnsw_config": build_hnsw_config(collection_config),
+        "quantization_config": build_quantization_config(collection_config),
+    }
+
+
+def build_search_params(collection_config: Dict[str, Any]) -> Optional[models.SearchParams]:
+    """构建检索参数，未配置检索项且未启用量化时返回None（使用服务端默认值）"""
+    search = collection_config.get("search") or {}
+    quantized = build_quantization_config(collection_config) is not None
+    if not search and not quantized:
+        return None
+
+    return models.SearchParams(
+        hnsw_ef=search.get("hnsw_ef"),
+        quantization=models.QuantizationSearchParams(
+            rescore=search.get("rescore", True),
+            oversampling=search.get("oversampling")
+        ) if quantized else None
+    )
+
+
+def build_vector_payload(content) -> Dict[str, Any]:
+    """从Content提取过滤检索需要的payload字段"""
+    return {
+        "platform": content.platform,
+        "publish_time": content.publish_time.timestamp(),
+        "topics": list(content.topics),
+    }
+
+
+def build_vector_filter(platform: Optional[Union[str, List[str]]] = None,
+                        start_time: Optional[datetime] = None,
+                        end_time: Optional[datetime] = None,
+                        topics: Optional[List[str]] = None,
+                        exclude_ids: Optional[Iterable[str]] = None) -> Optional[models.Filter]:
+    """将检索条件转换为Qdrant的payload过滤条件，没有任何条件时返回None
+
+    Args:
+        platform: 平台，传入列表时匹配其中任意一个
+        start_time: 发布时间下限（含）
+        end_time: 发布时间上限（含）
+        topics: 主题，命中其中任意一个即可
+        exclude_ids: 需要排除的内容ID
+    """
+    must = []
+    if platform:
+        match = models.MatchAny(any=platform) if isinstance(platform, list) else models.MatchValue(value=platform)
+        must.append(models.FieldCondition(key="platform", match=match))
+    if start_time is not None or end_time is not None:
+        must.append(models.FieldCondition(key="publish_time", range=models.Range(
+            gte=start_time.timestamp() if start_time is not None else None,
+            lte=end_time.timestamp() if end_time is not None else None
+        )))
+    if topics:
+        must.append(models.FieldCondition(key="topics", match=models.MatchAny(any=list(topics))))
+
+    exclude_ids = list(exclude_ids or [])
+    must_not = [models.HasIdCondition(has_id=exclude_ids)] if exclude_ids else []
+
+    if not must and not must_not:
+        return None
+    return models.Filter(must=must or None, must_not=must_not or None)
+
+
+def configure_collection(client, collection_config: Dict[str, Any],
+                         collection_name: str = CONTENT_VECTORS):
+    """创建或更新向量集合并建立payload索引
+
+    向量维度和距离类型在集合创建后无法修改，已存在的集合只更新HNSW、量化和on_disk设置。
+    """
+    params = build_collection_params(collection_config)
+    existing = {c.name for c in client.get_collections().collections}
+
+    if collection_name not in existing:
+        client.create_collection(collection_name=collection_name, **params)
+        logger.info(f"已创建向量集合: {collection_name}")
+    else:
+        on_disk = collection_config.get("on_disk")
+        client.update_collection(
+            collection_name=collection_name,
+            vectors_config={"": models.VectorParamsDiff(on_disk=on_disk)} if on_disk is not None else None,
+            hnsw_config=params["hnsw_config"],
+            # 传None表示不修改，关闭量化需显式传Disabled
+            quantization_config=params["quantization_config"] or models.Disabled.DISABLED
+        )
+        logger.info(f"已更新向量集合参数: {collection_name}")
+
+    for field_name, field_schema in PAYLOAD_INDEXES.items():
+        client.create_payload_index(
+            collection_name=collection_name,
+            field_name=field_name,
+            field_schema=field_schema
+        )
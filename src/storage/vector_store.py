@@ -0,0 +1,459 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""可插拔的向量存储后端
+
+- QdrantVectorStore: 基于Qdrant服务，默认后端
+- NumpyVectorStore: 嵌入式后端，向量保存在内存映射的float32矩阵中，用NumPy分批计算
+  归一化点积取top-k。适合单机部署和测试，几十万条向量以内不需要额外运行Qdrant
+
+通过配置 database.vector_store.backend 选择后端（qdrant / embedded）。两种后端的
+检索结果都提供id、score和payload属性，过滤条件与build_vector_filter一致。
+
+嵌入式后端支持API与爬虫/处理流水线在不同进程中使用同一目录：写入持有目录下.lock文件的
+排他锁，检索持有共享锁，每次操作前检查行记录日志的变化并增量加载其他进程的写入。
+文件锁依赖fcntl，在没有fcntl的平台上只能由单个进程使用。
+"""
+
+import os
+import json
+import logging
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Union
+
+import numpy as np
+from qdrant_client.http import models
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from storage.models import VectorEmbedding
+from storage.vector_index import CONTENT_VECTORS, build_search_params, build_vector_filter
+
+logger = logging.getLogger(__name__)
+
+
+class VectorHit(NamedTuple):
+    """嵌入式后端的检索结果，属性与Qdrant的ScoredPoint一致"""
+    id: str
+    score: float
+    payload: Dict[str, Any]
+
+
+class VectorStore(ABC):
+    """向量存储后端基类"""
+
+    @abstractmethod
+    def upsert(self, embeddings: List[VectorEmbedding]):
+        """写入或覆盖向量，同一content_id只保留最新的一条"""
+        pass
+
+    @abstractmethod
+    def delete(self, content_ids: Iterable[str]):
+        """删除向量"""
+        pass
+
+    @abstractmethod
+    def search(self, vector: List[float], limit: int = 10,
+               platform: Optional[Union[str, List[str]]] = None,
+               start_time: Optional[datetime] = None,
+               end_time: Optional[datetime] = None,
+               topics: Optional[List[str]] = None,
+               exclude_ids: Optional[List[str]] = None) -> List[Any]:
+        """搜索相似向量，按相似度从高到低返回"""
+        pass
+
+    def close(self):
+        """释放资源"""
+        pass
+
+
+class QdrantVectorStore(VectorStore):
+    """基于Qdrant服务的向量存储"""
+
+    def __init__(self, client, collection_name: str = CONTENT_VECTORS,
+                 search_params: Optional[models.SearchParams] = None):
+        """初始化
+
+        Args:
+            client: QdrantClient
+            collection_name: 集合名称
+            search_params: 检索参数，见storage.vector_index.build_search_params
+        """
+        self.client = client
+        self.collection_name = collection_name
+        self.search_params = search_params
+
+    def upsert(self, embeddings: List[VectorEmbedding]):
+        """写入或覆盖向量"""
+        self.client.upsert(
+            collection_name=self.collection_name,
+            points=[
+                models.PointStruct(
+                    id=embedding.content_id,
+                    vector=embedding.vector,
+                    payload=embedding.payload
+                )
+                for embedding in embeddings
+            ]
+        )
+
+    def delete(self, content_ids: Iterable[str]):
+        """删除向量"""
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=models.PointIdsList(points=list(content_ids))
+        )
+
+    def search(self, vector: List[float], limit: int = 10,
+               platform: Optional[Union[str, List[str]]] = None,
+               start_time: Optional[datetime] = None,
+               end_time: Optional[datetime] = None,
+               topics: Optional[List[str]] = None,
+               exclude_ids: Optional[List[str]] = None) -> List[Any]:
+        """搜索相似向量，过滤条件在Qdrant中执行"""
+        return self.client.search(
+            collection_name=self.collection_name,
+            query_vector=vector,
+            query_filter=build_vector_filter(platform, start_time, end_time, topics, exclude_ids),
+            search_params=self.search_params,
+            limit=limit
+        )
+
+
+class NumpyVectorStore(VectorStore):
+    """嵌入式向量存储
+
+    目录结构:
+        vectors.f32   归一化后的float32矩阵，按行存放，容量不足时成倍扩容
+        rows.jsonl    行记录日志，每行为一次写入({"row", "id", "payload"})或删除({"row", "deleted"})
+
+    写入时覆盖已有行或追加新行，删除只记录墓碑，重启时重放日志即可恢复，不需要重建索引。
+    墓碑较多时可调用compact重写文件。
+
+    多个进程可同时打开同一目录：所有读写都在目录文件锁内进行，并先重放其他进程追加的
+    日志；日志文件被compact替换时重新加载。
+    """
+
+    VECTORS_FILE = "vectors.f32"
+    ROWS_FILE = "rows.jsonl"
+    LOCK_FILE = ".lock"
+
+    def __init__(self, path: str, dim: int = 1536, initial_capacity: int = 1024,
+                 search_batch_size: int = 65536):
+        """打开或创建向量存储
+
+        Args:
+            path: 数据目录
+            dim: 向量维度
+            initial_capacity: 新建时预分配的行数
+            search_batch_size: 检索时每批计算的行数，限制临时内存占用
+        """
+        self.path = path
+        self.dim = dim
+        self.initial_capacity = initial_capacity
+        self.search_batch_size = search_batch_size
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        if fcntl is None:
+            logger.warning("当前平台不支持文件锁，嵌入式向量存储只能由单个进程使用")
+        self._lock_file = open(os.path.join(path, self.LOCK_FILE), "a+")
+        with self._locked(exclusive=True, refresh=False):
+            self._load()
+        logger.info(f"嵌入式向量存储已加载: {path}, 向量数: {len(self._rows)}")
+
+    @contextmanager
+    def _locked(self, exclusive: bool, refresh: bool = True):
+        """持有线程锁和目录文件锁，并加载其他进程的写入"""
+        with self._lock:
+            if fcntl is not None:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                if refresh:
+                    self._refresh()
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """日志被替换时重新加载，有新追加的记录时增量重放，调用方需持有锁"""
+        try:
+            stat = os.stat(os.path.join(self.path, self.ROWS_FILE))
+        except FileNotFoundError:
+            stat = None
+        inode = stat.st_ino if stat else None
+        if inode != self._log_inode or (stat and stat.st_size < self._log_offset):
+            del self._vectors
+            self._load()
+        elif stat and stat.st_size > self._log_offset:
+            self._remap_if_grown()
+            self._replay()
+
+    def _load(self):
+        """映射向量文件并重放行记录日志"""
+        vectors_path = os.path.join(self.path, self.VECTORS_FILE)
+        if not os.path.exists(vectors_path):
+            with open(vectors_path, "wb") as f:
+                f.truncate(self.initial_capacity * self.dim * 4)
+        size = os.path.getsize(vectors_path)
+        capacity = size // (self.dim * 4)
+        if capacity == 0 or capacity * self.dim * 4 != size:
+            raise ValueError(f"向量文件大小与维度{self.dim}不匹配: {vectors_path}")
+
+        self._vectors = np.memmap(vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self._count = 0
+        self._ids: List[Optional[str]] = [None] * capacity
+        self._payloads: List[Dict[str, Any]] = [{}] * capacity
+        self._topics: List[frozenset] = [frozenset()] * capacity
+        # 平台编码为整数，过滤时可以直接用np.isin比较
+        self._platforms = np.full(capacity, -1, dtype=np.int32)
+        self._platform_codes: Dict[str, int] = {}
+        self._publish_times = np.full(capacity, np.nan, dtype=np.float64)
+        self._live = np.zeros(capacity, dtype=bool)
+        self._rows: Dict[str, int] = {}
+        self._log_inode = None
+        self._log_offset = 0
+        self._replay()
+
+    def _replay(self):
+        """从上次读到的位置继续重放行记录日志"""
+        rows_path = os.path.join(self.path, self.ROWS_FILE)
+        if not os.path.exists(rows_path):
+            return
+
+        with open(rows_path, "rb") as f:
+            self._log_inode = os.fstat(f.fileno()).st_ino
+            f.seek(self._log_offset)
+            data = f.read()
+            self._log_offset += len(data)
+
+        for line in data.decode("utf-8", errors="replace").splitlines():
+            if line:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 写入中断留下的不完整记录
+                    logger.warning(f"跳过损坏的向量行记录: {line[:80]}")
+                    continue
+                if record.get("deleted"):
+                    self._clear_row(record["row"])
+                else:
+                    self._set_row(record["row"], record["id"], record.get("payload") or {})
+                self._count = max(self._count, record["row"] + 1)
+
+    def _set_row(self, row: int, content_id: str, payload: Dict[str, Any]):
+        self._ids[row] = content_id
+        self._payloads[row] = payload
+        self._topics[row] = frozenset(payload.get("topics") or [])
+        platform = payload.get("platform")
+        self._platforms[row] = self._platform_codes.setdefault(platform, len(self._platform_codes)) \
+            if platform is not None else -1
+        publish_time = payload.get("publish_time")
+        self._publish_times[row] = publish_time if publish_time is not None else np.nan
+        self._live[row] = True
+        self._rows[content_id] = row
+
+    def _clear_row(self, row: int):
+        content_id = self._ids[row]
+        if content_id is not None and self._rows.get(content_id) == row:
+            del self._rows[content_id]
+        self._ids[row] = None
+        self._payloads[row] = {}
+        self._topics[row] = frozenset()
+        self._platforms[row] = -1
+        self._publish_times[row] = np.nan
+        self._live[row] = False
+
+    def _ensure_capacity(self, needed: int):
+        """容量不足时成倍扩容向量文件"""
+        capacity = self._vectors.shape[0]
+        if needed <= capacity:
+            return
+
+        new_capacity = max(capacity * 2, needed)
+        self._vectors.flush()
+        with open(os.path.join(self.path, self.VECTORS_FILE), "r+b") as f:
+            f.truncate(new_capacity * self.dim * 4)
+        self._remap_if_grown()
+
+    def _remap_if_grown(self):
+        """向量文件被扩容（可能由其他进程）后重新映射并扩展行属性数组"""
+        capacity = self._vectors.shape[0]
+        vectors_path = os.path.join(self.path, self.VECTORS_FILE)
+        new_capacity = os.path.getsize(vectors_path) // (self.dim * 4)
+        if new_capacity <= capacity:
+            return
+
+        del self._vectors
+        self._vectors = np.memmap(vectors_path, dtype=np.float32, mode="r+", shape=(new_capacity, self.dim))
+
+        extra = new_capacity - capacity
+        self._ids.extend([None] * extra)
+        self._payloads.extend([{}] * extra)
+        self._topics.extend([frozenset()] * extra)
+        self._platforms = np.concatenate([self._platforms, np.full(extra, -1, dtype=np.int32)])
+        self._publish_times = np.concatenate([self._publish_times, np.full(extra, np.nan)])
+        self._live = np.concatenate([self._live, np.zeros(extra, dtype=bool)])
+
+    def _normalize(self, vector: List[float]) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        if vector.shape != (self.dim,):
+            raise ValueError(f"向量维度应为{self.dim}，实际为{vector.shape}")
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _append_records(self, records: List[Dict[str, Any]]):
+        """追加日志并前移读取位置，自己写入的记录已在内存中生效，无需重放"""
+        data = "".join(json.dumps(record, ensure_ascii=False, default=str) + "\n" for record in records)
+        with open(os.path.join(self.path, self.ROWS_FILE), "ab") as f:
+            f.write(data.encode("utf-8"))
+            self._log_inode = os.fstat(f.fileno()).st_ino
+            self._log_offset = f.tell()
+
+    def upsert(self, embeddings: List[VectorEmbedding]):
+        """写入或覆盖向量，已存在的content_id原地覆盖"""
+        vectors = [self._normalize(embedding.vector) for embedding in embeddings]
+
+        with self._locked(exclusive=True):
+            new_ids = {e.content_id for e in embeddings if e.content_id not in self._rows}
+            self._ensure_capacity(self._count + len(new_ids))
+
+            records = []
+            for embedding, vector in zip(embeddings, vectors):
+                row = self._rows.get(embedding.content_id)
+                if row is None:
+                    row = self._count
+                    self._count += 1
+                self._vectors[row] = vector
+                self._set_row(row, embedding.content_id, embedding.payload)
+                records.append({"row": row, "id": embedding.content_id, "payload": embedding.payload})
+
+            # 先落盘向量再记录日志，保证日志引用的行都已写入
+            self._vectors.flush()
+            self._append_records(records)
+
+    def delete(self, content_ids: Iterable[str]):
+        """删除向量，只记录墓碑"""
+        with self._locked(exclusive=True):
+            records = []
+            for content_id in content_ids:
+                row = self._rows.get(content_id)
+                if row is not None:
+                    self._clear_row(row)
+                    records.append({"row": row, "deleted": True})
+            if records:
+                self._append_records(records)
+
+    def _filter_mask(self, count: int, platform, start_time, end_time, topics, exclude_ids) -> np.ndarray:
+        mask = self._live[:count].copy()
+        if platform:
+            platforms = platform if isinstance(platform, list) else [platform]
+            codes = [self._platform_codes[p] for p in platforms if p in self._platform_codes]
+            mask &= np.isin(self._platforms[:count], codes)
+        # 缺少发布时间(NaN)的向量在时间过滤时被排除
+        if start_time is not None:
+            mask &= self._publish_times[:count] >= start_time.timestamp()
+        if end_time is not None:
+            mask &= self._publish_times[:count] <= end_time.timestamp()
+        if topics:
+            wanted = set(topics)
+            mask &= np.fromiter((bool(wanted & row_topics) for row_topics in self._topics[:count]),
+                                dtype=bool, count=count)
+        for content_id in exclude_ids or []:
+            row = self._rows.get(content_id)
+            if row is not None:
+                mask[row] = False
+        return mask
+
+    def search(self, vector: List[float], limit: int = 10,
+               platform: Optional[Union[str, List[str]]] = None,
+               start_time: Optional[datetime] = None,
+               end_time: Optional[datetime] = None,
+               topics: Optional[List[str]] = None,
+               exclude_ids: Optional[List[str]] = None) -> List[VectorHit]:
+        """搜索相似向量（余弦相似度）"""
+        query = self._normalize(vector)
+
+        with self._locked(exclusive=False):
+            count = self._count
+            mask = self._filter_mask(count, platform, start_time, end_time, topics, exclude_ids)
+            candidates = int(mask.sum())
+            if candidates == 0 or limit <= 0:
+                return []
+
+            scores = np.empty(count, dtype=np.float32)
+            for start in range(0, count, self.search_batch_size):
+                end = min(start + self.search_batch_size, count)
+                np.dot(self._vectors[start:end], query, out=scores[start:end])
+            scores[~mask] = -np.inf
+
+            k = min(limit, candidates)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [VectorHit(self._ids[row], float(scores[row]), self._payloads[row]) for row in top]
+
+    def compact(self):
+        """去掉墓碑行并重写文件，其他进程在下次操作时重新加载"""
+        with self._locked(exclusive=True):
+            live_rows = np.flatnonzero(self._live[:self._count])
+            vectors = np.array(self._vectors[live_rows])
+            entries = [(self._ids[row], self._payloads[row]) for row in live_rows]
+
+            vectors_path = os.path.join(self.path, self.VECTORS_FILE)
+            rows_path = os.path.join(self.path, self.ROWS_FILE)
+            capacity = max(len(entries), 1)
+            with open(vectors_path + ".tmp", "wb") as f:
+                f.write(vectors.astype(np.float32).tobytes())
+                f.truncate(capacity * self.dim * 4)
+            with open(rows_path + ".tmp", "w", encoding="utf-8") as f:
+                for row, (content_id, payload) in enumerate(entries):
+                    f.write(json.dumps({"row": row, "id": content_id, "payload": payload},
+                                       ensure_ascii=False, default=str) + "\n")
+
+            del self._vectors
+            os.replace(vectors_path + ".tmp", vectors_path)
+            os.replace(rows_path + ".tmp", rows_path)
+            self._load()
+        logger.info(f"嵌入式向量存储压缩完成, 保留向量: {len(entries)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """返回存储统计"""
+        with self._lock:
+            return {
+                "vectors": len(self._rows),
+                "tombstones": self._count - len(self._rows),
+                "capacity": self._vectors.shape[0]
+            }
+
+    def close(self):
+        """落盘向量文件并释放文件锁句柄"""
+        with self._lock:
+            self._vectors.flush()
+            self._lock_file.close()
+
+
+def create_vector_store(vector_store_config: Dict[str, Any], collection_config: Dict[str, Any],
+                        client=None) -> VectorStore:
+    """按配置创建向量存储
+
+    Args:
+        vector_store_config: 配置中的database.vector_store部分，backend为qdrant（默认）或embedded
+        collection_config: 配置中的database.qdrant.collection部分，嵌入式后端从中读取向量维度
+        client: QdrantClient，使用qdrant后端时必须提供
+    """
+    backend = vector_store_config.get("backend", "qdrant")
+    if backend == "embedded":
+        return NumpyVectorStore(
+            vector_store_config.get("path", "data/vectors"),
+            dim=collection_config.get("vector_size", 1536)
+        )
+    if backend != "qdrant":
+        raise ValueError(f"不支持的向量存储后端: {backend}")
+
+    return QdrantVectorStore(client, search_params=build_search_params(collection_config))
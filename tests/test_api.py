@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import asyncio
+import unittest
+from unittest import mock
+from datetime import datetime
+
+# 确保可以导入src目录下的模块
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from fastapi.testclient import TestClient
+
+from api.main import app, get_async_db_manager, get_db_manager, get_interaction_recorder, get_llm_processor
+from storage.cache import LRUCache
+from storage.models import Content, Metadata
+
+
+def make_content(content_id="60f7e5c8a9f13e001c8e4321", **fields):
+    """构造存储的内容"""
+    now = datetime(2023, 1, 1, 8, 0, 0)
+    return Content(
+        id=content_id,
+        title="测试标题",
+        processed_text="处理后的内容",
+        summary="摘要",
+        source="API",
+        platform="api",
+        publish_time=now,
+        formatted_time=now.strftime("%Y-%m-%d %H:%M:%S"),
+        metadata=Metadata(word_count=6, read_time_minutes=0),
+        **fields
+    )
+
+
+class TestContentAPI(unittest.TestCase):
+    """内容API测试类"""
+
+    def setUp(self):
+        """设置测试环境，不启动应用生命周期，依赖项替换为mock"""
+        self.db = mock.MagicMock()
+        self.llm = mock.MagicMock()
+        self.recorder = mock.MagicMock()
+        app.dependency_overrides = {
+            get_async_db_manager: lambda: self.db,
+            get_llm_processor: lambda: self.llm,
+            get_interaction_recorder: lambda: self.recorder,
+            get_db_manager: lambda: mock.MagicMock()
+        }
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        """清理依赖项替换"""
+        app.dependency_overrides = {}
+
+    def test_create_content(self):
+        """测试创建内容返回存储的内容和提交的正文"""
+        stored = make_content(keywords=["AI"])
+        self.llm.analyze_content = mock.AsyncMock(return_value={"summary": "摘要", "keywords": ["AI"]})
+        self.llm.get_embedding = mock.AsyncMock(return_value=[0.1, 0.2])
+        self.db.store_content = mock.AsyncMock(return_value=stored.id)
+        self.db.get_content = mock.AsyncMock(return_value=stored)
+        self.db.store_vector = mock.AsyncMock()
+
+        response = self.client.post("/contents/", json={
+            "title": "测试标题", "content": "处理后的内容", "source": "API", "platform": "api"
+        })
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body["id"], stored.id)
+        self.assertEqual(body["content"], "处理后的内容")
+        self.assertEqual(body["keywords"], ["AI"])
+        self.db.store_vector.assert_awaited_once()
+
+    def test_get_content_without_submitted_text(self):
+        """测试获取只有摘要字段的已存储内容"""
+        self.db.get_content = mock.AsyncMock(return_value=make_content(original_content="<p>原文</p>"))
+
+        response = self.client.get("/contents/60f7e5c8a9f13e001c8e4321")
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body["summary"], "摘要")
+        self.assertEqual(body["original_content"], "<p>原文</p>")
+        self.assertIsNone(body["content"])
+        self.recorder.record_view.assert_called_once_with("60f7e5c8a9f13e001c8e4321")
+
+    def test_relationships_run_off_event_loop(self):
+        """测试关系分析和绘图在线程池中执行"""
+        analyzer = mock.MagicMock()
+        visualizer = mock.MagicMock()
+        visualizer.generate_relationship_graph.return_value = {"nodes": [], "edges": []}
+        app.state.graph_cache = LRUCache(max_size=10, ttl_seconds=None)
+
+        with mock.patch("api.main.RelationshipAnalyzer", return_value=analyzer), \
+                mock.patch("api.main.GraphVisualizer", return_value=visualizer), \
+                mock.patch("api.main.asyncio.to_thread", wraps=asyncio.to_thread) as to_thread:
+            response = self.client.get("/relationships/60f7e5c8a9f13e001c8e4321?depth=1")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"nodes": [], "edges": []})
+        self.assertEqual(to_thread.call_count, 2)
+        visualizer.generate_relationship_graph.assert_called_once_with("60f7e5c8a9f13e001c8e4321", depth=1)
+        analyzer.analyze_connections.assert_called_once_with("60f7e5c8a9f13e001c8e4321")
+
+
+if __name__ == '__main__':
+    unittest.main()
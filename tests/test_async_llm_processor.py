@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import unittest
+from unittest import mock
+
+# 确保可以导入src目录下的模块
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from openai import BadRequestError, RateLimitError
+
+from processor import rate_limiter
+from processor.async_llm_processor import AsyncLLMProcessor
+from tests.test_rate_limiter import make_status_error
+
+
+class TestAsyncLLMProcessor(unittest.IsolatedAsyncioTestCase):
+    """异步LLM处理器测试类"""
+
+    async def asyncSetUp(self):
+        """设置测试环境"""
+        config = mock.MagicMock()
+        config.get_llm_config.return_value = {
+            "base_url": "https://api.example.com/v1",
+            "async": {"max_in_flight": 2, "max_retries": 2, "backoff_seconds": 0}
+        }
+        rate_limiter._rate_limiters.clear()
+        with mock.patch("processor.async_llm_processor.AsyncOpenAI"):
+            self.llm = AsyncLLMProcessor(config=config)
+        self.create = self.llm.client.embeddings.create = mock.AsyncMock()
+
+    async def test_retry_honors_retry_after(self):
+        """测试429按Retry-After等待后重试"""
+        self.create.side_effect = [
+            make_status_error(RateLimitError, 429, {"retry-after": "3"}),
+            mock.MagicMock(data=[mock.MagicMock(index=0, embedding=[0.5])])
+        ]
+
+        with mock.patch("processor.async_llm_processor.asyncio.sleep", new=mock.AsyncMock()) as sleep:
+            vector = await self.llm.get_embedding("文本")
+
+        self.assertEqual(vector, [0.5])
+        self.assertEqual(self.create.call_count, 2)
+        self.assertGreaterEqual(sleep.call_args_list[0].args[0], 3)
+        self.assertGreater(self.llm.rate_limiter.blocked_until, 0)
+
+    async def test_bad_request_is_not_retried(self):
+        """测试请求无效时不重试"""
+        self.create.side_effect = make_status_error(BadRequestError, 400)
+
+        with self.assertRaises(BadRequestError):
+            await self.llm.get_embedding("文本")
+        self.assertEqual(self.create.call_count, 1)
+
+    async def test_get_embeddings_isolates_bad_input(self):
+        """测试批量请求无效时拆分隔离出错的文本"""
+        async def create(model, input):
+            if "坏" in input:
+                raise make_status_error(BadRequestError, 400)
+            return mock.MagicMock(data=[mock.MagicMock(index=i, embedding=[float(len(t))]) for i, t in enumerate(input)])
+        self.create.side_effect = create
+
+        vectors = await self.llm.get_embeddings(["a", "坏", "ccc"])
+
+        self.assertEqual(vectors, [[1.0], None, [3.0]])
+
+    async def test_analyze_content(self):
+        """测试单次分析走共享的请求通道并返回Content字段"""
+        analysis = {
+            "summary": "摘要", "keywords": ["AI"], "topics": ["技术"],
+            "sentiment": {"score": 0.0, "label": "neutral"},
+            "value_assessment": {"overall_score": 5, "relevance": 5, "timeliness": 5, "importance": 5, "uniqueness": 5}
+        }
+        chat = self.llm.client.chat.completions.create = mock.AsyncMock(return_value=mock.MagicMock(
+            choices=[mock.MagicMock(message=mock.MagicMock(content=json.dumps(analysis)))]
+        ))
+
+        fields = await self.llm.analyze_content("标题", "正文")
+
+        self.assertEqual(fields["summary"], "摘要")
+        self.assertEqual(fields["entities"], [])
+        self.assertEqual(chat.call_args.kwargs["response_format"], {"type": "json_object"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import unittest
+from unittest import mock
+from datetime import datetime, timedelta
+
+# 确保可以导入src目录下的模块
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+from processor.content_pipeline import ContentPipelineWorker
+
+
+def make_doc(title="测试标题", ingested_at=None):
+    """构造contents集合中的文档"""
+    return {
+        "_id": ObjectId(),
+        "ingested_at": ingested_at or datetime.utcnow(),
+        "title": title,
+        "processed_text": "处理后的内容",
+        "summary": "摘要",
+        "source": "微信公众号-测试",
+        "platform": "wechat",
+        "publish_time": datetime(2023, 1, 1),
+        "formatted_time": "2023-01-01 00:00:00",
+        "metadata": {"word_count": 6, "read_time_minutes": 1}
+    }
+
+
+class TestContentPipelineWorker(unittest.TestCase):
+    """增量内容处理worker测试类"""
+
+    def setUp(self):
+        """设置测试环境"""
+        self.db_manager = mock.MagicMock()
+        self.checkpoints = self.db_manager.db.__getitem__.return_value
+        self.checkpoints.find_one.return_value = None
+        self.analyzer = mock.MagicMock()
+        self.analyzer.llm.get_embeddings.side_effect = lambda texts: [[0.1, 0.2] for _ in texts]
+        self.on_processed = mock.MagicMock()
+        self.worker = ContentPipelineWorker(
+            self.db_manager, analyzer=self.analyzer, on_processed=self.on_processed,
+            pipeline_config={"batch_size": 2, "poll_interval_seconds": 0}
+        )
+
+    def test_process_batch(self):
+        """测试一批内容一次写入向量，再逐条分析关系"""
+        docs = [make_doc("标题1"), make_doc("标题2")]
+
+        processed = self.worker.process_batch(docs)
+
+        self.assertEqual(processed, 2)
+        embeddings = self.db_manager.store_vectors_bulk.call_args.args[0]
+        self.assertEqual([e.content_id for e in embeddings], [str(doc["_id"]) for doc in docs])
+        self.assertEqual(self.analyzer.analyze_connections.call_count, 2)
+        self.assertEqual(self.on_processed.call_count, 2)
+
+    def test_process_batch_skips_failed_embeddings(self):
+        """测试生成向量失败的内容不做关系分析"""
+        self.analyzer.llm.get_embeddings.side_effect = lambda texts: [None, [0.1, 0.2]]
+        docs = [make_doc("标题1"), make_doc("标题2")]
+
+        self.worker.process_batch(docs)
+
+        self.analyzer.analyze_connections.assert_called_once_with(str(docs[1]["_id"]), vector=[0.1, 0.2])
+
+    def test_backfill_embeddings(self):
+        """测试回填按_id分批生成向量且不做关系分析"""
+        docs = [make_doc("标题1"), make_doc("标题2"), make_doc("标题3")]
+        find = self.db_manager.contents.find.return_value.sort.return_value.limit
+        find.side_effect = [docs[:2], docs[2:], []]
+
+        report = self.worker.backfill_embeddings(batch_size=2)
+
+        self.assertEqual(report, {"contents": 3, "embedded": 3})
+        self.assertEqual(self.analyzer.llm.get_embeddings.call_count, 2)
+        self.assertEqual(self.db_manager.contents.find.call_args_list[1].args[0], {"_id": {"$gt": docs[1]["_id"]}})
+        self.analyzer.analyze_connections.assert_not_called()
+
+    def test_falls_back_to_polling_on_standalone(self):
+        """测试单机MongoDB不支持变更流时按入库时间轮询并保存断点"""
+        self.db_manager.contents.watch.side_effect = OperationFailure("not a replica set", code=40573)
+        ingested_at = datetime.utcnow() + timedelta(seconds=1)
+        docs = [make_doc("标题1", ingested_at), make_doc("标题2", ingested_at)]
+        find = self.db_manager.contents.find.return_value.sort.return_value.limit
+
+        def poll(limit):
+            if find.call_count > 1:
+                self.worker.stop()
+                return []
+            return docs
+        find.side_effect = poll
+
+        self.worker.run()
+
+        self.assertEqual(self.db_manager.store_vectors_bulk.call_count, 1)
+        update = self.checkpoints.update_one.call_args.args[1]
+        self.assertEqual(update["$set"]["since"], docs[-1]["ingested_at"])
+        self.assertEqual([entry["_id"] for entry in update["$set"]["recent"]], [doc["_id"] for doc in docs])
+
+    def test_poll_picks_up_late_commit_with_smaller_id(self):
+        """测试晚提交的内容（_id更小、入库时间早于断点）在重叠窗口内仍被处理，已处理的不重复"""
+        now = datetime.utcnow()
+        early = make_doc("先生成后提交", ingested_at=now - timedelta(seconds=5))
+        processed = make_doc("已处理", ingested_at=now)
+        early["_id"], processed["_id"] = sorted([early["_id"], processed["_id"]])
+        self.checkpoints.find_one.return_value = {
+            "_id": "content_pipeline", "since": now, "recent": [{"_id": processed["_id"], "at": now}]
+        }
+        self.db_manager.contents.watch.side_effect = OperationFailure("not a replica set", code=40573)
+        find = self.db_manager.contents.find.return_value.sort.return_value.limit
+
+        def poll(limit):
+            if find.call_count > 1:
+                self.worker.stop()
+                return []
+            return [early]
+        find.side_effect = poll
+
+        self.worker.run()
+
+        query = self.db_manager.contents.find.call_args_list[0].args[0]
+        self.assertEqual(query["ingested_at"], {"$gte": now - timedelta(seconds=60)})
+        self.assertEqual(query["_id"], {"$nin": [processed["_id"]]})
+        self.analyzer.analyze_connections.assert_called_once_with(str(early["_id"]), vector=[0.1, 0.2])
+
+    def test_watch_saves_resume_token(self):
+        """测试变更流处理完一批后保存resume token"""
+        doc = make_doc()
+        stream = self.db_manager.contents.watch.return_value.__enter__.return_value
+        stream.resume_token = {"_data": "token"}
+
+        def next_change():
+            if stream.try_next.call_count > 1:
+                self.worker.stop()
+                return None
+            return {"operationType": "insert", "fullDocument": doc}
+        stream.try_next.side_effect = next_change
+
+        self.worker.run()
+
+        self.assertEqual(self.db_manager.store_vectors_bulk.call_count, 1)
+        update = self.checkpoints.update_one.call_args.args[1]
+        self.assertEqual(update["$set"]["resume_token"], {"_data": "token"})
+        # 只监听插入，覆盖已有内容不会重新处理和推送
+        pipeline = self.db_manager.contents.watch.call_args.args[0]
+        self.assertEqual(pipeline, [{"$match": {"operationType": "insert"}}])
+
+
+class TestCrawlerCallbackPath(unittest.TestCase):
+    """未启用pipeline时爬虫回调路径测试类"""
+
+    def test_batch_callback_embeds_once_and_stores_vectors(self):
+        """测试爬虫批量存储的内容一次生成向量并写入，关系分析复用向量"""
+        from crawler.base_crawler import BaseCrawler
+        from crawler.scheduler import CrawlerScheduler
+
+        db_manager = mock.MagicMock()
+        ids = [str(ObjectId()), None, str(ObjectId())]
+        db_manager.store_contents_bulk.return_value = {"ids": ids, "errors": []}
+        analyzer = mock.MagicMock()
+        analyzer.llm.get_embeddings.side_effect = lambda texts: [[0.1, 0.2] for _ in texts]
+        config = mock.MagicMock()
+        config.get_pipeline_config.return_value = {}
+
+        with mock.patch("crawler.scheduler.RelationshipAnalyzer", return_value=analyzer), \
+                mock.patch("crawler.scheduler.GraphVisualizer"):
+            scheduler = CrawlerScheduler(crawler_config={}, push_manager=mock.MagicMock(),
+                                         config=config, db_manager=db_manager)
+        crawler = BaseCrawler(config=config, db_manager=db_manager)
+        crawler.set_content_callback(scheduler.process_new_content)
+        crawler.set_contents_callback(scheduler.process_new_contents)
+
+        contents_data = []
+        for title in ["标题1", "已存在", "标题2"]:
+            doc = make_doc(title)
+            doc.pop("_id")
+            contents_data.append(doc)
+        crawler.store_and_process_contents(contents_data)
+
+        analyzer.llm.get_embeddings.assert_called_once_with(["处理后的内容", "处理后的内容"])
+        analyzer.llm.get_embedding.assert_not_called()
+        embeddings = db_manager.store_vectors_bulk.call_args.args[0]
+        self.assertEqual([e.content_id for e in embeddings], [ids[0], ids[2]])
+        analyzer.analyze_connections.assert_has_calls([
+            mock.call(ids[0], vector=[0.1, 0.2]), mock.call(ids[2], vector=[0.1, 0.2])
+        ])
+        self.assertEqual(scheduler.push_manager.push_notification.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
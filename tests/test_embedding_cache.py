@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+# 确保可以导入src目录下的模块
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from processor.embedding_cache import DiskEmbeddingCache, embedding_cache_key
+from processor.llm_processor import LLMProcessor, chunk_embedding_inputs
+
+
+class TestDiskEmbeddingCache(unittest.TestCase):
+    """持久化向量缓存测试类"""
+
+    def setUp(self):
+        """设置测试环境"""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "cache", "embeddings.sqlite3")
+
+    def tearDown(self):
+        """清理测试环境"""
+        shutil.rmtree(self.tmp_dir)
+
+    def test_key_normalizes_text_and_includes_model(self):
+        """测试键忽略空白差异并区分模型"""
+        self.assertEqual(embedding_cache_key("m1", " 人工智能\n 医疗 "), embedding_cache_key("m1", "人工智能 医疗"))
+        self.assertNotEqual(embedding_cache_key("m1", "文本"), embedding_cache_key("m2", "文本"))
+
+    def test_persists_across_instances(self):
+        """测试重新打开后仍能命中"""
+        cache = DiskEmbeddingCache(self.path)
+        cache.set("k", [0.5, -0.25])
+        cache.close()
+
+        reopened = DiskEmbeddingCache(self.path)
+        self.assertEqual(reopened.get("k"), [0.5, -0.25])
+        self.assertIsNone(reopened.get("missing"))
+        self.assertEqual(reopened.stats()["hit_rate"], 0.5)
+        reopened.close()
+
+
+class TestLLMProcessorEmbeddingCache(unittest.TestCase):
+    """LLMProcessor向量缓存测试类"""
+
+    def setUp(self):
+        """设置测试环境"""
+        self.tmp_dir = tempfile.mkdtemp()
+        config = mock.MagicMock()
+        config.get_llm_config.return_value = {
+            "embedding_model": "text-embedding-ada-002",
+            "embedding_cache": {"enabled": True, "path": os.path.join(self.tmp_dir, "embeddings.sqlite3")}
+        }
+        with mock.patch("processor.llm_processor.OpenAI"):
+            self.llm = LLMProcessor(config=config)
+        self.llm.client.embeddings.create.return_value.data = [mock.MagicMock(embedding=[0.5, 0.25])]
+
+    def tearDown(self):
+        """清理测试环境"""
+        self.llm.embedding_cache.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_get_embedding_uses_cache(self):
+        """测试相同文本只调用一次API"""
+        first = self.llm.get_embedding("人工智能在医疗领域的应用")
+        second = self.llm.get_embedding("人工智能在医疗领域的应用 ")
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.llm.client.embeddings.create.call_count, 1)
+        self.assertEqual(self.llm.get_embedding_cache_stats()["hits"], 1)
+
+
+class TestLLMProcessorBatchEmbeddings(unittest.TestCase):
+    """批量向量化测试类"""
+
+    def setUp(self):
+        """设置测试环境"""
+        config = mock.MagicMock()
+        config.get_llm_config.return_value = {
+            "embedding_batch": {"max_items": 2, "max_tokens": 1000, "max_retries": 1, "backoff_seconds": 0}
+        }
+        with mock.patch("processor.llm_processor.OpenAI"):
+            self.llm = LLMProcessor(config=config)
+
+        def create(model, input):
+            if "坏" in input:
+                raise RuntimeError("服务暂时不可用")
+            # 乱序返回，验证按index还原顺序
+            data = [mock.MagicMock(index=i, embedding=[float(len(text))]) for i, text in enumerate(input)]
+            return mock.MagicMock(data=list(reversed(data)))
+        self.llm.client.embeddings.create.side_effect = create
+
+    def test_chunk_embedding_inputs(self):
+        """测试按条数和token上限切分"""
+        self.assertEqual(chunk_embedding_inputs(["a", "b", "c"], max_items=2, max_tokens=100), [[0, 1], [2]])
+        self.assertEqual(chunk_embedding_inputs(["字" * 60, "字" * 60, "a"], max_items=10, max_tokens=100),
+                         [[0], [1, 2]])
+
+    def test_get_embeddings_preserves_order_and_dedupes(self):
+        """测试结果与输入顺序一致，重复文本只请求一次"""
+        vectors = self.llm.get_embeddings(["a", "bb", "a", "ccc"])
+
+        self.assertEqual(vectors, [[1.0], [2.0], [1.0], [3.0]])
+        self.assertEqual(self.llm.client.embeddings.create.call_count, 2)
+
+    def test_get_embeddings_retries_only_failed_batch(self):
+        """测试只重试失败的批次，其他批次的结果不受影响"""
+        vectors = self.llm.get_embeddings(["a", "bb", "坏", "dddd"])
+
+        self.assertEqual(vectors, [[1.0], [2.0], None, None])
+        # 第一批1次，失败的第二批1次加1次重试
+        self.assertEqual(self.llm.client.embeddings.create.call_count, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
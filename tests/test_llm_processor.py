@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import unittest
+from unittest import mock
+
+# 确保可以导入src目录下的模块
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from processor.llm_processor import LLMProcessor, build_analysis_messages
+
+
+ANALYSIS = {
+    "summary": "AI辅助诊断提升了效率。",
+    "keywords": ["AI", "医疗"],
+    "topics": ["人工智能"],
+    "sentiment": {"score": 0.6, "label": "positive"},
+    "entities": [{"text": "AI", "type": "OTHER"}],
+    "value_assessment": {"overall_score": 8, "relevance": 8, "timeliness": 7, "importance": 8, "uniqueness": 6}
+}
+
+
+class TestLLMProcessorAnalyzeContent(unittest.TestCase):
+    """单次内容分析测试类"""
+
+    def setUp(self):
+        """设置测试环境"""
+        config = mock.MagicMock()
+        config.get_llm_config.return_value = {"analysis": {"max_input_chars": 10}}
+        with mock.patch("processor.llm_processor.OpenAI"):
+            self.llm = LLMProcessor(config=config)
+        self.create = self.llm.client.chat.completions.create
+
+    def reply(self, *contents):
+        self.create.side_effect = [
+            mock.MagicMock(choices=[mock.MagicMock(message=mock.MagicMock(content=c))]) for c in contents
+        ]
+
+    def test_truncates_input(self):
+        """测试正文超过上限时截断"""
+        messages = build_analysis_messages("标题", "字" * 20, max_chars=10)
+        self.assertIn("字" * 10, messages[-1]["content"])
+        self.assertNotIn("字" * 11, messages[-1]["content"])
+
+    def test_returns_content_fields(self):
+        """测试一次调用返回全部字段，实体位置按正文计算"""
+        self.reply("```json\n" + json.dumps(ANALYSIS) + "\n```")
+
+        fields = self.llm.analyze_content("标题", "医疗中的AI")
+
+        self.assertEqual(self.create.call_count, 1)
+        self.assertEqual(self.create.call_args.kwargs["response_format"], {"type": "json_object"})
+        self.assertEqual(fields["summary"], "AI辅助诊断提升了效率。")
+        self.assertEqual(fields["value_assessment"].overall_score, 8)
+        self.assertEqual((fields["entities"][0].start, fields["entities"][0].end), (4, 6))
+
+    def test_retries_once_on_invalid_output(self):
+        """测试格式不符时把错误反馈给模型重试一次"""
+        self.reply("不是JSON", json.dumps(ANALYSIS))
+
+        fields = self.llm.analyze_content("标题", "正文")
+
+        self.assertEqual(fields["keywords"], ["AI", "医疗"])
+        self.assertEqual(self.create.call_args.kwargs["messages"][-2]["content"], "不是JSON")
+
+    def test_raises_after_retry(self):
+        """测试重试后仍不符合格式时抛出ValueError"""
+        broken = {k: v for k, v in ANALYSIS.items() if k != "sentiment"}
+        self.reply(json.dumps(broken), json.dumps(broken))
+
+        with self.assertRaises(ValueError):
+            self.llm.analyze_content("标题", "正文")
+        self.assertEqual(self.create.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
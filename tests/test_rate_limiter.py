@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+# 确保可以导入src目录下的模块
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import httpx
+from openai import RateLimitError
+
+from processor import rate_limiter
+from processor.llm_processor import LLMProcessor
+from processor.rate_limiter import (
+    RateLimiter, RedisRateLimiter, TokenBucket, get_rate_limit_config, get_rate_limiter, parse_retry_after
+)
+
+
+def make_status_error(error_class, status_code, headers=None):
+    """构造openai的HTTP错误"""
+    response = httpx.Response(
+        status_code, headers=headers or {}, request=httpx.Request("POST", "https://api.example.com/v1")
+    )
+    return error_class("error", response=response, body=None)
+
+
+class TestRateLimiting(unittest.TestCase):
+    """限流与Retry-After解析测试类"""
+
+    def setUp(self):
+        """设置测试环境"""
+        rate_limiter._rate_limiters.clear()
+
+    def test_token_bucket(self):
+        """测试配额用尽后返回需要等待的时间，校正可退还配额"""
+        bucket = TokenBucket(60)
+        self.assertEqual(bucket.try_acquire(60), 0.0)
+        self.assertAlmostEqual(bucket.try_acquire(1), 1.0, places=1)
+        bucket.adjust(-30)
+        self.assertEqual(bucket.try_acquire(30), 0.0)
+
+    def test_parse_retry_after(self):
+        """测试解析秒数、毫秒和缺失的Retry-After"""
+        self.assertEqual(parse_retry_after(make_status_error(RateLimitError, 429, {"retry-after": "7"})), 7.0)
+        self.assertEqual(parse_retry_after(make_status_error(RateLimitError, 429, {"retry-after-ms": "250"})), 0.25)
+        self.assertIsNone(parse_retry_after(make_status_error(RateLimitError, 429)))
+
+    def test_rate_limit_config_falls_back_to_async_section(self):
+        """测试未在rate_limit中配置的配额读取llm.async下的旧配置"""
+        config = get_rate_limit_config({
+            "async": {"requests_per_minute": 100, "max_in_flight": 4},
+            "rate_limit": {"backend": "redis", "tokens_per_minute": 5000}
+        })
+
+        self.assertEqual(config, {"backend": "redis", "tokens_per_minute": 5000, "requests_per_minute": 100})
+
+    def test_redis_backend_shares_limiter_through_redis(self):
+        """测试redis后端通过Lua脚本原子地扣减共享令牌桶"""
+        client = mock.MagicMock()
+        client.eval.return_value = b"0"
+        with mock.patch("processor.rate_limiter._get_redis_client", return_value=client) as get_client:
+            limiter = get_rate_limiter(
+                "https://api.example.com/v1",
+                {"backend": "redis", "requests_per_minute": 60, "tokens_per_minute": 1000},
+                default_redis_url="redis://localhost:6379/1"
+            )
+
+        get_client.assert_called_once_with("redis://localhost:6379/1")
+        self.assertIsInstance(limiter, RedisRateLimiter)
+        self.assertEqual(limiter.reserve(5000), 0.0)
+        args = client.eval.call_args.args
+        self.assertEqual(args[1:5], (3, limiter.pause_key, limiter.requests_key, limiter.tokens_key))
+        # 超过容量的请求按容量扣减
+        self.assertEqual(args[5:], ("0", 60, 1, 1000, 1000, 120))
+
+        client.eval.return_value = b"2.5"
+        self.assertEqual(limiter.reserve(10), 2.5)
+
+        limiter.pause(3)
+        self.assertEqual(client.eval.call_args.args[1:], (1, limiter.pause_key, 3000))
+
+    def test_redis_failure_falls_back_to_local_limits(self):
+        """测试Redis不可用时按进程内配额限流"""
+        client = mock.MagicMock()
+        client.eval.side_effect = ConnectionError("redis down")
+        limiter = RedisRateLimiter(client, "test", requests_per_minute=1, tokens_per_minute=None)
+
+        self.assertEqual(limiter.reserve(10), 0.0)
+        self.assertGreater(limiter.reserve(10), 0)
+
+
+class TestLLMProcessorRateLimiting(unittest.TestCase):
+    """同步LLM处理器的限流与重试测试类"""
+
+    def setUp(self):
+        """设置测试环境"""
+        rate_limiter._rate_limiters.clear()
+        config = mock.MagicMock()
+        config.get_llm_config.return_value = {
+            "base_url": "https://api.example.com/v1",
+            "rate_limit": {"max_retries": 2, "backoff_seconds": 0}
+        }
+        with mock.patch("processor.llm_processor.OpenAI"):
+            self.llm = LLMProcessor(config=config)
+        self.create = self.llm.client.chat.completions.create
+
+    def test_shares_limiter_with_same_base_url(self):
+        """测试同一服务地址的同步与异步客户端使用同一个限流器"""
+        self.assertIs(self.llm.rate_limiter, get_rate_limiter("https://api.example.com/v1", {}))
+        self.assertIsInstance(self.llm.rate_limiter, RateLimiter)
+
+    def test_retry_honors_retry_after(self):
+        """测试429按Retry-After等待并暂停共享限流器"""
+        self.create.side_effect = [
+            make_status_error(RateLimitError, 429, {"retry-after": "3"}),
+            mock.MagicMock(choices=[mock.MagicMock(message=mock.MagicMock(content="理解结果"))])
+        ]
+
+        clock = [1000.0]
+
+        def sleep(seconds):
+            clock[0] += seconds
+
+        with mock.patch("time.monotonic", side_effect=lambda: clock[0]), \
+                mock.patch("time.sleep", side_effect=sleep) as sleep_mock:
+            result = self.llm.understand_content("内容")
+
+        self.assertEqual(result, "理解结果")
+        self.assertEqual(self.create.call_count, 2)
+        # 退避等待已覆盖暂停时间，重试前不再额外等待
+        self.assertEqual([c.args[0] for c in sleep_mock.call_args_list], [3.0])
+        self.assertEqual(self.llm.rate_limiter.blocked_until, 1003.0)
+
+    def test_waits_for_request_quota(self):
+        """测试请求数配额用尽时等待补充"""
+        self.llm.rate_limiter = RateLimiter(requests_per_minute=1, tokens_per_minute=None)
+        self.create.return_value = mock.MagicMock(choices=[mock.MagicMock(message=mock.MagicMock(content="摘要"))])
+
+        def refill(seconds):
+            self.llm.rate_limiter.requests.adjust(-1)
+
+        with mock.patch("processor.rate_limiter.time.sleep", side_effect=refill) as sleep:
+            self.llm.generate_summary("内容1")
+            self.llm.generate_summary("内容2")
+
+        self.assertEqual(sleep.call_count, 1)
+        self.assertAlmostEqual(sleep.call_args.args[0], 60, delta=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
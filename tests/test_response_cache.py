@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import asyncio
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+# 确保可以导入src目录下的模块
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from processor.response_cache import DiskResponseCache, response_cache_key
+from processor.llm_processor import LLMProcessor
+from processor.async_llm_processor import AsyncLLMProcessor
+from storage import sqlite_cache
+
+
+CONTENT = {"title": "标题", "processed_text": "正文"}
+
+
+def chat_response(content):
+    """构造对话接口的返回"""
+    return mock.MagicMock(choices=[mock.MagicMock(message=mock.MagicMock(content=content))])
+
+
+class TestDiskResponseCache(unittest.TestCase):
+    """持久化响应缓存测试类"""
+
+    def setUp(self):
+        """设置测试环境"""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "cache", "responses.sqlite3")
+
+    def tearDown(self):
+        """清理测试环境"""
+        shutil.rmtree(self.tmp_dir)
+
+    def test_key_depends_on_model_messages_and_params(self):
+        """测试键区分模型、消息和参数，参数顺序无关"""
+        messages = [{"role": "user", "content": "你好"}]
+        key = response_cache_key("m1", messages, {"max_tokens": 10, "temperature": 0})
+        self.assertEqual(key, response_cache_key("m1", messages, {"temperature": 0, "max_tokens": 10}))
+        self.assertNotEqual(key, response_cache_key("m2", messages, {"max_tokens": 10, "temperature": 0}))
+        self.assertNotEqual(key, response_cache_key("m1", messages, {"max_tokens": 20, "temperature": 0}))
+        self.assertNotEqual(key, response_cache_key("m1", [{"role": "user", "content": "您好"}],
+                                                    {"max_tokens": 10, "temperature": 0}))
+
+    def test_persists_text_responses(self):
+        """测试响应文本重新打开后仍能命中"""
+        cache = DiskResponseCache(self.path)
+        cache.set("k", "响应")
+        cache.close()
+
+        reopened = DiskResponseCache(self.path)
+        self.assertEqual(reopened.get("k"), "响应")
+        self.assertEqual(reopened.stats()["ttl_seconds"], 604800)
+        reopened.close()
+
+
+class TestLLMProcessorResponseCache(unittest.TestCase):
+    """LLMProcessor响应缓存测试类"""
+
+    def setUp(self):
+        """设置测试环境"""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config = mock.MagicMock()
+        self.config.get_llm_config.return_value = {
+            "response_cache": {
+                "enabled": True,
+                "path": os.path.join(self.tmp_dir, "responses.sqlite3"),
+                "methods": ["evaluate_content", "understand_content"]
+            }
+        }
+        with mock.patch("processor.llm_processor.OpenAI"):
+            self.llm = LLMProcessor(config=self.config)
+        self.create = self.llm.client.chat.completions.create
+
+    def tearDown(self):
+        """清理测试环境"""
+        self.llm.response_cache.close()
+        sqlite_cache._sqlite_caches.clear()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_repeated_request_hits_cache(self):
+        """测试相同请求只调用一次API"""
+        self.create.return_value = chat_response(json.dumps({"score": 8}))
+
+        first = self.llm.evaluate_content(CONTENT)
+        second = self.llm.evaluate_content(CONTENT)
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.create.call_count, 1)
+        self.assertEqual(self.llm.get_response_cache_stats()["hits"], 1)
+
+    def test_bypass_skips_read_but_refreshes(self):
+        """测试bypass_cache跳过读取缓存，并用新响应覆盖"""
+        self.create.side_effect = [chat_response("旧"), chat_response("新")]
+
+        self.llm.understand_content("内容")
+        self.assertEqual(self.llm.understand_content("内容", bypass_cache=True), "新")
+        self.assertEqual(self.llm.understand_content("内容"), "新")
+        self.assertEqual(self.create.call_count, 2)
+
+    def test_unparseable_response_is_not_cached(self):
+        """测试解析失败的响应不写入缓存"""
+        self.create.side_effect = [chat_response("不是JSON"), chat_response(json.dumps({"score": 5}))]
+
+        with self.assertRaises(json.JSONDecodeError):
+            self.llm.evaluate_content(CONTENT)
+        self.assertEqual(self.llm.evaluate_content(CONTENT), {"score": 5})
+
+    def test_method_not_enabled_is_not_cached(self):
+        """测试未启用缓存的方法每次都调用API"""
+        self.create.return_value = chat_response("摘要")
+
+        self.llm.generate_summary("内容")
+        self.llm.generate_summary("内容")
+
+        self.assertEqual(self.create.call_count, 2)
+
+    def test_shared_with_async_client(self):
+        """测试异步客户端命中同步客户端写入的缓存"""
+        self.create.return_value = chat_response(json.dumps({"score": 8}))
+        self.llm.evaluate_content(CONTENT)
+
+        with mock.patch("processor.async_llm_processor.AsyncOpenAI"):
+            async_llm = AsyncLLMProcessor(config=self.config)
+        async_llm.client.chat.completions.create = mock.AsyncMock()
+
+        self.assertEqual(asyncio.run(async_llm.evaluate_content(CONTENT)), {"score": 8})
+        async_llm.client.chat.completions.create.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
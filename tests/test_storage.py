@@ -1,7 +1,1145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import multiprocessing
+import unittest
+from unittest import mock
+from datetime import datetime
+
+# 确保可以导入src目录下的模块
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from pymongo.errors import BulkWriteError, ServerSelectionTimeoutError
+
+from bson import ObjectId
+
+from storage.database_manager import (
+    DatabaseManager, HOT_PROJECTION, build_summary_projection, build_keyset_query, encode_page_cursor,
+    compress_original_content, reciprocal_rank_fusion
+)
+from storage.async_database_manager import AsyncDatabaseManager
+from storage.models import Content, ContentSummary, Relationship, VectorEmbedding
+from storage import migrations
+from storage import vector_index
+from storage.vector_store import NumpyVectorStore
+from storage.interaction_recorder import InteractionRecorder
+from storage.content_schema import build_upgrade_update, upgrade_content_doc
+from storage.models import CONTENT_SCHEMA_VERSION
+from storage.cache import LRUCache, RedisCache, create_cache, pack, unpack
+from storage import sqlite_cache
+from storage.sqlite_cache import SQLiteCache, open_sqlite_cache
+
+
 def test_database_manager():
     from config.config import Config
     from storage.database_manager import DatabaseManager
     
     config = Config("tests/config.test.yml")  # 使用测试配置
     db_manager = DatabaseManager(config=config)
-    # 测试逻辑... 
\ No newline at end of file
+    # 测试逻辑... 
+
+
+def make_content(title="测试标题", content_id=None):
+    """构造测试内容"""
+    return Content(
+        id=content_id,
+        title=title,
+        original_content="<p>原始内容</p>",
+        processed_text="处理后的内容",
+        summary="摘要",
+        source="微信公众号-测试",
+        platform="wechat",
+        publish_time=datetime(2023, 1, 1),
+        formatted_time="2023-01-01 00:00:00",
+        metadata={"word_count": 6, "read_time_minutes": 1}
+    )
+
+
+class TestDatabaseManager(unittest.TestCase):
+    """数据库管理器测试类（使用模拟的数据库客户端）"""
+    
+    def setUp(self):
+        """设置测试环境"""
+        self.mock_config = mock.MagicMock()
+        self.mock_config.get_database_config.return_value = {
+            'mongo_uri': 'mongodb://localhost:27017',
+            'qdrant_url': 'http://localhost:6333',
+            'neo4j_uri': 'bolt://localhost:7687',
+            'neo4j_user': 'neo4j',
+            'neo4j_password': 'password',
+            'bulk_batch_size': 2
+        }
+        self.mock_config.get_cache_config.return_value = {}
+        
+        patchers = [
+            mock.patch('storage.database_manager.MongoClient'),
+            mock.patch('storage.database_manager.QdrantClient'),
+            mock.patch('storage.database_manager.GraphDatabase'),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        
+        self.db_manager = DatabaseManager(config=self.mock_config)
+        self.db_manager.archive_state.find_one.return_value = None
+        self.session = self.db_manager.graph_db.session.return_value.__enter__.return_value
+    
+    def test_store_contents_bulk_batches(self):
+        """测试批量存储内容按批次写入"""
+        contents = [make_content(f"标题{i}") for i in range(3)]
+        
+        result = self.db_manager.store_contents_bulk(contents)
+        
+        self.assertEqual(self.db_manager.contents.bulk_write.call_count, 2)
+        for call in self.db_manager.contents.bulk_write.call_args_list:
+            self.assertFalse(call.kwargs['ordered'])
+        self.assertEqual(len(result['ids']), 3)
+        self.assertTrue(all(result['ids']))
+        self.assertEqual(result['errors'], [])
+    
+    def test_new_contents_get_server_ingest_time(self):
+        """测试只有新插入的内容记录服务端入库时间，覆盖已有内容不更新"""
+        self.db_manager.store_contents_bulk([make_content("标题1")])
+        update = self.db_manager.contents.update_many.call_args.args
+        self.assertEqual(update[1], {"$currentDate": {"ingested_at": True}})
+        self.assertEqual(len(update[0]["_id"]["$in"]), 1)
+        
+        self.db_manager.contents.update_many.reset_mock()
+        self.db_manager.contents.replace_one.return_value.upserted_id = None
+        content = make_content()
+        content.id = str(ObjectId())
+        self.db_manager.store_content(content)
+        self.db_manager.contents.update_many.assert_not_called()
+    
+    def test_store_contents_bulk_reports_item_errors(self):
+        """测试批量存储内容报告单条错误"""
+        self.db_manager.contents.bulk_write.side_effect = BulkWriteError({
+            "writeErrors": [{"index": 1, "errmsg": "duplicate key"}]
+        })
+        contents = [make_content("标题1"), make_content("标题2")]
+        
+        result = self.db_manager.store_contents_bulk(contents)
+        
+        self.assertIsNotNone(result['ids'][0])
+        self.assertIsNone(result['ids'][1])
+        self.assertEqual(result['errors'], [{"index": 1, "error": "duplicate key"}])
+    
+    def test_store_contents_bulk_dedupe_by_url(self):
+        """测试按URL去重写入时已存在的内容被跳过"""
+        contents = []
+        for i in range(2):
+            content = make_content(f"标题{i}")
+            content.metadata.original_url = f"https://mp.weixin.qq.com/s/{i}"
+            contents.append(content)
+        self.db_manager.contents.bulk_write.return_value.upserted_ids = {0: ObjectId()}
+        
+        result = self.db_manager.store_contents_bulk(contents, dedupe_by_url=True)
+        
+        operations = self.db_manager.contents.bulk_write.call_args.args[0]
+        self.assertEqual(operations[0]._filter, {"metadata.original_url": "https://mp.weixin.qq.com/s/0"})
+        self.assertIsNotNone(result['ids'][0])
+        self.assertIsNone(result['ids'][1])
+        self.assertEqual(result['duplicates'], [1])
+        self.assertEqual(result['errors'], [])
+    
+    def test_filter_existing_urls(self):
+        """测试一次查询返回已存在的URL"""
+        self.db_manager.contents.find.return_value = [
+            {"metadata": {"original_url": "https://mp.weixin.qq.com/s/1"}}
+        ]
+        
+        existing = self.db_manager.filter_existing_urls([
+            "https://mp.weixin.qq.com/s/1", "https://mp.weixin.qq.com/s/2"
+        ])
+        
+        self.assertEqual(existing, {"https://mp.weixin.qq.com/s/1"})
+        self.assertEqual(self.db_manager.contents.find.call_count, 1)
+    
+    def test_store_vectors_bulk(self):
+        """测试批量存储向量"""
+        embeddings = [
+            VectorEmbedding(content_id=str(ObjectId()), vector=[0.1, 0.2]) for i in range(3)
+        ]
+        self.db_manager.vector_db.upsert.side_effect = [None, Exception("timeout")]
+        
+        result = self.db_manager.store_vectors_bulk(embeddings)
+        
+        self.assertEqual(self.db_manager.vector_db.upsert.call_count, 2)
+        self.assertEqual(result['success_count'], 2)
+        self.assertEqual([error['index'] for error in result['errors']], [2])
+    
+    def test_store_vector_fills_payload_from_content(self):
+        """测试写入向量时从内容补充过滤字段"""
+        content = make_content(content_id=str(ObjectId()))
+        content.topics = ["AI"]
+        embedding = VectorEmbedding(content_id=content.id, vector=[0.1, 0.2], payload={"source": "test"})
+        
+        self.db_manager.store_vector(embedding, content=content)
+        
+        point = self.db_manager.vector_db.upsert.call_args.kwargs['points'][0]
+        self.assertEqual(point.payload["platform"], "wechat")
+        self.assertEqual(point.payload["topics"], ["AI"])
+        self.assertEqual(point.payload["publish_time"], datetime(2023, 1, 1).timestamp())
+        self.assertEqual(point.payload["source"], "test")
+    
+    def test_search_similar_vectors_pushes_filter(self):
+        """测试检索条件转换为Qdrant过滤条件"""
+        self.db_manager.search_similar_vectors(
+            [0.1, 0.2], limit=5, platform="weibo", start_time=datetime(2023, 1, 1), exclude_ids=["id_1"]
+        )
+        
+        query_filter = self.db_manager.vector_db.search.call_args.kwargs['query_filter']
+        self.assertEqual([condition.key for condition in query_filter.must], ["platform", "publish_time"])
+        self.assertEqual(query_filter.must[1].range.gte, datetime(2023, 1, 1).timestamp())
+        self.assertEqual(query_filter.must_not[0].has_id, ["id_1"])
+    
+    def test_search_similar_vectors_without_filter(self):
+        """测试没有过滤条件时不传入过滤"""
+        self.db_manager.search_similar_vectors([0.1, 0.2])
+        
+        self.assertIsNone(self.db_manager.vector_db.search.call_args.kwargs['query_filter'])
+    
+    def test_create_relations_bulk_merges_in_one_transaction(self):
+        """测试批量写入关系在一个事务中按类型执行MERGE并统计新建/更新数量"""
+        relationships = [
+            Relationship(source_id="a", target_id="b", relation_type="CAUSES"),
+            Relationship(source_id="b", target_id="c", relation_type="CAUSES"),
+            Relationship(source_id="a", target_id="c", relation_type="FOLLOWS"),
+        ]
+        self.db_manager.bulk_batch_size = 10
+        tx = mock.MagicMock()
+        tx.run.return_value.consume.return_value.counters.relationships_created = 1
+        self.session.execute_write.side_effect = lambda func, *args: func(tx, *args)
+        
+        result = self.db_manager.create_relations_bulk(relationships)
+        
+        self.assertEqual(self.session.execute_write.call_count, 1)
+        self.assertEqual(tx.run.call_count, 2)
+        cypher = tx.run.call_args_list[0].args[0]
+        self.assertIn("UNWIND $rows AS row", cypher)
+        self.assertIn("MERGE (s)-[r:`CAUSES`]->(t)", cypher)
+        self.assertNotIn("CREATE", cypher)
+        self.assertEqual(len(tx.run.call_args_list[0].kwargs['rows']), 2)
+        self.assertEqual((result['created'], result['updated']), (2, 1))
+
+    
+    def test_search_content_summaries_uses_projection(self):
+        """测试内容摘要查询只读取卡片字段"""
+        cursor = self.db_manager.contents.find.return_value.sort.return_value.skip.return_value.limit.return_value
+        cursor.__iter__.return_value = iter([{"_id": "id_1", "title": "标题", "platform": "wechat"}])
+        
+        summaries = self.db_manager.search_content_summaries({}, fields=["title", "platform"])
+        
+        _, projection = self.db_manager.contents.find.call_args.args
+        self.assertEqual(projection, {"title": 1, "platform": 1, "schema_version": 1, "publish_time": 1})
+        self.assertEqual(summaries[0].id, "id_1")
+        self.assertEqual(summaries[0].title, "标题")
+    
+    def test_build_summary_projection(self):
+        """测试摘要投影不包含大字段并拒绝未知字段"""
+        projection = build_summary_projection()
+        self.assertIn("title", projection)
+        self.assertNotIn("original_content", projection)
+        self.assertNotIn("processed_text", projection)
+        # 读取结构版本，当前版本的文档不做升级
+        self.assertEqual(build_summary_projection(["title"]), {"title": 1, "schema_version": 1})
+        
+        with self.assertRaises(ValueError):
+            build_summary_projection(["original_content"])
+    
+    def test_reciprocal_rank_fusion(self):
+        """测试RRF融合两路结果并去重"""
+        fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d", "b"]], k=60)
+        
+        self.assertEqual([item for item, _ in fused], ["b", "a", "d", "c"])
+        self.assertAlmostEqual(fused[0][1], 1 / 62 + 1 / 61)
+    
+    def test_page_cursor_round_trip(self):
+        """测试分页游标编码后可还原为键集条件"""
+        last_id = ObjectId()
+        cursor = encode_page_cursor({"publish_time": datetime(2023, 1, 1, 8, 30), "_id": last_id})
+        
+        query = build_keyset_query({"platform": "wechat"}, cursor)
+        
+        platform_query, keyset = query["$and"]
+        self.assertEqual(platform_query, {"platform": "wechat"})
+        self.assertEqual(keyset["$or"][0], {"publish_time": {"$lt": datetime(2023, 1, 1, 8, 30)}})
+        self.assertEqual(keyset["$or"][1]["_id"], {"$lt": last_id})
+        
+        with self.assertRaises(ValueError):
+            build_keyset_query({}, "not-a-cursor")
+    
+    def test_search_content_summaries_page(self):
+        """测试分页查询在满页时返回下一页游标"""
+        docs = [
+            {"_id": ObjectId(), "title": f"标题{i}", "publish_time": datetime(2023, 1, 2 - i)}
+            for i in range(2)
+        ]
+        expected_cursor = encode_page_cursor(docs[-1])
+        self.db_manager.contents.find.return_value.sort.return_value.skip.return_value.limit.return_value = docs
+        
+        summaries, next_cursor = self.db_manager.search_content_summaries_page({}, limit=2, fields=["title"])
+        
+        self.assertEqual([summary.title for summary in summaries], ["标题0", "标题1"])
+        self.assertIsNone(summaries[0].publish_time)
+        self.assertEqual(next_cursor, expected_cursor)
+
+    
+    def test_get_relations_single_query_and_cache(self):
+        """测试获取关系只执行一次无向查询，并在写入关系后失效"""
+        self.session.run.return_value.data.return_value = [
+            {"outgoing": True, "relation_type": "CAUSES", "properties": {"strength": 0.8}, "other_id": "b"},
+            {"outgoing": False, "relation_type": "FOLLOWS", "properties": {}, "other_id": "c"},
+        ]
+        
+        relations = self.db_manager.get_relations("a")
+        causes = self.db_manager.get_relations("a", relation_type="CAUSES")
+        
+        self.assertEqual(self.session.run.call_count, 1)
+        self.assertEqual(relations[0], {
+            "direction": "outgoing", "relation_type": "CAUSES",
+            "target_id": "b", "properties": {"strength": 0.8}
+        })
+        self.assertEqual(relations[1]["source_id"], "c")
+        self.assertEqual([relation["target_id"] for relation in causes], ["b"])
+        
+        self.session.execute_write.return_value = 1
+        self.db_manager.create_relation(Relationship(source_id="b", target_id="a", relation_type="CAUSES"))
+        self.db_manager.get_relations("a")
+        self.assertEqual(self.session.run.call_count, 2)
+    
+    def test_get_content_uses_cache(self):
+        """测试get_content读穿透缓存并在写入后失效"""
+        content_id = str(ObjectId())
+        doc = make_content().dict(exclude_none=True)
+        doc["_id"] = ObjectId(content_id)
+        self.db_manager.contents.find_one.side_effect = lambda query, projection=None: dict(doc)
+        
+        self.db_manager.get_content(content_id)
+        self.db_manager.get_content(content_id)
+        self.assertEqual(self.db_manager.contents.find_one.call_count, 1)
+        
+        self.db_manager.store_content(make_content(content_id=content_id))
+        self.db_manager.get_content(content_id)
+        self.assertEqual(self.db_manager.contents.find_one.call_count, 2)
+        
+        stats = self.db_manager.get_cache_stats()["content"]
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 2))
+    
+    def test_get_content_upgrades_legacy_document(self):
+        """测试读取旧结构文档时按需升级"""
+        content_id = str(ObjectId())
+        self.db_manager.contents.find_one.return_value = {
+            "_id": ObjectId(content_id), "title": "旧微博", "content": "内容示例",
+            "publish_time": datetime(2023, 1, 1).timestamp(), "source": "微博-测试", "platform": "weibo",
+            "sentiment": "positive"
+        }
+        
+        content = self.db_manager.get_content(content_id)
+        
+        self.assertEqual(content.processed_text, "内容示例")
+        self.assertEqual(content.publish_time, datetime(2023, 1, 1))
+        self.assertEqual(content.sentiment.score, 1.0)
+        self.assertEqual(content.schema_version, CONTENT_SCHEMA_VERSION)
+    
+    def test_upgrade_content_documents(self):
+        """测试后台升级以$set/$unset写回并以原版本号为条件"""
+        object_id = ObjectId()
+        legacy = {"_id": object_id, "title": "旧微博", "content": "内容示例", "publish_time": 1672502400.0,
+                  "source": "微博-测试", "platform": "weibo"}
+        for collection, docs in ((self.db_manager.contents, [legacy]), (self.db_manager.contents_archive, [])):
+            collection.find.return_value.sort.return_value.limit.side_effect = [docs, []]
+        self.db_manager.contents.bulk_write.return_value.modified_count = 1
+        self.db_manager.contents.bulk_write.return_value.matched_count = 1
+        
+        report = self.db_manager.upgrade_content_documents()
+        
+        self.assertEqual(report, {"upgraded": 1, "skipped": 0, "failed": []})
+        operation = self.db_manager.contents.bulk_write.call_args.args[0][0]
+        self.assertEqual(operation._filter, {"_id": object_id, "schema_version": {"$exists": False}})
+        self.assertEqual(operation._doc["$unset"], {"content": ""})
+        self.assertEqual(operation._doc["$set"]["processed_text"], "内容示例")
+        self.assertEqual(operation._doc["$set"]["schema_version"], CONTENT_SCHEMA_VERSION)
+        self.assertNotIn("title", operation._doc["$set"])
+        self.db_manager.contents_archive.bulk_write.assert_not_called()
+    
+    def test_get_contents_by_ids_fetches_misses_once(self):
+        """测试批量获取只对未命中的ID执行一次查询"""
+        cached_id, missing_id = str(ObjectId()), str(ObjectId())
+        self.db_manager.content_cache.set(cached_id, make_content("缓存", content_id=cached_id).dict())
+        doc = make_content("数据库").dict(exclude_none=True)
+        doc["_id"] = ObjectId(missing_id)
+        self.db_manager.contents.find.return_value = [doc]
+        
+        contents = self.db_manager.get_contents_by_ids([missing_id, cached_id])
+        
+        self.assertEqual([content.title for content in contents], ["数据库", "缓存"])
+        self.assertEqual(self.db_manager.contents.find.call_count, 1)
+    
+    def test_search_falls_through_to_archive_only_when_needed(self):
+        """测试查询时间范围覆盖归档边界时才合并冷数据"""
+        boundary = datetime(2023, 1, 1)
+        self.db_manager.archive_state.find_one.return_value = {"_id": "contents", "boundary": boundary}
+        hot = [{"_id": ObjectId(), "title": "热", "publish_time": datetime(2023, 3, 1)}]
+        cold = [{"_id": ObjectId(), "title": "冷", "publish_time": datetime(2022, 6, 1)}]
+        # 读取路径会修改返回的文档，每次查询返回新的副本
+        self.db_manager.contents.find.return_value.sort.return_value.skip.return_value.limit.side_effect = \
+            lambda limit: [dict(doc) for doc in hot]
+        self.db_manager.contents_archive.find.return_value.sort.return_value.limit.side_effect = \
+            lambda limit: [dict(doc) for doc in cold]
+        
+        recent = self.db_manager.search_content_summaries(
+            {"publish_time": {"$gte": datetime(2023, 2, 1)}}, limit=2, fields=["title"]
+        )
+        self.db_manager.contents_archive.find.assert_not_called()
+        self.assertEqual([summary.title for summary in recent], ["热"])
+        
+        everything = self.db_manager.search_content_summaries({}, limit=2, fields=["title"])
+        self.assertEqual([summary.title for summary in everything], ["热", "冷"])
+    
+    def test_archive_old_contents(self):
+        """测试归档先写入冷数据再删除热数据，并推进归档边界"""
+        doc = make_content().dict(exclude_none=True)
+        doc["_id"] = ObjectId()
+        self.db_manager.contents.find.return_value.limit.side_effect = [[doc], []]
+        
+        report = self.db_manager.archive_old_contents(max_age_days=30, drop_vectors=True)
+        
+        self.assertEqual(report["archived"], 1)
+        self.db_manager.contents_archive.bulk_write.assert_called_once()
+        self.db_manager.contents.delete_many.assert_called_once_with({"_id": {"$in": [doc["_id"]]}})
+        self.db_manager.vector_db.delete.assert_called_once()
+        query = self.db_manager.contents.find.call_args.args[0]
+        self.assertEqual(query["user_interactions.is_favorited"], {"$ne": True})
+        update = self.db_manager.archive_state.update_one.call_args.args[1]
+        self.assertEqual(update["$max"]["boundary"], report["boundary"])
+    
+    def test_archive_zero_age_keeps_nothing_hot(self):
+        """测试显式传入0天时归档全部内容，而不是回退到配置的天数"""
+        self.db_manager.archive_config = {"max_age_days": 365}
+        self.db_manager.contents.find.return_value.limit.return_value = []
+        
+        with mock.patch("storage.database_manager.datetime") as mock_datetime:
+            mock_datetime.now.return_value = datetime(2023, 1, 1)
+            report = self.db_manager.archive_old_contents(max_age_days=0)
+        
+        self.assertEqual(report["boundary"], datetime(2023, 1, 1))
+    
+    def test_store_content_offloads_original_content(self):
+        """测试原始HTML压缩后写入content_blobs，主文档不再内嵌"""
+        content_id = str(ObjectId())
+        
+        self.db_manager.store_content(make_content(content_id=content_id))
+        
+        stored = self.db_manager.contents.replace_one.call_args.args[1]
+        self.assertNotIn("original_content", stored)
+        blob = self.db_manager.content_blobs.replace_one.call_args.args[1]
+        self.assertEqual(blob["_id"], ObjectId(content_id))
+        self.assertEqual(blob["codec"], "zlib")
+    
+    def test_store_content_upserts_by_url(self):
+        """测试新内容按原文URL upsert，URL已存在时返回已有ID且不写入原文"""
+        content = make_content()
+        content.metadata.original_url = "https://example.com/a"
+        existing_id = ObjectId()
+        self.db_manager.contents.update_one.return_value.upserted_id = None
+        self.db_manager.contents.find_one.return_value = {"_id": existing_id}
+        
+        content_id = self.db_manager.store_content(content)
+        
+        self.assertEqual(content_id, str(existing_id))
+        query, update = self.db_manager.contents.update_one.call_args.args
+        self.assertEqual(query, {"metadata.original_url": "https://example.com/a"})
+        self.assertIn("_id", update["$setOnInsert"])
+        self.assertTrue(self.db_manager.contents.update_one.call_args.kwargs["upsert"])
+        self.db_manager.contents.insert_one.assert_not_called()
+        self.db_manager.content_blobs.replace_one.assert_not_called()
+    
+    def test_store_content_new_url_is_inserted(self):
+        """测试URL不存在时插入，记录入库时间并写入原文"""
+        content = make_content()
+        content.metadata.original_url = "https://example.com/b"
+        new_id = ObjectId()
+        self.db_manager.contents.update_one.return_value.upserted_id = new_id
+        
+        content_id = self.db_manager.store_content(content)
+        
+        self.assertEqual(content_id, str(new_id))
+        self.db_manager.contents.update_many.assert_called_once()
+        self.db_manager.content_blobs.replace_one.assert_called_once()
+    
+    def test_get_content_loads_original_on_demand(self):
+        """测试只有include_original时才读取content_blobs"""
+        content_id = str(ObjectId())
+        doc = make_content().dict(exclude_none=True)
+        doc.pop("original_content")
+        doc["_id"] = ObjectId(content_id)
+        self.db_manager.contents.find_one.return_value = doc
+        self.db_manager.content_blobs.find_one.return_value = compress_original_content(content_id, "<p>原文</p>")
+        
+        content = self.db_manager.get_content(content_id)
+        self.assertIsNone(content.original_content)
+        self.assertEqual(self.db_manager.contents.find_one.call_args.args[1], HOT_PROJECTION)
+        self.db_manager.content_blobs.find_one.assert_not_called()
+        
+        content = self.db_manager.get_content(content_id, include_original=True)
+        self.assertEqual(content.original_content, "<p>原文</p>")
+    
+    def test_get_original_content_from_archive_not_offloaded(self):
+        """测试未迁移到content_blobs就被归档的文档仍能读取内嵌的原始HTML"""
+        content_id = str(ObjectId())
+        self.db_manager.content_blobs.find_one.return_value = None
+        self.db_manager.contents.find_one.return_value = None
+        self.db_manager.contents_archive.find_one.return_value = {
+            "_id": ObjectId(content_id), "original_content": "<p>归档原文</p>"
+        }
+        
+        self.assertEqual(self.db_manager.get_original_content(content_id), "<p>归档原文</p>")
+        self.db_manager.contents_archive.find_one.assert_called_once_with(
+            {"_id": ObjectId(content_id)}, {"original_content": 1}
+        )
+
+
+class TestLRUCache(unittest.TestCase):
+    """进程内LRU缓存测试类"""
+    
+    def test_evicts_least_recently_used(self):
+        """测试超出容量时淘汰最久未使用的条目"""
+        cache = LRUCache(max_size=2, ttl_seconds=None)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+    
+    def test_expires_entries(self):
+        """测试条目过期"""
+        cache = LRUCache(max_size=2, ttl_seconds=10)
+        with mock.patch('storage.cache.time.monotonic', return_value=100):
+            cache.set("a", 1)
+        with mock.patch('storage.cache.time.monotonic', return_value=111):
+            self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["misses"], 1)
+
+
+class FakeRedis:
+    """Redis客户端的本地替身"""
+    
+    def __init__(self):
+        self.data = {}
+    
+    def get(self, key):
+        return self.data.get(key)
+    
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+    
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+    
+    def scan_iter(self, match):
+        prefix = match.rstrip("*")
+        return [key for key in self.data if key.startswith(prefix)]
+
+
+class TestRedisCache(unittest.TestCase):
+    """Redis缓存后端测试类"""
+    
+    def test_namespaced_round_trip(self):
+        """测试按命名空间存取并以二进制格式序列化"""
+        client = FakeRedis()
+        content_cache = RedisCache(client, "content")
+        graph_cache = RedisCache(client, "graph")
+        value = {"title": "标题", "publish_time": datetime(2023, 1, 1), "topics": ["AI"]}
+        
+        content_cache.set("id_1", value)
+        
+        self.assertIn("insightflow:content:id_1", client.data)
+        self.assertIsInstance(client.data["insightflow:content:id_1"], bytes)
+        self.assertEqual(content_cache.get("id_1"), value)
+        self.assertIsNone(graph_cache.get("id_1"))
+        
+        content_cache.clear()
+        self.assertIsNone(content_cache.get("id_1"))
+        self.assertEqual(content_cache.stats()["hits"], 1)
+    
+    def test_pack_round_trip(self):
+        """测试msgpack序列化支持datetime"""
+        value = [0.1, 0.2, {"time": datetime(2023, 5, 20, 8, 30)}]
+        self.assertEqual(unpack(pack(value)), value)
+    
+    def test_create_cache_defaults_to_memory(self):
+        """测试未配置后端时使用进程内缓存"""
+        cache = create_cache({"content": {"max_size": 10}}, "content")
+        self.assertIsInstance(cache, LRUCache)
+        self.assertEqual(cache.max_size, 10)
+
+
+class TestSQLiteCache(unittest.TestCase):
+    """持久化SQLite缓存测试类，向量缓存和响应缓存共用这部分逻辑"""
+    
+    def setUp(self):
+        """设置测试环境"""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "cache", "entries.sqlite3")
+    
+    def tearDown(self):
+        """清理测试环境"""
+        sqlite_cache._sqlite_caches.clear()
+        shutil.rmtree(self.tmp_dir)
+    
+    def test_persists_with_codec(self):
+        """测试按编解码函数存取，重新打开后仍能命中"""
+        cache = SQLiteCache(self.path, max_entries=10, encode=lambda v: ",".join(v), decode=lambda d: d.split(","))
+        cache.set("k", ["a", "b"])
+        cache.close()
+        
+        reopened = SQLiteCache(self.path, max_entries=10, encode=lambda v: ",".join(v), decode=lambda d: d.split(","))
+        self.assertEqual(reopened.get("k"), ["a", "b"])
+        self.assertIsNone(reopened.get("missing"))
+        self.assertEqual(reopened.stats()["hit_rate"], 0.5)
+        reopened.close()
+    
+    def test_evicts_least_recently_used(self):
+        """测试超出容量时淘汰最久未使用的条目"""
+        cache = SQLiteCache(self.path, max_entries=3)
+        with mock.patch("storage.sqlite_cache.time.time", side_effect=range(100)):
+            for key in ("a", "b", "c"):
+                cache.set(key, key)
+            cache.get("a")
+            cache.set("d", "d")
+        
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "a")
+        self.assertLessEqual(cache.stats()["size"], 3)
+        cache.close()
+    
+    def test_expires_entries(self):
+        """测试过期条目视为未命中，淘汰时先清理过期条目"""
+        cache = SQLiteCache(self.path, max_entries=2, ttl_seconds=60)
+        with mock.patch("storage.sqlite_cache.time.time", return_value=1000):
+            cache.set("old", "旧")
+        with mock.patch("storage.sqlite_cache.time.time", return_value=1030):
+            cache.set("recent", "新")
+            self.assertEqual(cache.get("old"), "旧")
+        with mock.patch("storage.sqlite_cache.time.time", return_value=1061):
+            cache.set("new", "新")
+            # old已过期被清理，最近写入的两条都保留
+            self.assertEqual(cache.stats()["size"], 2)
+            self.assertIsNone(cache.get("old"))
+            self.assertEqual(cache.get("recent"), "新")
+        with mock.patch("storage.sqlite_cache.time.time", return_value=1100):
+            self.assertIsNone(cache.get("recent"))
+        self.assertEqual(cache.stats()["size"], 1)
+        cache.close()
+    
+    def test_open_reuses_instance_per_path(self):
+        """测试同一路径在进程内只打开一次"""
+        factory = mock.MagicMock(side_effect=lambda path: SQLiteCache(path, max_entries=10))
+        
+        first = open_sqlite_cache(self.path, factory)
+        second = open_sqlite_cache(self.path, factory)
+        
+        self.assertIs(first, second)
+        factory.assert_called_once_with(self.path)
+        first.close()
+
+
+class TestMigrations(unittest.TestCase):
+    """数据库迁移测试类"""
+    
+    def setUp(self):
+        """设置测试环境"""
+        self.db_manager = mock.MagicMock()
+        self.registry = self.db_manager.db.__getitem__.return_value
+    
+    def test_apply_pending_migrations_only(self):
+        """测试只执行未执行的迁移"""
+        first = mock.MagicMock()
+        second = mock.MagicMock()
+        registered = [
+            migrations.Migration(1, "第一个迁移", first),
+            migrations.Migration(2, "第二个迁移", second),
+        ]
+        self.registry.find.return_value = [{"version": 1}]
+        
+        with mock.patch.object(migrations, 'MIGRATIONS', registered):
+            applied = migrations.apply_migrations(self.db_manager)
+        
+        self.assertEqual(applied, [2])
+        first.assert_not_called()
+        second.assert_called_once_with(self.db_manager)
+        self.registry.update_one.assert_called_once()
+    
+    def test_url_index_dedupes_existing_contents(self):
+        """测试创建URL唯一索引前保留每个URL最新的一条，其余移入归档"""
+        newest, stale = ObjectId(), ObjectId()
+        self.db_manager.contents.aggregate.return_value = [
+            {"_id": "https://example.com/a", "ids": [newest, stale], "count": 2}
+        ]
+        self.db_manager.contents.find.return_value = [{"_id": stale, "title": "旧"}]
+        
+        migrations._create_original_url_index(self.db_manager)
+        
+        archived = self.db_manager.contents_archive.bulk_write.call_args.args[0]
+        self.assertEqual([op._doc["_id"] for op in archived], [stale])
+        self.db_manager.contents.delete_many.assert_called_once_with({"_id": {"$in": [stale]}})
+        self.db_manager.vector_store.delete.assert_called_once_with([str(stale)])
+        self.assertTrue(self.db_manager.contents.create_index.call_args.kwargs["unique"])
+    
+    def test_constructor_runs_no_ddl(self):
+        """测试构造数据库管理器时不执行DDL"""
+        mock_config = mock.MagicMock()
+        mock_config.get_database_config.return_value = {
+            'mongo_uri': 'mongodb://localhost:27017',
+            'qdrant_url': 'http://localhost:6333',
+            'neo4j_uri': 'bolt://localhost:7687',
+            'neo4j_user': 'neo4j',
+            'neo4j_password': 'password'
+        }
+        mock_config.get_cache_config.return_value = {}
+        with mock.patch('storage.database_manager.MongoClient'), \
+                mock.patch('storage.database_manager.QdrantClient'), \
+                mock.patch('storage.database_manager.GraphDatabase'):
+            db_manager = DatabaseManager(config=mock_config)
+        
+        db_manager.contents.create_index.assert_not_called()
+        db_manager.vector_db.create_collection.assert_not_called()
+
+
+class TestVectorIndex(unittest.TestCase):
+    """向量集合调优参数测试类"""
+    
+    def test_default_collection_params(self):
+        """测试未配置时只设置维度和距离"""
+        params = vector_index.build_collection_params({})
+        
+        self.assertEqual(params["vectors_config"].size, 1536)
+        self.assertIsNone(params["hnsw_config"])
+        self.assertIsNone(params["quantization_config"])
+        self.assertIsNone(vector_index.build_search_params({}))
+    
+    def test_quantized_collection_params(self):
+        """测试量化与HNSW参数以及检索时的重排参数"""
+        collection_config = {
+            "on_disk": True,
+            "hnsw": {"m": 32, "ef_construct": 200},
+            "quantization": {"type": "scalar", "quantile": 0.99},
+            "search": {"hnsw_ef": 64, "oversampling": 2.0}
+        }
+        
+        params = vector_index.build_collection_params(collection_config)
+        search_params = vector_index.build_search_params(collection_config)
+        
+        self.assertTrue(params["vectors_config"].on_disk)
+        self.assertEqual(params["hnsw_config"].m, 32)
+        self.assertEqual(params["quantization_config"].scalar.quantile, 0.99)
+        self.assertEqual(search_params.hnsw_ef, 64)
+        self.assertTrue(search_params.quantization.rescore)
+    
+    def test_unknown_quantization_type(self):
+        """测试不支持的量化类型"""
+        with self.assertRaises(ValueError):
+            vector_index.build_quantization_config({"quantization": {"type": "binary8"}})
+    
+    def test_create_collection_with_configured_size(self):
+        """测试初始化迁移按配置的维度和距离创建集合"""
+        db_manager = mock.MagicMock()
+        db_manager.vector_db.get_collections.return_value.collections = []
+        db_manager.vector_collection_config = {"vector_size": 768, "distance": "dot"}
+        
+        migrations._init_qdrant_collections(db_manager)
+        
+        vectors_config = db_manager.vector_db.create_collection.call_args.kwargs["vectors_config"]
+        self.assertEqual(vectors_config.size, 768)
+        self.assertEqual(vectors_config.distance, vector_index.models.Distance.DOT)
+    
+    def test_configure_existing_collection(self):
+        """测试集合已存在时只更新参数并创建payload索引"""
+        client = mock.MagicMock()
+        existing = mock.MagicMock()
+        existing.name = vector_index.CONTENT_VECTORS
+        client.get_collections.return_value.collections = [existing]
+        
+        vector_index.configure_collection(client, {"hnsw": {"m": 32}})
+        
+        client.create_collection.assert_not_called()
+        client.update_collection.assert_called_once()
+        indexed = {call.kwargs["field_name"] for call in client.create_payload_index.call_args_list}
+        self.assertEqual(indexed, set(vector_index.PAYLOAD_INDEXES))
+        # 未启用量化时显式关闭，而不是保持原有量化设置
+        self.assertEqual(client.update_collection.call_args.kwargs["quantization_config"],
+                         vector_index.models.Disabled.DISABLED)
+
+
+def _write_vectors(path, prefix):
+    """在子进程中逐条写入向量"""
+    store = NumpyVectorStore(path, dim=3)
+    vector = [0, 1, 0] if prefix == "x" else [0, 0, 1]
+    for i in range(20):
+        store.upsert([VectorEmbedding(content_id=f"{prefix}{i}", vector=vector, payload={"platform": prefix})])
+    store.close()
+
+
+class TestNumpyVectorStore(unittest.TestCase):
+    """嵌入式向量存储测试类"""
+    
+    def setUp(self):
+        """设置测试环境"""
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.store = NumpyVectorStore(self.path, dim=3, initial_capacity=2)
+        self.store.upsert([
+            VectorEmbedding(content_id="a", vector=[1, 0, 0],
+                            payload={"platform": "wechat", "publish_time": 100.0, "topics": ["AI"]}),
+            VectorEmbedding(content_id="b", vector=[0.9, 0.1, 0],
+                            payload={"platform": "weibo", "publish_time": 200.0, "topics": ["科技"]}),
+            VectorEmbedding(content_id="c", vector=[0, 1, 0],
+                            payload={"platform": "weibo", "publish_time": 300.0, "topics": []}),
+        ])
+    
+    def test_search_orders_by_cosine_similarity(self):
+        """测试按余弦相似度排序并支持扩容"""
+        hits = self.store.search([2, 0, 0], limit=2)
+        
+        self.assertEqual([hit.id for hit in hits], ["a", "b"])
+        self.assertAlmostEqual(hits[0].score, 1.0, places=5)
+        self.assertGreaterEqual(self.store.stats()["capacity"], 3)
+    
+    def test_search_filters(self):
+        """测试平台、时间、主题和排除ID过滤"""
+        query = [1, 0, 0]
+        self.assertEqual([h.id for h in self.store.search(query, platform="weibo")], ["b", "c"])
+        self.assertEqual([h.id for h in self.store.search(query, start_time=datetime.fromtimestamp(250))], ["c"])
+        self.assertEqual([h.id for h in self.store.search(query, topics=["AI", "科技"])], ["a", "b"])
+        self.assertEqual([h.id for h in self.store.search(query, limit=1, exclude_ids=["a"])], ["b"])
+    
+    def test_upsert_overwrites_and_delete_tombstones(self):
+        """测试覆盖写入与墓碑删除"""
+        self.store.upsert([VectorEmbedding(content_id="a", vector=[0, 0, 1])])
+        self.store.delete(["b"])
+        
+        self.assertEqual([h.id for h in self.store.search([0, 0, 1], limit=1)], ["a"])
+        self.assertNotIn("b", [h.id for h in self.store.search([1, 0, 0])])
+        self.assertEqual(self.store.stats(), {"vectors": 2, "tombstones": 1, "capacity": 4})
+    
+    def test_persists_across_restarts(self):
+        """测试重新打开后恢复向量和删除记录，压缩后去掉墓碑"""
+        self.store.delete(["c"])
+        self.store.close()
+        
+        reopened = NumpyVectorStore(self.path, dim=3)
+        self.assertEqual([h.id for h in reopened.search([1, 0, 0])], ["a", "b"])
+        self.assertEqual(reopened.search([1, 0, 0], platform="wechat")[0].payload["topics"], ["AI"])
+        
+        reopened.compact()
+        self.assertEqual(reopened.stats()["tombstones"], 0)
+        self.assertEqual([h.id for h in reopened.search([1, 0, 0])], ["a", "b"])
+    
+    def test_rejects_wrong_dimension(self):
+        """测试维度不一致时报错"""
+        with self.assertRaises(ValueError):
+            self.store.upsert([VectorEmbedding(content_id="d", vector=[1, 0])])
+    
+    def test_sees_writes_from_other_instance(self):
+        """测试同一目录的另一个实例（如API进程）能看到写入，且不会分配重复的行"""
+        other = NumpyVectorStore(self.path, dim=3)
+        other.upsert([VectorEmbedding(content_id="d", vector=[0, 0, 1])])
+        self.store.upsert([VectorEmbedding(content_id="e", vector=[0, 1, 1])])
+        
+        self.assertEqual(self.store.search([0, 0, 1], limit=1)[0].id, "d")
+        self.assertEqual(other.search([0, 1, 1], limit=1)[0].id, "e")
+        self.assertEqual(other.search([0, 0, 1], limit=1)[0].id, "d")
+        
+        # 压缩替换文件后另一个实例重新加载
+        self.store.delete(["c"])
+        other.compact()
+        self.assertEqual(self.store.stats()["vectors"], 4)
+        self.assertEqual(self.store.search([0, 1, 1], limit=1)[0].id, "e")
+        self.assertEqual(self.store.stats(), other.stats())
+    
+    def test_concurrent_writers_in_separate_processes(self):
+        """测试多个进程同时写入同一目录"""
+        context = multiprocessing.get_context("fork")
+        workers = [context.Process(target=_write_vectors, args=(self.path, prefix)) for prefix in ("x", "y")]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(30)
+            self.assertEqual(worker.exitcode, 0)
+        
+        self.assertEqual(self.store.search([1, 0, 0], limit=100)[0].id, "a")
+        for prefix, vector in (("x", [0, 1, 0]), ("y", [0, 0, 1])):
+            hits = self.store.search(vector, limit=20, platform=prefix)
+            self.assertEqual(len(hits), 20)
+            self.assertTrue(all(hit.id.startswith(prefix) and hit.score > 0.99 for hit in hits))
+
+
+class TestInteractionRecorder(unittest.TestCase):
+    """用户交互写后缓冲测试类"""
+
+    def setUp(self):
+        """设置测试环境"""
+        self.db_manager = mock.MagicMock()
+        self.hot_id = str(ObjectId())
+        self.cold_id = str(ObjectId())
+        self.db_manager.contents.find.return_value = [{"_id": ObjectId(self.hot_id)}]
+        self.recorder = InteractionRecorder(self.db_manager)
+
+    def test_views_coalesce_into_one_update(self):
+        """测试同一内容的多次浏览合并为一次$inc"""
+        for day in (1, 3, 2):
+            self.recorder.record_view(self.hot_id, viewed_at=datetime(2023, 1, day))
+
+        self.assertEqual(self.recorder.flush(), 1)
+
+        operations = self.db_manager.contents.bulk_write.call_args.args[0]
+        self.assertEqual(len(operations), 1)
+        self.assertEqual(operations[0]._doc, {
+            "$inc": {"user_interactions.view_count": 3},
+            "$max": {"user_interactions.last_viewed": datetime(2023, 1, 3)}
+        })
+        self.db_manager.content_cache.delete_many.assert_called_once()
+        self.assertEqual(self.recorder.pending_count(), 0)
+        self.assertEqual(self.recorder.stats()["flushed_writes"], 1)
+
+    def test_favorite_and_tags(self):
+        """测试收藏以最后一次为准，标签添加和移除分开更新"""
+        self.recorder.set_favorite(self.hot_id, True)
+        self.recorder.set_favorite(self.hot_id, False)
+        self.recorder.add_tags(self.hot_id, ["AI", "医疗"])
+        self.recorder.remove_tags(self.hot_id, ["医疗"])
+
+        self.recorder.flush()
+
+        operations = self.db_manager.contents.bulk_write.call_args.args[0]
+        self.assertEqual(operations[0]._doc, {
+            "$set": {"user_interactions.is_favorited": False},
+            "$addToSet": {"user_interactions.tags": {"$each": ["AI"]}}
+        })
+        self.assertEqual(operations[1]._doc, {"$pull": {"user_interactions.tags": {"$in": ["医疗"]}}})
+
+    def test_archived_content_goes_to_archive(self):
+        """测试已归档内容的交互写入contents_archive"""
+        self.recorder.record_view(self.hot_id)
+        self.recorder.record_view(self.cold_id)
+
+        self.recorder.flush()
+
+        hot_operations = self.db_manager.contents.bulk_write.call_args.args[0]
+        cold_operations = self.db_manager.contents_archive.bulk_write.call_args.args[0]
+        self.assertEqual(hot_operations[0]._filter, {"_id": ObjectId(self.hot_id)})
+        self.assertEqual(cold_operations[0]._filter, {"_id": ObjectId(self.cold_id)})
+
+    def test_failed_flush_is_retried(self):
+        """测试未发送的事件与新事件合并后重试"""
+        self.db_manager.contents.bulk_write.side_effect = ServerSelectionTimeoutError("无可用服务器")
+        self.recorder.record_view(self.hot_id)
+
+        self.assertEqual(self.recorder.flush(), 0)
+        self.recorder.record_view(self.hot_id)
+        self.db_manager.contents.bulk_write.side_effect = None
+        self.recorder.flush()
+
+        operations = self.db_manager.contents.bulk_write.call_args.args[0]
+        self.assertEqual(operations[0]._doc["$inc"], {"user_interactions.view_count": 2})
+
+    def test_partial_bulk_failure_requeues_only_unapplied(self):
+        """测试有序写入部分失败时只重试未生效的操作，已生效的浏览不重复计数"""
+        other_id = str(ObjectId())
+        self.db_manager.contents.find.return_value = [{"_id": ObjectId(self.hot_id)}, {"_id": ObjectId(other_id)}]
+        self.recorder.record_view(self.hot_id)
+        self.recorder.add_tags(self.hot_id, ["AI"])
+        self.recorder.remove_tags(self.hot_id, ["旧"])
+        self.recorder.record_view(other_id)
+        # 第0个操作（hot_id的$inc）已生效，第1个（hot_id的$pull）失败，之后的未执行
+        self.db_manager.contents.bulk_write.side_effect = BulkWriteError({
+            "writeErrors": [{"index": 1, "code": 2, "errmsg": "失败"}], "nModified": 1
+        })
+
+        self.assertEqual(self.recorder.flush(), 0)
+        self.db_manager.contents.bulk_write.side_effect = None
+        self.recorder.flush()
+
+        operations = self.db_manager.contents.bulk_write.call_args.args[0]
+        self.assertEqual([op._doc for op in operations], [
+            {"$pull": {"user_interactions.tags": {"$in": ["旧"]}}},
+            {"$inc": {"user_interactions.view_count": 1}, "$max": mock.ANY},
+        ])
+        self.assertEqual(operations[1]._filter, {"_id": ObjectId(other_id)})
+
+    def test_ambiguous_failure_does_not_repeat_increments(self):
+        """测试无法确定是否生效的错误只重试幂等更新"""
+        self.db_manager.contents.bulk_write.side_effect = Exception("连接中断")
+        self.recorder.record_view(self.hot_id, viewed_at=datetime(2023, 1, 1))
+        self.recorder.set_favorite(self.hot_id, True)
+
+        self.recorder.flush()
+        self.db_manager.contents.bulk_write.side_effect = None
+        self.recorder.flush()
+
+        operations = self.db_manager.contents.bulk_write.call_args.args[0]
+        self.assertEqual(operations[0]._doc, {
+            "$max": {"user_interactions.last_viewed": datetime(2023, 1, 1)},
+            "$set": {"user_interactions.is_favorited": True}
+        })
+
+    def test_invalid_id_rejected(self):
+        """测试非法ID在记录时即报错"""
+        with self.assertRaises(Exception):
+            self.recorder.record_view("invalid")
+        self.assertEqual(self.recorder.pending_count(), 0)
+
+
+class TestContentSchema(unittest.TestCase):
+    """内容结构版本测试类"""
+
+    def test_current_document_unchanged(self):
+        """测试当前版本的文档不做任何修改"""
+        original = make_content().dict()
+        doc = dict(original)
+        self.assertFalse(upgrade_content_doc(doc))
+        self.assertEqual(doc, original)
+
+    def test_upgrade_legacy_fields(self):
+        """测试旧格式的实体和价值评估被规范化"""
+        doc = {"title": "标题", "processed_text": "OpenAI发布新模型", "entities": ["OpenAI"],
+               "value_assessment": 8, "sentiment": -0.5}
+
+        self.assertTrue(upgrade_content_doc(doc))
+
+        self.assertEqual(doc["entities"], [{"text": "OpenAI", "type": "UNKNOWN", "start": 0, "end": 6}])
+        self.assertEqual(doc["value_assessment"]["timeliness"], 8.0)
+        self.assertEqual(doc["sentiment"], {"score": -0.5, "label": "negative"})
+        self.assertEqual(doc["schema_version"], CONTENT_SCHEMA_VERSION)
+
+    def test_partial_upgrade_keeps_projection(self):
+        """测试部分字段的文档只升级投影中的字段"""
+        doc = {"title": "标题", "publish_time": 1672502400.0}
+
+        upgrade_content_doc(doc, partial=True)
+
+        self.assertEqual(set(doc), {"title", "publish_time"})
+        self.assertIsInstance(doc["publish_time"], datetime)
+
+    def test_partial_current_document_unchanged(self):
+        """测试投影中带有当前结构版本的文档不执行升级"""
+        doc = {"title": "标题", "entities": ["OpenAI"], "schema_version": CONTENT_SCHEMA_VERSION}
+
+        self.assertFalse(upgrade_content_doc(doc, partial=True))
+        self.assertEqual(doc["entities"], ["OpenAI"])
+
+    def test_build_upgrade_update(self):
+        """测试只更新变化的字段"""
+        update = build_upgrade_update({"a": 1, "b": 2, "c": 3}, {"a": 1, "b": 4, "d": 5})
+        self.assertEqual(update, {"$set": {"b": 4, "d": 5}, "$unset": {"c": ""}})
+
+
+class TestAsyncDatabaseManager(unittest.IsolatedAsyncioTestCase):
+    """异步数据库管理器测试类（使用模拟的数据库客户端）"""
+    
+    def setUp(self):
+        """设置测试环境"""
+        self.mock_config = mock.MagicMock()
+        self.mock_config.get_database_config.return_value = {
+            'mongo_uri': 'mongodb://localhost:27017',
+            'qdrant_url': 'http://localhost:6333',
+            'neo4j_uri': 'bolt://localhost:7687',
+            'neo4j_user': 'neo4j',
+            'neo4j_password': 'password'
+        }
+        self.mock_config.get_cache_config.return_value = {}
+        
+        patchers = [
+            mock.patch('storage.async_database_manager.AsyncIOMotorClient'),
+            mock.patch('storage.async_database_manager.AsyncQdrantClient'),
+            mock.patch('storage.async_database_manager.AsyncGraphDatabase'),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        
+        self.db_manager = AsyncDatabaseManager(config=self.mock_config)
+    
+    async def test_get_content(self):
+        """测试异步获取内容"""
+        content_id = "60a5e8a9b54b12c5a8c4d786"
+        doc = make_content().dict(exclude_none=True)
+        doc["_id"] = content_id
+        self.db_manager.contents.find_one = mock.AsyncMock(return_value=doc)
+        
+        content = await self.db_manager.get_content(content_id)
+        
+        self.assertEqual(content.id, content_id)
+        self.assertEqual(content.title, "测试标题")
+    
+    async def test_redis_cache_does_not_block_event_loop(self):
+        """测试Redis缓存在协程中的读写在线程池中执行"""
+        client = FakeRedis()
+        loop_thread = threading.get_ident()
+        threads = []
+        original_get = client.get
+        
+        def get(key):
+            threads.append(threading.get_ident())
+            return original_get(key)
+        client.get = get
+        self.db_manager.content_cache = RedisCache(client, "content")
+        
+        await self.db_manager.content_cache.aset("id_1", {"title": "标题"})
+        
+        self.assertEqual(await self.db_manager.content_cache.aget("id_1"), {"title": "标题"})
+        self.assertNotIn(loop_thread, threads)
+    
+    async def test_hybrid_search_fuses_and_fetches_once(self):
+        """测试混合检索融合两路结果、一次获取摘要并记录各阶段耗时"""
+        ids = [str(ObjectId()) for _ in range(3)]
+        self.db_manager._text_search_ids = mock.AsyncMock(return_value=[ids[0], ids[1]])
+        self.db_manager.search_similar_vectors = mock.AsyncMock(
+            return_value=[mock.Mock(id=ids[1]), mock.Mock(id=ids[2])]
+        )
+        self.db_manager.search_content_summaries = mock.AsyncMock(
+            return_value=[ContentSummary(id=content_id, title=content_id) for content_id in ids]
+        )
+        
+        results, timings = await self.db_manager.hybrid_search_content_summaries(
+            "关键词", [0.1, 0.2], limit=2, platform="weibo"
+        )
+        
+        self.assertEqual([summary.id for summary in results], [ids[1], ids[0]])
+        self.db_manager.search_content_summaries.assert_awaited_once()
+        self.assertEqual(self.db_manager._text_search_ids.await_args.args[2], {"platform": "weibo"})
+        self.assertEqual(set(timings), {"text", "vector", "fetch"})
+    
+    async def test_get_original_content_from_archive_not_offloaded(self):
+        """测试异步读取未迁移就被归档的文档的原始HTML"""
+        content_id = str(ObjectId())
+        self.db_manager.content_blobs.find_one = mock.AsyncMock(return_value=None)
+        self.db_manager.contents.find_one = mock.AsyncMock(return_value=None)
+        self.db_manager.contents_archive.find_one = mock.AsyncMock(
+            return_value={"_id": ObjectId(content_id), "original_content": "<p>归档原文</p>"}
+        )
+        
+        self.assertEqual(await self.db_manager.get_original_content(content_id), "<p>归档原文</p>")
+    
+    async def test_get_content_missing(self):
+        """测试获取不存在的内容，热数据未命中时查询归档"""
+        self.db_manager.contents.find_one = mock.AsyncMock(return_value=None)
+        self.db_manager.contents_archive.find_one = mock.AsyncMock(return_value=None)
+        
+        content = await self.db_manager.get_content("60a5e8a9b54b12c5a8c4d786")
+        
+        self.assertIsNone(content)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -73,10 +73,18 @@ class MockDatabaseManager:
     def content_exists(self, query):
         """检查内容是否存在"""
         return False
+    
+    def filter_existing_urls(self, urls):
+        """批量检查已存在的URL"""
+        return set()
         
     def store_content(self, content):
         """存储内容"""
         return "test_content_id"
+    
+    def store_contents_bulk(self, contents, batch_size=None, dedupe_by_url=False):
+        """批量存储内容"""
+        return {"ids": ["test_content_id"] * len(contents), "errors": [], "duplicates": []}
         
     # 添加其他 WeChatCrawler 可能调用的方法
 
@@ -100,6 +108,7 @@ class TestWeChatCrawler(unittest.TestCase):
         # 创建数据库管理器的模拟
         self.mock_db_manager = mock.MagicMock(spec=MockDatabaseManager)
         self.mock_db_manager.content_exists.return_value = False
+        self.mock_db_manager.filter_existing_urls.return_value = set()
         self.mock_db_manager.store_content.return_value = "test_content_id"
         
         # 创建爬虫实例
@@ -197,10 +206,13 @@ class TestWeChatCrawler(unittest.TestCase):
         # 模拟LLM处理器
         with mock.patch('processor.llm_processor.LLMProcessor') as mock_llm_cls:
             mock_llm = mock_llm_cls.return_value
-            mock_llm.understand_content.return_value = json.dumps({
+            mock_llm.analyze_content.return_value = {
+                'summary': '人工智能技术正在快速发展。',
                 'keywords': ['人工智能', 'AI', '技术', '发展', '未来'],
-                'topics': ['技术', '人工智能', '未来趋势']
-            })
+                'topics': ['技术', '人工智能', '未来趋势'],
+                'value_assessment': {'overall_score': 8, 'relevance': 8, 'timeliness': 7,
+                                     'importance': 8, 'uniqueness': 6}
+            }
             
             # 执行测试
             content = self.crawler._process_article(article_data)
@@ -211,13 +223,39 @@ class TestWeChatCrawler(unittest.TestCase):
         self.assertEqual(content.source, '测试公众号')
         self.assertIn('人工智能', content.keywords)
         self.assertIn('技术', content.topics)
-        self.assertEqual(content.metadata['author'], '测试作者')
-        self.assertEqual(content.metadata['original_url'], 'https://mp.weixin.qq.com/s/test_article')
+        self.assertEqual(content.summary, '人工智能技术正在快速发展。')
+        self.assertEqual(content.value_assessment.overall_score, 8)
+        self.assertEqual(content.metadata.author, '测试作者')
+        self.assertEqual(content.metadata.original_url, 'https://mp.weixin.qq.com/s/test_article')
+        mock_llm.analyze_content.assert_called_once_with('人工智能的未来发展', article_data['processed_text'])
+    
+    def test_process_article_without_llm(self):
+        """测试LLM分析失败时退化为标题关键词"""
+        article_data = {
+            'title': '测试标题',
+            'original_content': '<p>正文</p>',
+            'processed_text': '正文',
+            'source': '测试公众号',
+            'url': 'https://mp.weixin.qq.com/s/test_article',
+            'author': '测试作者',
+            'publish_time': datetime(2023, 1, 1),
+            'formatted_time': '2023-01-01',
+            'crawl_time': datetime.now(),
+            'image_urls': []
+        }
+        
+        with mock.patch('processor.llm_processor.LLMProcessor') as mock_llm_cls:
+            mock_llm_cls.return_value.analyze_content.side_effect = ValueError("格式错误")
+            content = self.crawler._process_article(article_data)
+        
+        self.assertEqual(content.summary, '')
+        self.assertEqual(content.keywords, ['测试标题'])
+        self.assertIsNone(content.value_assessment)
     
     @mock.patch.object(WeChatCrawler, '_search_account_articles')
     @mock.patch.object(WeChatCrawler, '_get_article_content')
     @mock.patch.object(WeChatCrawler, '_process_article')
-    @mock.patch.object(WeChatCrawler, 'store_and_process_content')
+    @mock.patch.object(WeChatCrawler, 'store_and_process_contents')
     def test_crawl(self, mock_store, mock_process, mock_get_content, mock_search):
         """测试爬取方法"""
         # 设置模拟返回值
@@ -243,7 +281,7 @@ class TestWeChatCrawler(unittest.TestCase):
         mock_content.dict.return_value = {}
         mock_process.return_value = mock_content
         
-        mock_store.return_value = "test_content_id"
+        mock_store.side_effect = lambda contents: ["test_content_id"] * len(contents)
         
         # 执行测试
         with mock.patch('time.sleep'):
@@ -253,7 +291,25 @@ class TestWeChatCrawler(unittest.TestCase):
         self.assertEqual(mock_search.call_count, 2)  # 调用两次，对应两个公众号
         self.assertEqual(mock_get_content.call_count, 4)  # 对每个公众号的两篇文章
         self.assertEqual(mock_process.call_count, 4)  # 处理4篇文章
-        self.assertEqual(mock_store.call_count, 4)  # 存储4篇文章
+        self.assertEqual(mock_store.call_count, 2)  # 每个公众号批量存储一次
+        stored = sum(len(call.args[0]) for call in mock_store.call_args_list)
+        self.assertEqual(stored, 4)  # 共存储4篇文章
+        self.assertEqual(self.mock_db_manager.filter_existing_urls.call_count, 2)  # 每个公众号一次去重查询
+    
+    def test_store_and_process_contents(self):
+        """测试批量存储并回调"""
+        self.mock_db_manager.store_contents_bulk.return_value = {
+            "ids": ["id_1", None],
+            "errors": [{"index": 1, "error": "duplicate key"}],
+            "duplicates": []
+        }
+        callback = mock.MagicMock()
+        self.crawler.set_content_callback(callback)
+        
+        content_ids = self.crawler.store_and_process_contents([{'title': 'a'}, {'title': 'b'}])
+        
+        self.assertEqual(content_ids, ["id_1", None])
+        callback.assert_called_once_with("id_1", {'title': 'a'})
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file